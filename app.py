@@ -1,19 +1,48 @@
 import traceback
-from flask import Flask, jsonify, request, send_from_directory
+import click
+from flask import Flask, Response, jsonify, request, stream_with_context
 import json
 import os
-import requests
 import urllib
 from datetime import datetime, timezone
 import hashlib
 from dotenv import load_dotenv
 import base64
 import random
-from bs4 import BeautifulSoup
 import logging
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+from backend.models import db, AnalysisJob, AnalysisResult
+from backend.jobs import JobRunner, StageTracker
+from backend.cache import AnalysisCache
+from backend.http_cache import ConditionalCache
+from backend.singleflight import SingleFlight
+from backend.github_graphql import fetch_repository_metadata
+from backend.ingest import IngestRun, IngestStop, iter_repository_files, FileSampler
+from backend.commits import CommitHistory, WeeklyActivity, cadence_features
+from backend.similarity import SignatureCollector, SimilarityIndex
+from backend.secrets_scan import SecretScanner, create_scan_pool
+from backend.static_analysis import AnalysisMemo, StaticAnalyzer, create_analysis_pool, summarize
+from backend.context import ContextPacker, TokenCounter
+from backend.incremental import (ChangeSet, IncrementalUnavailable, SnapshotStore, changed_files, head_commit,
+                                 merge_matches, merge_sample, merge_secret_scan, merge_static_analysis)
+from backend.github_rest import (cadence_result, commit_history, commit_page_tasks, contents_url, count_from_response,
+                                 file_from_contents, graphql_metadata, graphql_tasks, needs_weekly_stats,
+                                 rest_metadata, rest_metadata_tasks)
+from backend.ratelimit import RateLimit
+from backend.transport import RetryBudget, async_client, limited_session, pooled_session
+from backend.github_tokens import TokenPool
+from backend.scrape import RepositoryScraper
+from backend.static_assets import StaticAssets
+from backend.llm import LLMClient
+from backend.telemetry import (ANALYSES, CACHE_LOOKUPS, SnapshotCollector, Timings, install_collector, observe,
+                               observe_github_response, render, span, timed)
+from backend.metrics import generate_metrics, metric_inputs, score_rows
+from backend.batch import BatchScheduler, read_repo_urls, completed_repo_urls, open_results
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 
@@ -21,11 +50,15 @@ logger = logging.getLogger(__name__)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 build_dir = os.path.join(current_dir, 'frontend', 'build')
 
+# Loaded once per process; restart the server to pick up a new build
+static_assets = StaticAssets(build_dir)
+logger.info(f"Loaded {static_assets.load()} frontend assets from {build_dir}")
+
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 load_dotenv()
 
-# Update the static folder path
-app = Flask(__name__, static_folder=build_dir, static_url_path='/')
+# The frontend build is served from memory by static_assets rather than Flask's static route
+app = Flask(__name__, static_folder=None)
 
 app.config.update(
     SESSION_COOKIE_SECURE=False,
@@ -36,14 +69,264 @@ app.config.update(
 
 app.secret_key = os.getenv('FLASK_SECRET_KEY')
 
+# Finished analyses are persisted so repeat lookups skip GitHub and the LLM.
+# Relative sqlite paths resolve inside the instance folder.
+database_url = os.getenv('DATABASE_URL', 'sqlite:///gitanalyze.db')
+if database_url.startswith('postgres://'):
+    database_url = database_url.replace('postgres://', 'postgresql://', 1)
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+os.makedirs(app.instance_path, exist_ok=True)
+db.init_app(app)
+with app.app_context():
+    db.create_all()
+
+analysis_cache = AnalysisCache(
+    ttl=int(os.getenv('CACHE_TTL', 6 * 3600)),
+    max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 256)),
+    max_rows=int(os.getenv('CACHE_MAX_ROWS', 10000))
+)
+
+# Per-call timeout for GitHub requests and the overall deadline of a fan-out stage
+GITHUB_TIMEOUT = float(os.getenv('GITHUB_TIMEOUT', 10))
+FETCH_STAGE_TIMEOUT = float(os.getenv('FETCH_STAGE_TIMEOUT', 20))
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', 12))
+
+# Outbound connections: kept alive per host in pools sized for every fetch worker
+# of a few concurrent analyses, with a short connect timeout so a dead host fails
+# fast. Transient GitHub failures are retried with jittered backoff while the
+# process-wide budget allows, about HTTP_RETRY_RATIO retries per request
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', FETCH_WORKERS * 4))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+retry_budget = RetryBudget(
+    ratio=float(os.getenv('HTTP_RETRY_RATIO', 0.1)),
+    min_per_second=float(os.getenv('HTTP_RETRY_MIN_PER_SECOND', 1))
+)
+HTTP_RETRY = {
+    'budget': retry_budget,
+    'retries': int(os.getenv('HTTP_RETRIES', 3)),
+    'backoff': float(os.getenv('HTTP_RETRY_BACKOFF', 0.5)),
+    'max_backoff': float(os.getenv('HTTP_RETRY_MAX_BACKOFF', 8)),
+    'max_retry_after': float(os.getenv('HTTP_MAX_RETRY_AFTER', 10)),
+    'timeout': (HTTP_CONNECT_TIMEOUT, GITHUB_TIMEOUT)
+}
+
+# Upstream base URLs, overridable to point the app at local stand-ins (see benchmarks/)
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GITHUB_WEB_URL = os.getenv('GITHUB_WEB_URL', 'https://github.com').rstrip('/')
+
+# Unsigned GitHub traffic: repository page scrapes and token identity checks
+web_session = pooled_session(HTTP_POOL_SIZE, **HTTP_RETRY)
+
+# Every configured PAT (GITHUB_PATS is comma-separated), each request sent with
+# the one that has the most quota left
+github_tokens = TokenPool(
+    [token.strip() for token in os.getenv('GITHUB_PATS', '').split(',')] + [os.getenv('GITHUB_PAT', '')],
+    reserve=int(os.getenv('GITHUB_RATE_RESERVE', 50)),
+    refresh_interval=int(os.getenv('GITHUB_IDENTITY_REFRESH', 900)),
+    timeout=GITHUB_TIMEOUT,
+    api_url=GITHUB_API_URL,
+    session=web_session
+)
+# The pool signs GitHub requests, so callers only set Accept
+GITHUB_HEADERS = {'Accept': 'application/vnd.github.v3+json'}
+
+# Shared sessions keep connections alive and feed each API's rate-limit headers
+# to a budget the batch scheduler paces itself by. GraphQL reads are POSTs, so
+# those are retried too; completions are not, LLMClient fails over instead
+llm_limit = RateLimit('openrouter')
+github_session = limited_session(github_tokens, pool_size=HTTP_POOL_SIZE, auth=github_tokens,
+                                 methods=('GET', 'HEAD', 'POST'), **HTTP_RETRY)
+llm_session = limited_session(llm_limit, pool_size=HTTP_POOL_SIZE, retries=0, budget=retry_budget)
+github_session.hooks['response'].append(observe_github_response)
+
+# httpx clients for the async serving mode (asgi.py), sharing the sessions'
+# token pool and budgets; at most HTTP_ASYNC_CONNECTIONS connections each
+HTTP_ASYNC_CONNECTIONS = int(os.getenv('HTTP_ASYNC_CONNECTIONS', 200))
+github_async = async_client(HTTP_POOL_SIZE, HTTP_ASYNC_CONNECTIONS, auth=github_tokens,
+                            hooks=(github_tokens.observe, observe_github_response), methods=('GET', 'HEAD', 'POST'),
+                            **HTTP_RETRY)
+llm_async = async_client(HTTP_POOL_SIZE, HTTP_ASYNC_CONNECTIONS, hooks=(llm_limit.observe,), retries=0,
+                         budget=retry_budget)
+
+# Conditional-request cache for api.github.com, shared by every worker on the host;
+# entries are kept apart per token pool and the oldest pruned past HTTP_CACHE_MAX_BYTES
+github_http = ConditionalCache(
+    os.getenv('HTTP_CACHE_DIR', os.path.join(app.instance_path, 'http_cache')),
+    session=github_session,
+    credentials=github_tokens.fingerprint,
+    max_bytes=int(os.getenv('HTTP_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+)
+
+# Concurrent requests for the same repository wait on one in-flight analysis
+single_flight = SingleFlight(
+    os.getenv('LOCK_DIR', os.path.join(app.instance_path, 'locks')),
+    timeout=float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 120))
+)
+
+# Background analyses run on their own bounded pool, sized apart from the HTTP workers
+job_runner = JobRunner(
+    app,
+    max_workers=int(os.getenv('ANALYSIS_WORKERS', 4)),
+    max_pending=int(os.getenv('ANALYSIS_QUEUE_LIMIT', 64))
+)
+
+# Batch runs: repositories analyzed at once, the most per request, and the GitHub
+# requests one analysis is expected to cost when pacing against the budget
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_MAX_REPOS = int(os.getenv('BATCH_MAX_REPOS', 500))
+BATCH_GITHUB_COST = int(os.getenv('BATCH_GITHUB_COST', 20))
+
+# Fetch metadata with one GraphQL query, set to 0 to force the REST endpoints
+GITHUB_GRAPHQL = os.getenv('GITHUB_GRAPHQL', '1') != '0'
+
+# "archive" streams the repository tarball, "contents" samples the root listing
+REPO_INGEST_MODE = os.getenv('REPO_INGEST_MODE', 'archive')
+INGEST_MAX_BYTES = int(os.getenv('INGEST_MAX_BYTES', 200 * 1024 * 1024))
+INGEST_SAMPLE_FILES = int(os.getenv('INGEST_SAMPLE_FILES', 20))
+INGEST_SAMPLE_CHARS = int(os.getenv('INGEST_SAMPLE_CHARS', 4000))
+# Ingestion stops reading here and keeps what it has, ahead of the fetch stage deadline
+INGEST_TIMEOUT = float(os.getenv('INGEST_TIMEOUT', FETCH_STAGE_TIMEOUT * 0.75))
+
+# Near-duplicate detection against every repository analyzed so far
+similarity_index = SimilarityIndex(threshold=float(os.getenv('SIMILARITY_THRESHOLD', 0.8)))
+SIMILARITY_MAX_FILES = int(os.getenv('SIMILARITY_MAX_FILES', 500))
+
+# Processes scanning ingested files for secrets, 0 scans inline while the archive streams
+SECRET_SCAN_PROCESSES = int(os.getenv('SECRET_SCAN_PROCESSES', 0))
+_secret_scan_pool = None
+
+# Processes measuring source files for the code quality figures, 0 measures inline while the archive streams;
+# results are kept by blob SHA for every analysis in the process
+STATIC_ANALYSIS_PROCESSES = int(os.getenv('STATIC_ANALYSIS_PROCESSES', os.cpu_count() or 1))
+STATIC_ANALYSIS_MAX_FILES = int(os.getenv('STATIC_ANALYSIS_MAX_FILES', 5000))
+static_analysis_memo = AnalysisMemo(max_entries=int(os.getenv('STATIC_ANALYSIS_MEMO_ENTRIES', 20000)))
+_static_analysis_pool = None
+
+# Repository page scraping for the REST fallback: "strained" builds only the
+# elements it reads, "full" parses the whole page
+repository_scraper = RepositoryScraper(
+    extractor=os.getenv('SCRAPE_EXTRACTOR', 'strained'),
+    ttl=int(os.getenv('SCRAPE_CACHE_TTL', 300)),
+    timeout=GITHUB_TIMEOUT,
+    session=web_session,
+    web_url=GITHUB_WEB_URL
+)
+
+# Code packed into the prompt: tokens it may use, counted with the model's tokenizer
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 6000))
+CONTEXT_MAX_CANDIDATES = int(os.getenv('CONTEXT_MAX_CANDIDATES', 200))
+token_counter = TokenCounter(os.getenv('TOKENIZER_ENCODING', 'o200k_base'))
+
+# Most recent commits paged in for day-level cadence, older history comes from weekly stats
+COMMIT_HISTORY_MAX = int(os.getenv('COMMIT_HISTORY_MAX', 1000))
+
+# Re-analyses start from the snapshot the last one left and fetch only what changed
+# since its commit; larger changes, and snapshots a full analysis hasn't rebuilt
+# within SNAPSHOT_MAX_AGE seconds, get a full analysis
+INCREMENTAL_ANALYSIS = os.getenv('INCREMENTAL_ANALYSIS', '1') != '0'
+INCREMENTAL_MAX_FILES = int(os.getenv('INCREMENTAL_MAX_FILES', 100))
+snapshot_store = SnapshotStore(max_age=int(os.getenv('SNAPSHOT_MAX_AGE', 7 * 24 * 3600)))
+
+def normalize_repo_url(repo_url):
+    """Canonical form of a repository URL so equivalent spellings share a cache key."""
+    url = repo_url.strip().lower().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+    return url
+
+
 def get_repo_hash(repo_url):
-    return hashlib.md5(repo_url.encode()).hexdigest()
+    return hashlib.md5(normalize_repo_url(repo_url).encode()).hexdigest()
+
+
+def fetch_json(url, headers, params=None, default=None):
+    """GET a GitHub endpoint and return its JSON body, or `default` if the call fails."""
+    try:
+        response = github_http.get(url, headers=headers, params=params, timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        print(f"Error fetching {url}: {str(e)}")
+        return default
+
+
+def count_items(url, headers, params=None):
+    """Count a paginated GitHub list by asking for one item per page, see count_from_response."""
+    response = github_http.get(url, headers=headers, params={**(params or {}), 'per_page': 1}, timeout=GITHUB_TIMEOUT)
+    return count_from_response(response)
+
+
+def run_concurrently(tasks, timeout=FETCH_STAGE_TIMEOUT, on_complete=None):
+    """Run independent calls at once and collect their results by name.
+
+    `tasks` maps a name to a `(callable, default)` pair. A call that raises or
+    misses the stage deadline yields its default, so one failing endpoint only
+    degrades its own field. `on_complete(name)` is called as each task finishes.
+    """
+    if not tasks:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(tasks)))
+    try:
+        futures = {name: executor.submit(func) for name, (func, _) in tasks.items()}
+        if on_complete:
+            for name, future in futures.items():
+                future.add_done_callback(lambda _, name=name: on_complete(name))
+        wait(futures.values(), timeout=timeout)
+
+        results = {}
+        for name, future in futures.items():
+            default = tasks[name][1]
+            if not future.done():
+                print(f"Timed out fetching {name}")
+                future.cancel()
+                results[name] = default
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Error fetching {name}: {str(e)}")
+                results[name] = default
+        return results
+    finally:
+        # Don't block on stragglers, their per-call timeouts will reap them
+        executor.shutdown(wait=False)
     
-def analyze_code_with_ai(repo_info, files_content, url):
-    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+OPENROUTER_URL = os.getenv('OPENROUTER_URL', "https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', "openai/chatgpt-4o-latest")
+# Tried in order when the model before them fails, and raced against it once it runs late
+OPENROUTER_FALLBACK_MODELS = [model.strip() for model in os.getenv('OPENROUTER_FALLBACK_MODELS', 'openai/gpt-4o').split(',')]
+# Deadline of one completion attempt, and the longest wait between streamed chunks
+OPENROUTER_TIMEOUT = float(os.getenv('OPENROUTER_TIMEOUT', 90))
+OPENROUTER_STREAM_TIMEOUT = float(os.getenv('OPENROUTER_STREAM_TIMEOUT', 60))
 
+# A late request is hedged once it passes this percentile of its model's recent
+# latency (OPENROUTER_HEDGE_DELAY seconds until there are enough samples); a model
+# failing LLM_BREAKER_FAILURES times in a row is skipped for LLM_BREAKER_RESET seconds
+llm_client = LLMClient(
+    llm_session,
+    OPENROUTER_URL,
+    [OPENROUTER_MODEL] + OPENROUTER_FALLBACK_MODELS,
+    api_key=os.getenv('OPENROUTER_API_KEY'),
+    timeout=OPENROUTER_TIMEOUT,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    stream_timeout=OPENROUTER_STREAM_TIMEOUT,
+    hedge_delay=float(os.getenv('OPENROUTER_HEDGE_DELAY', 30)),
+    hedge_percentile=float(os.getenv('OPENROUTER_HEDGE_PERCENTILE', 90)),
+    breaker_failures=int(os.getenv('LLM_BREAKER_FAILURES', 3)),
+    breaker_reset=float(os.getenv('LLM_BREAKER_RESET', 60)),
+    async_session=llm_async
+)
 
-    # Process repository metadata
+# Rate-limit budgets, HTTP cache counters and model circuits are read live on every /metrics scrape
+install_collector(SnapshotCollector({'github': github_tokens, 'openrouter': llm_limit}, http_cache=github_http,
+                                    llm=llm_client))
+GRADES = ("Beware", "Caution", "Average", "Good", "Excellent")
+AI_UNAVAILABLE = "AI analysis currently unavailable"
+
+
+def describe_repository(repo_info):
+    """Repository metadata and local scanner results as prompt text."""
     repo_metadata = f"""
             Repository Metadata:
             - Name: {repo_info['name']}
@@ -52,13 +335,91 @@ def analyze_code_with_ai(repo_info, files_content, url):
             - Forks: {repo_info['forks']}
             - Watchers: {repo_info['watchers_count']}
             - Total Commits: {repo_info['total_commits']}
-            - Tags Count: {len(repo_info['tags'])}
-            - Collaborators Count: {len(repo_info['collaborators'])}
+            - Tags Count: {repo_info['tags_count']}
+            - Collaborators Count: {repo_info['collaborators_count']}
             - Open Issues: {repo_info['open_issues_count']}
             - Created: {repo_info['created_at']}
             - Last Updated: {repo_info['last_updated']}
         """
 
+    # Measured commit cadence, so the "all commits within a week" check uses real numbers
+    cadence = repo_info.get('commit_cadence')
+    if cadence and cadence['sampled_commits']:
+        repo_metadata += f"""
+            Commit History:
+            - First Commit: {cadence['first_commit_at']}
+            - Days Between First and Last Commit: {cadence['span_days']}
+            - Share of Days With Commits: {cadence['active_day_ratio']:.0%}
+            - Burstiness (-1 regular, 0 random, 1 bursty): {cadence['burstiness']}
+        """
+        if cadence['first_week_share'] is not None:
+            repo_metadata += f"""    - Share of Commits in the First 7 Days: {cadence['first_week_share']:.0%}
+            - Commit Authors: {cadence['authors']}
+            - Share of Commits by Top Author: {cadence['top_author_share']:.0%}
+        """
+        else:
+            # Only the newest commits were read and GitHub had no contributor stats ready yet
+            repo_metadata += """    - First-week and per-author shares of the whole history are unknown, do not infer them
+        """
+        if not cadence['complete']:
+            repo_metadata += f"""            - Dates and day-level figures cover the newest {cadence['sampled_commits']} of {cadence['total_commits']} commits
+        """
+
+    # Near-duplicates found by the local index are evidence for the plagiarism section
+    similar_code = repo_info.get('similar_code')
+    if similar_code:
+        repo_metadata += """
+            Near-Duplicate Code Found in Previously Analyzed Repositories:
+        """
+        for match in similar_code[:10]:
+            repo_metadata += f"""    - {match['path']} is {match['similarity']:.0%} similar to {match['match_path']} in {match['match_repo']}
+        """
+
+    # The scanner reads every file, the model only ever sees a sample of them
+    secret_findings = repo_info.get('secret_findings')
+    if secret_findings:
+        repo_metadata += """
+            Exposed Credentials Found by a Local Scanner (placeholders already excluded):
+        """
+        for finding in secret_findings[:10]:
+            repo_metadata += f"""    - {finding['type']} in {finding['path']} line {finding['line']}
+        """
+
+    # Measured over every source file, so the code quality section rests on numbers rather than the sample
+    static_analysis = repo_info.get('static_analysis')
+    if static_analysis and static_analysis['files_analyzed']:
+        languages = ', '.join(f"{language} {figures['code_lines']}" for language, figures
+                              in sorted(static_analysis['languages'].items(), key=lambda item: -item[1]['code_lines']))
+        repo_metadata += f"""
+            Static Analysis of {static_analysis['files_analyzed']} Source Files:
+            - Lines of Code by Language: {languages}
+            - Functions: {static_analysis['functions']}, Average Cyclomatic Complexity: {static_analysis['average_complexity']}
+            - Functions With Complexity Over 10: {static_analysis['complex_functions']}
+            - Test Files: {static_analysis['test_files']}, Test to Code Line Ratio: {static_analysis['test_to_code_ratio']}
+            - Python Files That Fail to Parse: {static_analysis['syntax_errors']}
+        """
+        # Unknown after an incremental update, see merge_static_analysis
+        if static_analysis['duplicate_ratio'] is not None:
+            repo_metadata += f"""    - Share of Code Repeated Elsewhere in the Repository: {static_analysis['duplicate_ratio']:.0%}
+        """
+        for function in static_analysis['most_complex'][:3]:
+            repo_metadata += f"""    - {function['name']} in {function['path']} has complexity {function['complexity']}
+        """
+        if static_analysis['dependencies']:
+            repo_metadata += f"""    - Dependencies: {', '.join(static_analysis['dependencies'][:30])}
+        """
+    return repo_metadata
+
+
+def build_analysis_prompt(repo_info, files_content, url):
+    repo_metadata = describe_repository(repo_info)
+
+    # Packed by ContextPacker to fit the token budget, minified with credentials masked
+    code_context = repo_info.get('code_context')
+    code_samples = ''
+    if code_context:
+        code_samples = "Here are the most telling files, minified and trimmed to fit:\n\n" + '\n\n'.join(code_context)
+
     # Experiment with varied personas
     personalities = [
         "Serious Detective",
@@ -96,7 +457,10 @@ def analyze_code_with_ai(repo_info, files_content, url):
         https://github.com/0xPlaygrounds/rig is a score of Excellent.
 
         Here is the repository url and metadata:
-        {url, repo_metadata} 
+        {url}
+        {repo_metadata}
+
+{code_samples}
 
         The very first output should be a grade: Beware, Caution, Average, Good, and Excellent.
 
@@ -114,95 +478,149 @@ def analyze_code_with_ai(repo_info, files_content, url):
         
         Finally Provide final thoughts.
 """
-    
-    response = None
+    return analysis_prompt
+
+
+def build_update_prompt(repo_info, url, previous_analysis, changes):
+    """Prompt for revising an earlier verdict from what changed since, instead of the whole repository."""
+    repo_metadata = describe_repository(repo_info)
+
+    # Diffs packed by ChangeSet.pack_patches, minified with credentials masked
+    diffs = ''
+    if repo_info.get('code_context'):
+        diffs = "Here are the most telling diffs, minified and trimmed to fit:\n\n" + '\n\n'.join(repo_info['code_context'])
+
+    return f"""
+        Throughout this analysis I want you to be serious but fun and use emojis. You are a crypto coin trader who is slightly humorous.
+
+        We together are seeking out coins with software projects.
+        There are a lot of scam projects that steal code or do not work.
+        Please look for plagiarized code, poor code practices such as exposed API keys (Keys that are not empty or placeholders), and the history of the repository.
+        Repositories that are brand new or have all their commits within a week indicate scam likely projects.
+
+        You analyzed this repository before, at commit {changes.base_sha[:7]}. This was your analysis:
+
+{previous_analysis}
+
+        The repository has since moved to commit {changes.head_sha[:7]}. Here is the repository url and its current metadata:
+        {url}
+        {repo_metadata}
+
+{changes.summary()}
+
+{diffs}
+
+        Revise your analysis for the repository as it is now. Keep what still holds and change only what the new commits, metadata or findings give reason to change.
+
+        Keep the same format. The very first output should be a grade: Beware, Caution, Average, Good, and Excellent.
+        Then the introduction, the underlined categories, the numbered Key Strengths and Areas of Improvement, and final thoughts.
+"""
+
+
+def parse_grade(analysis_text, default="Average"):
+    """The grade leads the completion, so only its first characters are searched."""
+    for grade in GRADES:
+        if grade in analysis_text[:25]:
+            return grade
+    return default
+
+
+def build_ai_analysis(analysis_text, metrics=None, model=None):
+    """The verdict and the model that wrote it, plus the deterministic score fields from generate_metrics."""
+    metrics = metrics or {}
+    return {
+        "model": model,
+        "score": metrics.get('score'),
+        "numeric_score": metrics.get('numeric_score'),
+        "score_breakdown": metrics.get('score_breakdown'),
+        "strengths": metrics.get('strengths'),
+        "areas_for_improvement": metrics.get('areas_for_improvement'),
+        "recommendations": metrics.get('recommendations'),
+        "ai_insights": analysis_text,
+        "grade": parse_grade(analysis_text)
+    }
+
+
+def analyze_code_with_ai(repo_info, files_content, url, metrics=None, timings=None, prompt=None):
+    """The AI verdict as JSON; pass `prompt` when collection already built it."""
+    with span('ai_prompt', timings):
+        analysis_prompt = prompt or build_analysis_prompt(repo_info, files_content, url)
+
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {openrouter_api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "openai/chatgpt-4o-latest",
-                "messages": [{"role": "user", "content": analysis_prompt}]
-            }
-        )
-        
-        ai_response = response.json()
-        analysis_text = ai_response['choices'][0]['message']['content']
-        
-        if "Beware" in analysis_text[:25]:
-            grade = "Beware"
-        elif "Caution" in analysis_text[:25]:
-            grade = "Caution"
-        elif "Average" in analysis_text[:25]:
-            grade = "Average"
-        elif "Good" in analysis_text[:25]:
-            grade = "Good"
-        elif "Excellent" in analysis_text[:25]:
-            grade = "Excellent"        
-        else:
-            grade = "Average"
-
-        rating = None
-        normalized_score = None
-        score_components = None
-        findings = None
-        analysis = {
-            "score": rating,
-            "numeric_score": normalized_score,
-            "score_breakdown": score_components,
-            "strengths": findings,
-            "areas_for_improvement": findings,
-            "recommendations": findings,
-            "ai_insights": analysis_text,
-            "grade": grade
-        }
-        
-        return json.dumps(analysis)
+        with span('ai_request', timings):
+            completion = llm_client.complete([{"role": "user", "content": analysis_prompt}])
+        return json.dumps(build_ai_analysis(completion['text'], metrics, model=completion['model']))
     except Exception as e:
         print(f"Error in AI analysis: {str(e)}")
-        return json.dumps({
-            "score": rating,
-            "numeric_score": normalized_score,
-            "score_breakdown": score_components,
-            "strengths": findings['strengths'],
-            "areas_for_improvement": findings['areas_for_improvement'],
-            "recommendations": findings['recommendations'],
-            "ai_insights": "AI analysis currently unavailable"
-        })
-
-
-def get_repository_files(owner, repo):
-    # Get the GitHub token from an environment variable
-    token = os.getenv('GITHUB_PAT')
-    if not token:
-        raise Exception('GitHub PAT not found. Ensure it is set in the environment.')
+        # The deterministic scores still stand without a verdict
+        return json.dumps({**build_ai_analysis(AI_UNAVAILABLE, metrics), "grade": None})
+
+
+def stream_code_with_ai(repo_info, files_content, url, prompt=None):
+    """The completion's text deltas as they are produced; `model` is set on the result once one answers."""
+    analysis_prompt = prompt or build_analysis_prompt(repo_info, files_content, url)
+    return llm_client.stream([{"role": "user", "content": analysis_prompt}])
 
-    headers = {
-        'Authorization': f'token {token}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
+
+def get_repository_files(owner, repo, consumers=(), stop=None):
+    """Sample of the repository's files for the prompt.
+
+    Every file read along the way is also passed to each consumer's `add`, so
+    other stages can process the whole tree in the same pass. Consumers are
+    only called from this thread, and not at all once the IngestStop `stop`
+    is set; what was read by then is returned.
+    """
+    headers = GITHUB_HEADERS
+    stop = stop or IngestStop()
+
+    if REPO_INGEST_MODE == 'archive':
+        sampler = FileSampler(limit=INGEST_SAMPLE_FILES, max_chars=INGEST_SAMPLE_CHARS)
+        files_read = 0
+        try:
+            for file in iter_repository_files(owner, repo, headers, max_archive_bytes=INGEST_MAX_BYTES,
+                                              timeout=GITHUB_TIMEOUT, session=github_session,
+                                              api_url=GITHUB_API_URL, stop=stop):
+                files_read += 1
+                sampler.add(file)
+                for consumer in consumers:
+                    consumer.add(file)
+            return sampler.result()
+        except Exception as e:
+            # Keep a partial read rather than feeding consumers the same files twice
+            if files_read or stop.is_set():
+                print(f"Error streaming repository archive after {files_read} files: {str(e)}")
+                return sampler.result()
+            print(f"Error streaming repository archive, falling back to contents: {str(e)}")
 
     files_content = []
     try:
-        response = requests.get(
-            f'https://api.github.com/repos/{owner}/{repo}/contents',
-            headers=headers
-        )
-        contents = response.json()
-        
-        for item in contents[:5]:
-            if item['type'] == 'file':
-                if item['size'] <= 1000000:
-                    file_response = requests.get(item['url'], headers=headers)
-                    file_content = file_response.json()
-                    content = base64.b64decode(file_content['content']).decode('utf-8', errors='ignore')
-                    files_content.append({
-                        'path': item['path'],
-                        'content': content[:1000]
-                    })
+        response = github_http.get(f'{GITHUB_API_URL}/repos/{owner}/{repo}/contents', headers=headers,
+                                   timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        contents = response.json()[:5]
+
+        def fetch_file(item):
+            file_content = fetch_json(item['url'], headers)
+            if not file_content:
+                return None
+            content = base64.b64decode(file_content['content']).decode('utf-8', errors='ignore')
+            return {'path': item['path'], 'size': item['size'], 'content': content}
+
+        # Fetch the sampled files in parallel, keeping listing order
+        tasks = {
+            index: (lambda item=item: fetch_file(item), None)
+            for index, item in enumerate(contents)
+            if item['type'] == 'file' and item['size'] <= 1000000
+        }
+        results = run_concurrently(tasks)
+        # Stragglers left behind by run_concurrently never reach the consumers
+        for index in sorted(results):
+            file = results[index]
+            if not file or stop.is_set():
+                continue
+            for consumer in consumers:
+                consumer.add(file)
+            files_content.append({'path': file['path'], 'content': file['content'][:1000]})
     except Exception as e:
         print(f"Error fetching repository contents: {str(e)}")
     
@@ -247,10 +665,10 @@ def is_public_github_repo(repo_url, headers):
         owner, repo = parts[-2], parts[-1]
         
         # GitHub API endpoint for the repository
-        api_url = f"https://api.github.com/repos/{owner}/{repo}"
+        api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
 
         # Make an unauthenticated request
-        response = requests.get(api_url, headers=headers)
+        response = github_http.get(api_url, headers=headers, timeout=GITHUB_TIMEOUT)
 
         if response.status_code == 200:
             return True, "Valid public GitHub repository"
@@ -262,289 +680,972 @@ def is_public_github_repo(repo_url, headers):
         return False, f"Error: {str(e)}"
     
 
-def parse_number(text):
-    """Parse numbers that might include k, m suffixes"""
-    if not text:
-        return 0
-        
-    # Clean up the text
-    text = text.strip().lower()
-    
-    # Handle k/m suffixes
-    multiplier = 1
-    if 'k' in text:
-        multiplier = 1000
-        text = text.replace('k', '')
-    elif 'm' in text:
-        multiplier = 1000000
-        text = text.replace('m', '')
-        
-    try:
-        # Extract numeric part
-        number = float(''.join(c for c in text if c.isdigit() or c == '.'))
-        return int(number * multiplier)
-    except (ValueError, TypeError):
-        return 0
-    
+# Progress stage(s) each fetch task reports under
+FETCH_STAGES = {
+    'graphql': ('metadata', 'commits'),
+    'contributors_count': 'metadata',
+    'repo_info': 'metadata',
+    'scraped_info': 'metadata',
+    'languages': 'metadata',
+    'watchers_count': 'metadata',
+    'tags_count': 'metadata',
+    'collaborators_count': 'metadata',
+    'commits': 'commits',
+    'total_commits': 'commits',
+    'commit_history': 'commits',
+    'files_content': 'files'
+}
+
+
+def fetch_stage(tasks, progress, timings=None):
+    """Run a fan-out of fetch tasks, reporting progress per stage and timing each task."""
+    tracker = StageTracker(progress, {name: FETCH_STAGES[name] for name in tasks})
+    tracker.start()
+    tasks = {name: (timed(name, func, timings), default) for name, (func, default) in tasks.items()}
+    fetched = run_concurrently(tasks, on_complete=tracker.complete)
+    tracker.finish()
+    return fetched
+
 
-def scrape_repository_info(repo_url):
-    """Scrape basic repository information from GitHub webpage."""
+def fetch_commit_history(base_url, headers):
+    """Cadence features over the repository's commit history, with the history they came from.
+
+    Counts every commit, pages in up to COMMIT_HISTORY_MAX of the newest ones
+    concurrently, and when that is not the whole history adds the weekly
+    per-author totals from /stats/contributors. Returns `(features, history,
+    weekly)`; the arrays are kept in the snapshot incremental runs build on.
+    """
+    total_commits = count_items(f'{base_url}/commits', headers)
+    history = commit_history(run_concurrently(
+        commit_page_tasks(base_url, headers, fetch_json, total_commits, COMMIT_HISTORY_MAX)))
+
+    stats = None
+    if needs_weekly_stats(history, total_commits):
+        stats = fetch_json(f'{base_url}/stats/contributors', headers, default=[])
+    return cadence_result(history, stats, total_commits)
+
+
+def find_similar_code(repo_url, signatures):
+    """Match the repository's files against the index, then index them for later analyses."""
+    repo_hash = get_repo_hash(repo_url)
     try:
-        response = requests.get(repo_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get star count - Updated selector
-        stars_element = soup.select_one('a[href$="stargazers"] span.Counter')
-        stars = parse_number(stars_element.text.strip() if stars_element else '0')
-        
-        # Get fork count - Updated selector
-        forks_element = soup.select_one('a[href$="forks"] span.Counter')
-        forks = parse_number(forks_element.text.strip() if forks_element else '0')
-        
-        # Get languages - Updated selector and parsing
-        languages = {}
-        lang_stats = soup.select('div[data-test-selector="languages-stats"] span.color-fg-default')
-        for lang_elem in lang_stats:
-            lang_name = lang_elem.text.strip()
-            # Find the percentage in the next sibling
-            percent_elem = lang_elem.find_next_sibling('span', class_='color-fg-muted')
-            if percent_elem:
-                percent_text = percent_elem.text.strip().rstrip('%')
-                try:
-                    lang_percent = float(percent_text)
-                    languages[lang_name] = lang_percent
-                except ValueError:
-                    continue
-        
-        # Get creation date and last update - Updated selector
-        dates = soup.select('relative-time')
-        created_at = None
-        last_updated = None
-        
-        if dates:
-            try:
-                # Look for creation date in page text
-                creation_element = soup.find('span', string=lambda text: text and 'Created' in text)
-                if creation_element:
-                    created_time = creation_element.find_next('relative-time')
-                    if created_time:
-                        created_at = created_time.get('datetime')
-                
-                # Last updated is typically the first relative-time element
-                last_updated = dates[0].get('datetime')
-            except Exception as e:
-                print(f"Error parsing dates: {e}")
-        
-        # Fallback dates if not found
-        if not created_at:
-            created_at = datetime.now(timezone.utc).isoformat()
-        if not last_updated:
-            last_updated = datetime.now(timezone.utc).isoformat()
-        
-        # Get contributors count - Updated selector
-        contributors_element = soup.select_one('a[href$="contributors"] span.Counter')
-        contributors_count = parse_number(contributors_element.text.strip() if contributors_element else '0')
-        
-        return {
-            'stars': stars,
-            'forks': forks,
-            'languages': languages,
-            'created_at': created_at,
-            'last_updated': last_updated,
-            'contributors_count': contributors_count
-        }
+        # Collection may run on a helper thread, so take our own app context
+        with app.app_context():
+            matches = similarity_index.query(signatures, exclude_repo_hash=repo_hash)
+            similarity_index.add(repo_hash, normalize_repo_url(repo_url), signatures)
+        return matches
     except Exception as e:
-        print(f"Error scraping repository: {e}")
-        # Return default values if scraping fails
-        return {
-            'stars': 0,
-            'forks': 0,
-            'languages': {},
-            'created_at': datetime.now(timezone.utc).isoformat(),
-            'last_updated': datetime.now(timezone.utc).isoformat(),
-            'contributors_count': 0
-        }
-    
+        print(f"Error checking code similarity: {str(e)}")
+        return []
+
 
-def analyze_repository(repo_url):
+def update_similar_code(repo_url, signatures, paths):
+    """find_similar_code for the files a change touched, re-indexing only those paths."""
+    if not paths:
+        return []
+    repo_hash = get_repo_hash(repo_url)
     try:
-        # Get the GitHub token from an environment variable
-        token = os.getenv('GITHUB_PAT')
-        if not token:
-            raise Exception('GitHub PAT not found. Ensure it is set in the environment.')
-
-        headers = {
-            'Authorization': f'token {token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        with app.app_context():
+            matches = similarity_index.query(signatures, exclude_repo_hash=repo_hash)
+            similarity_index.replace_paths(repo_hash, normalize_repo_url(repo_url), signatures, paths)
+        return matches
+    except Exception as e:
+        print(f"Error checking code similarity: {str(e)}")
+        return []
 
-        # URL Validation
+
+def fetch_rest_metadata(repo_url, base_url, headers, progress=None, timings=None):
+    """The original REST call chain plus HTML scrape, used when GraphQL is unavailable.
+
+    Returns None if the repository is not public.
+    """
+    # URL Validation
+    with span('visibility', timings):
         valid = is_public_github_repo(repo_url, headers)
-        if not valid[0]:
-            return "Invalid"
-        
-        parts = repo_url.rstrip("/").split("/")
-        if len(parts) < 5:  # URL should have at least "https://github.com/{owner}/{repo}"
-            return False, "Invalid GitHub repository format"
+    if not valid[0]:
+        return None
 
-        owner, repo = parts[-2], parts[-1]
+    fetched = fetch_stage({
+        'repo_info': (lambda: fetch_json(base_url, headers), None),
+        'scraped_info': (lambda: repository_scraper.scrape(repo_url), None),
+        **rest_metadata_tasks(base_url, headers, fetch_json, count_items)
+    }, progress, timings)
+    return rest_metadata(fetched, base_url)
 
-        base_url = f'https://api.github.com/repos/{owner}/{repo}'
-                
-        repo_response = requests.get(base_url, headers=headers)
-        repo_info = repo_response.json()
 
-        # Web scrape repo -----------------
-        # Scrape basic repository information
-        scraped_info = scrape_repository_info(repo_url)
+def secret_scan_pool():
+    """Process pool shared by every secret scan, created on first use."""
+    global _secret_scan_pool
+    if SECRET_SCAN_PROCESSES and _secret_scan_pool is None:
+        _secret_scan_pool = create_scan_pool(SECRET_SCAN_PROCESSES)
+    return _secret_scan_pool
 
-        languages = requests.get(f'{base_url}/languages', headers=headers).json()
-        commits = requests.get(f'{base_url}/commits', params={'per_page': 30}, headers=headers).json()
-        contributors = requests.get(f'{base_url}/contributors', params={'per_page': 10}, headers=headers).json()
-        total_commits = len(commits)
-        is_single_commit = total_commits == 1
-        files_content = get_repository_files(owner, repo)
 
-        watchers_response = requests.get(f'{base_url}/watchers', headers=headers)
-        watchers = watchers_response.json()
-        
-        tags_response = requests.get(f'{base_url}/tags', headers=headers)
-        tags = tags_response.json()
-        
-        collaborators_response = requests.get(f'{base_url}/collaborators', headers=headers)
-        collaborators = collaborators_response.json()
-        
-        repo_data = {
-            'repository': {
-                'name': repo_info['name'],
-                'description': repo_info['description'],
-                'stars': repo_info['stargazers_count'],
-                'forks': repo_info['forks_count'],
-                'open_issues': repo_info['open_issues_count'],
-                'created_at': repo_info['created_at'],
-                'last_updated': repo_info['updated_at'],
-                'is_single_commit': is_single_commit
-            },
-            'commit_activity': {
-                'total_commits': total_commits,
-                'recent_commits': [{'sha': c['sha'][:7], 
-                                'message': c['commit']['message'],
-                                'date': c['commit']['author']['date']} 
-                                for c in commits[:5]]
-            },
-            'languages': languages,
-            'contributors': scraped_info['contributors_count']
-        }
+def static_analysis_pool():
+    """Process pool shared by every static analysis, created on first use."""
+    global _static_analysis_pool
+    if STATIC_ANALYSIS_PROCESSES and _static_analysis_pool is None:
+        _static_analysis_pool = create_analysis_pool(STATIC_ANALYSIS_PROCESSES)
+    return _static_analysis_pool
+
+
+def static_analyzer():
+    return StaticAnalyzer(executor=static_analysis_pool(), memo=static_analysis_memo,
+                          max_files=STATIC_ANALYSIS_MAX_FILES)
+
+
+def repository_parts(repo_url):
+    """`(owner, repo)` of a github.com repository URL, or None."""
+    if not repo_url.startswith("https://github.com/"):
+        return None
+    parts = repo_url.rstrip("/").split("/")
+    if len(parts) < 5:  # URL should have at least "https://github.com/{owner}/{repo}"
+        return None
+    return parts[-2], parts[-1]
 
-        ai_analysis = analyze_code_with_ai({
+
+def metadata_tasks(owner, repo, base_url):
+    """Fetch tasks for the GraphQL metadata path; none when it is disabled."""
+    if not GITHUB_GRAPHQL:
+        return {}
+    return graphql_tasks(lambda: fetch_repository_metadata(owner, repo, timeout=GITHUB_TIMEOUT, session=github_session,
+                                                           url=f'{GITHUB_API_URL}/graphql'),
+                         base_url, GITHUB_HEADERS, count_items)
+
+
+def resolve_metadata(fetched, repo_url, base_url, progress=None, timings=None):
+    """Metadata from the GraphQL tasks, or the REST chain when they failed; None if the repository isn't public."""
+    metadata = graphql_metadata(fetched)
+    if metadata is False:
+        print(f"Falling back to REST metadata for {base_url}")
+        return fetch_rest_metadata(repo_url, base_url, GITHUB_HEADERS, progress, timings)
+    return metadata
+
+
+def assemble_analysis(repo_url, metadata, commit_history, total_commits, files_content, similar_code, secret_scan,
+                      static_analysis, timings=None):
+    """The report's repository data, the AI step's inputs and the metrics, from everything collected."""
+    repo_info = metadata['repo_info']
+    commits = metadata['commits']
+    is_single_commit = total_commits == 1
+
+    repo_data = {
+        'repository': {
             'name': repo_info['name'],
-            'description':repo_info['description'],
+            'description': repo_info['description'],
             'stars': repo_info['stargazers_count'],
             'forks': repo_info['forks_count'],
-            'watchers_count': len(watchers),
-            'tags': tags,
-            'collaborators': collaborators,
-            'total_commits': len(commits),
+            'open_issues': repo_info['open_issues_count'],
             'created_at': repo_info['created_at'],
             'last_updated': repo_info['updated_at'],
-            'open_issues_count': repo_info['open_issues_count']
-        }, files_content, url = repo_url )
-                    
-        final_analysis = {
-            **repo_data,
-            'ai_analysis': json.loads(ai_analysis),
-            'analysis_date': datetime.now(timezone.utc).isoformat()
+            'is_single_commit': is_single_commit
+        },
+        'commit_activity': {
+            'total_commits': total_commits,
+            'recent_commits': [{'sha': c['sha'][:7], 
+                            'message': c['commit']['message'],
+                            'date': c['commit']['author']['date']} 
+                            for c in commits[:5]],
+            'cadence': commit_history
+        },
+        'languages': metadata['languages'],
+        'contributors': metadata['contributors_count'],
+        'similar_code': similar_code,
+        'secrets': secret_scan,
+        'static_analysis': static_analysis
+    }
+
+    ai_input = {
+        'name': repo_info['name'],
+        'description': repo_info['description'],
+        'stars': repo_info['stargazers_count'],
+        'forks': repo_info['forks_count'],
+        'watchers_count': metadata['watchers_count'],
+        'tags_count': metadata['tags_count'],
+        'collaborators_count': metadata['collaborators_count'],
+        'total_commits': total_commits,
+        'commit_cadence': commit_history,
+        'similar_code': similar_code,
+        'secret_findings': secret_scan['findings'],
+        'static_analysis': static_analysis,
+        'created_at': repo_info['created_at'],
+        'last_updated': repo_info['updated_at'],
+        'open_issues_count': repo_info['open_issues_count']
+    }
+
+    # Keep the score inputs with the report so stored analyses can be rescored
+    repo_data['score_inputs'] = metric_inputs(ai_input, files_content)
+
+    with span('metrics', timings):
+        metrics = generate_metrics(ai_input, files_content, repo_url)
+
+    return {
+        'repo_data': repo_data,
+        'ai_input': ai_input,
+        'metrics': metrics,
+        'files_content': files_content
+    }
+
+
+def context_flags(secret_scan, similar_code, redact_paths=None):
+    """ContextPacker.pack boosts and lines to mask; `redact_paths` limits masking to freshly read files."""
+    # Near-duplicates are the strongest lead for the plagiarism section, then files holding credentials
+    flagged = {path: 4.0 for path in secret_scan['lines']}
+    flagged.update({match['path']: 8.0 for match in similar_code})
+    secret_lines = {path: lines for path, lines in secret_scan['lines'].items()
+                    if redact_paths is None or path in redact_paths}
+    return {'flagged': flagged, 'secret_lines': secret_lines}
+
+
+def describe_context(context, prompt_tokens):
+    """What the prompt was given, for the report."""
+    return {
+        'budget': context['budget'],
+        'tokens': context['tokens'],
+        'prompt_tokens': prompt_tokens,
+        'exact_tokens': context['exact_tokens'],
+        'files_seen': context['files_seen'],
+        'duplicates': context['duplicates'],
+        'files': [{key: file[key] for key in ('path', 'tokens', 'truncated')} for file in context['files']]
+    }
+
+
+def snapshot_state(head_sha, history, weekly, total_commits, files_content, secret_scan, similar_code, context,
+                   static_analysis, rebuilt_at=None):
+    """What an analysis derived, for the next one to build on; the verdict is added once it exists."""
+    return {
+        'head_sha': head_sha,
+        'rebuilt_at': rebuilt_at or time.time(),
+        'history': history.to_state(),
+        'weekly': weekly.to_state() if weekly else None,
+        'total_commits': total_commits,
+        'files_content': files_content,
+        'secrets': secret_scan,
+        'similar_code': similar_code,
+        'static_analysis': static_analysis,
+        # Already minified and masked, so they can be packed again as they are
+        'context_files': [{'path': file['path'], 'content': file['content'].partition('\n')[2]}
+                          for file in context['files']]
+    }
+
+
+def collect_repository_data(repo_url, progress=None, timings=None):
+    """Fetch everything an analysis needs from GitHub.
+
+    Returns "Invalid" for URLs that are not public repositories, otherwise the
+    report's repository data plus the inputs for the AI step and the snapshot
+    a later incremental run can start from. Each fetch and post-processing
+    step is timed into `timings`.
+    """
+    headers = GITHUB_HEADERS
+
+    parts = repository_parts(repo_url)
+    if not parts:
+        return "Invalid"
+    owner, repo = parts
+
+    base_url = f'{GITHUB_API_URL}/repos/{owner}/{repo}'
+
+    # Fan out every independent call at once so the stage costs the slowest
+    # call instead of the sum. A single GraphQL query stands in for the REST
+    # metadata chain; the remaining calls degrade to empty on failure.
+    ingest, consumers = repository_ingest(owner, repo)
+    tasks = {
+        'files_content': (ingest.run, []),
+        'commit_history': (lambda: fetch_commit_history(base_url, headers), (None, None, None)),
+        **metadata_tasks(owner, repo, base_url)
+    }
+    fetched = fetch_stage(tasks, progress, timings)
+    # A run that missed the stage deadline may still be feeding the consumers
+    ingest.finish()
+
+    metadata = resolve_metadata(fetched, repo_url, base_url, progress, timings)
+    if metadata is None:
+        return "Invalid"
+    return build_collected(repo_url, metadata, fetched, consumers, timings)
+
+
+def repository_ingest(owner, repo):
+    """An IngestRun of the repository's files, and the consumers it streams them through for build_collected."""
+    consumers = (SignatureCollector(max_files=SIMILARITY_MAX_FILES), SecretScanner(executor=secret_scan_pool()),
+                 ContextPacker(token_counter, max_candidates=CONTEXT_MAX_CANDIDATES), static_analyzer())
+    ingest = IngestRun(lambda stop: get_repository_files(owner, repo, consumers, stop), timeout=INGEST_TIMEOUT)
+    return ingest, consumers
+
+
+def build_collected(repo_url, metadata, fetched, consumers, timings=None):
+    """collect_repository_data's result from the fetched data and the consumers the files streamed through."""
+    signatures, secrets, packer, analyzer = consumers
+    commit_history, history, weekly = fetched['commit_history']
+    # The REST listing only sees one page, prefer the full count when we have it
+    total_commits = max(metadata['total_commits'], commit_history['total_commits'] if commit_history else 0)
+    files_content = fetched['files_content']
+    with span('similarity', timings):
+        similar_code = find_similar_code(repo_url, signatures.result())
+    with span('secret_scan', timings):
+        secret_scan = secrets.result()
+    with span('static_analysis', timings):
+        static_state = analyzer.result()
+
+    collected = assemble_analysis(repo_url, metadata, commit_history, total_commits, files_content, similar_code,
+                                  secret_scan, summarize(static_state), timings)
+
+    with span('context', timings):
+        context = packer.pack(CONTEXT_TOKEN_BUDGET, **context_flags(secret_scan, similar_code))
+        collected['ai_input']['code_context'] = [file['content'] for file in context['files']]
+
+    with span('ai_prompt', timings):
+        collected['prompt'] = build_analysis_prompt(collected['ai_input'], files_content, repo_url)
+        prompt_tokens = token_counter.count(collected['prompt'])
+    collected['repo_data']['context'] = describe_context(context, prompt_tokens)
+
+    # Without the head commit or the history arrays there is nothing to build on later
+    head_sha = metadata['commits'][0]['sha'] if metadata['commits'] else None
+    if head_sha and history is not None:
+        collected['snapshot'] = snapshot_state(head_sha, history, weekly, total_commits, files_content, secret_scan,
+                                               similar_code, context, static_state)
+    return collected
+
+
+def fetch_file_at(base_url, path, ref):
+    """A file's text at `ref` from the contents API; None for files it won't inline. Raises if the call fails."""
+    response = github_http.get(contents_url(base_url, path), headers=GITHUB_HEADERS, params={'ref': ref},
+                               timeout=GITHUB_TIMEOUT)
+    response.raise_for_status()
+    return file_from_contents(path, response.json())
+
+
+def collect_incremental(repo_url, snapshot, progress=None, timings=None):
+    """collect_repository_data from the repository's snapshot plus what changed since its commit.
+
+    Only the metadata, the compare listing and the changed files are
+    fetched, so a refresh costs what the change costs. An unchanged head
+    reuses the previous verdict via `previous_insights` and has no prompt;
+    otherwise the prompt asks the model to revise that verdict from the
+    delta. Raises IncrementalUnavailable when the change can't be applied,
+    e.g. after a force push or when it touches more than
+    INCREMENTAL_MAX_FILES files.
+    """
+    parts = repository_parts(repo_url)
+    if not parts:
+        return "Invalid"
+    owner, repo = parts
+    base_url = f'{GITHUB_API_URL}/repos/{owner}/{repo}'
+
+    fetched = fetch_stage(metadata_tasks(owner, repo, base_url), progress, timings)
+    metadata = resolve_metadata(fetched, repo_url, base_url, progress, timings)
+    if metadata is None:
+        return "Invalid"
+    head_sha = head_commit(metadata)
+
+    if progress:
+        progress('files', 'running')
+    with span('changes', timings):
+        if head_sha == snapshot['head_sha']:
+            changes = ChangeSet(head_sha, head_sha)
+        else:
+            comparison = fetch_json(f"{base_url}/compare/{snapshot['head_sha']}...{head_sha}", GITHUB_HEADERS)
+            changes = ChangeSet.from_compare(comparison, snapshot['head_sha'], head_sha, INCREMENTAL_MAX_FILES)
+        paths = changes.changed_paths
+        results = run_concurrently({path: (lambda path=path: fetch_file_at(base_url, path, head_sha), False)
+                                    for path in paths})
+        files = changed_files(results, paths)
+    if progress:
+        progress('files', 'done')
+    return build_incremental(repo_url, snapshot, metadata, changes, files, timings)
+
+
+def build_incremental(repo_url, snapshot, metadata, changes, files, timings=None):
+    """collect_incremental's result from the snapshot, the change set and the changed files' new content."""
+    if 'static_analysis' not in snapshot:
+        raise IncrementalUnavailable('snapshot predates static analysis')
+    if 'path_counts' not in snapshot['secrets']:
+        raise IncrementalUnavailable('snapshot predates per-file secret counts')
+    head_sha = changes.head_sha
+    unchanged = head_sha == snapshot['head_sha']
+    touched = changes.touched
+    signatures = SignatureCollector(max_files=SIMILARITY_MAX_FILES)
+    for file in files:
+        signatures.add(file)
+    with span('similarity', timings):
+        similar_code = merge_matches(snapshot['similar_code'],
+                                     update_similar_code(repo_url, signatures.result(), touched), touched)
+    with span('secret_scan', timings):
+        secret_scan = merge_secret_scan(snapshot['secrets'], files, touched)
+    with span('static_analysis', timings):
+        analyzer = static_analyzer()
+        for file in files:
+            analyzer.add(file)
+        static_state = merge_static_analysis(snapshot['static_analysis'], analyzer.result(), touched)
+    files_content = merge_sample(snapshot['files_content'], files, touched, INGEST_SAMPLE_FILES, INGEST_SAMPLE_CHARS)
+
+    with span('cadence', timings):
+        history = CommitHistory.from_state(snapshot['history']).merge(CommitHistory.from_pages([changes.commits]),
+                                                                      limit=COMMIT_HISTORY_MAX)
+        weekly = WeeklyActivity.from_state(snapshot['weekly'])
+        total_commits = max(metadata['total_commits'], snapshot['total_commits'] + len(changes.commits))
+        commit_history = cadence_features(history, weekly, total_commits)
+
+    collected = assemble_analysis(repo_url, metadata, commit_history, total_commits, files_content, similar_code,
+                                  secret_scan, summarize(static_state), timings)
+
+    with span('context', timings):
+        packer = ContextPacker(token_counter, max_candidates=CONTEXT_MAX_CANDIDATES)
+        for file in snapshot['context_files']:
+            if file['path'] not in touched:
+                packer.add(file)
+        for file in files:
+            packer.add(file)
+        # Stored files were masked when first packed, finding lines only apply to the new content
+        context = packer.pack(CONTEXT_TOKEN_BUDGET, **context_flags(secret_scan, similar_code, redact_paths=touched))
+    collected['snapshot'] = snapshot_state(head_sha, history, weekly, total_commits, files_content, secret_scan,
+                                           similar_code, context, static_state, rebuilt_at=snapshot['rebuilt_at'])
+    collected['repo_data']['incremental'] = {
+        'mode': 'unchanged' if unchanged else 'incremental',
+        'base_sha': snapshot['head_sha'],
+        'head_sha': head_sha,
+        'commits': len(changes.commits),
+        'files_changed': len(changes.files),
+        'files_fetched': len(files)
+    }
+
+    if unchanged:
+        collected['previous_insights'] = snapshot['ai_insights']
+        collected['previous_model'] = snapshot.get('ai_model')
+        collected['prompt'] = None
+        collected['repo_data']['context'] = describe_context(context, 0)
+        return collected
+
+    with span('ai_prompt', timings):
+        patches = changes.pack_patches(token_counter, CONTEXT_TOKEN_BUDGET,
+                                       flagged=context_flags(secret_scan, similar_code)['flagged'])
+        collected['ai_input']['code_context'] = [file['content'] for file in patches['files']]
+        collected['prompt'] = build_update_prompt(collected['ai_input'], repo_url, snapshot['ai_insights'], changes)
+        prompt_tokens = token_counter.count(collected['prompt'])
+    collected['repo_data']['context'] = describe_context(patches, prompt_tokens)
+    return collected
+
+
+def load_snapshot(repo_url):
+    if not INCREMENTAL_ANALYSIS:
+        return None
+    try:
+        # Collection may run on a helper thread, so take our own app context
+        with app.app_context():
+            return snapshot_store.get(get_repo_hash(repo_url))
+    except Exception as e:
+        print(f"Error loading analysis snapshot: {str(e)}")
+        return None
+
+
+def save_snapshot(repo_url, collected, ai_analysis):
+    """Keep what an analysis derived for the next one, unless it reused a verdict or got none."""
+    snapshot = collected.get('snapshot')
+    if not INCREMENTAL_ANALYSIS or not snapshot or 'previous_insights' in collected \
+            or ai_analysis.get('ai_insights') in (None, AI_UNAVAILABLE):
+        return
+    try:
+        with app.app_context():
+            snapshot_store.set(get_repo_hash(repo_url), normalize_repo_url(repo_url),
+                               {**snapshot, 'ai_insights': ai_analysis['ai_insights'],
+                                'ai_model': ai_analysis.get('model')})
+    except Exception as e:
+        print(f"Error saving analysis snapshot: {str(e)}")
+
+
+def collect_analysis(repo_url, progress=None, timings=None, force_refresh=False):
+    """collect_incremental when the repository has a usable snapshot, otherwise collect_repository_data.
+
+    A forced refresh always runs in full, so it gets a new verdict even when nothing was pushed.
+    """
+    snapshot = None if force_refresh else load_snapshot(repo_url)
+    reason = 'refresh requested' if force_refresh else None
+    if snapshot:
+        try:
+            return collect_incremental(repo_url, snapshot, progress, timings)
+        except IncrementalUnavailable as e:
+            reason = str(e)
+            print(f"Running a full analysis of {repo_url}: {reason}")
+
+    return record_full_run(collect_repository_data(repo_url, progress, timings), reason)
+
+
+def record_full_run(collected, reason=None):
+    """Note in the report that `collected` came from a full analysis, and why an incremental one wasn't used."""
+    if collected != "Invalid":
+        collected['repo_data']['incremental'] = {
+            'mode': 'full',
+            'head_sha': (collected.get('snapshot') or {}).get('head_sha'),
+            'reason': reason
         }
-        
-        print("Final Analysis Structure:", {
-            'keys': list(final_analysis.keys()),
-            'has_plagiarism': 'plagiarism_analysis' in final_analysis,
-            'plagiarism_type': type(final_analysis.get('plagiarism_analysis')).__name__
-        })
-        
-        return final_analysis
+    return collected
+
+
+def finalize_analysis(repo_data, ai_analysis):
+    return {
+        **repo_data,
+        'ai_analysis': ai_analysis,
+        'analysis_date': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def reused_analysis(collected, progress=None):
+    """The finished analysis when nothing was pushed since the last one, so its verdict still stands; otherwise None."""
+    if 'previous_insights' not in collected:
+        return None
+    if progress:
+        progress('ai', 'done')
+    return finalize_analysis(collected['repo_data'],
+                             build_ai_analysis(collected['previous_insights'], collected['metrics'],
+                                               model=collected['previous_model']))
+
+
+def analyze_repository(repo_url, progress=None, timings=None, force_refresh=False):
+    try:
+        with span('collect', timings):
+            collected = collect_analysis(repo_url, progress=progress, timings=timings, force_refresh=force_refresh)
+        if collected == "Invalid":
+            return "Invalid"
+
+        reused = reused_analysis(collected, progress)
+        if reused:
+            return reused
+
+        if progress:
+            progress('ai', 'running')
+        with span('ai', timings):
+            ai_analysis = json.loads(analyze_code_with_ai(collected['ai_input'], collected['files_content'],
+                                                          url = repo_url, metrics=collected['metrics'],
+                                                          timings=timings, prompt=collected['prompt']))
+        if progress:
+            progress('ai', 'done')
+
+        save_snapshot(repo_url, collected, ai_analysis)
+        return finalize_analysis(collected['repo_data'], ai_analysis)
     except Exception as e:
         print(e)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    logger.debug(f"Requested path: {path}")
-    logger.debug(f"Static folder: {app.static_folder}")
-    logger.debug(f"Directory contents: {os.listdir(app.static_folder) if os.path.exists(app.static_folder) else 'Directory not found'}")
-    
-    if path and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, 'index.html')
+    if path.startswith('api/'):
+        return jsonify(error='Not found'), 404
+    response = static_assets.respond(path, request.headers)
+    if response is None:
+        return jsonify(error='Frontend build not found'), 404
+    return response
 
 @app.errorhandler(404)
 def not_found(e):
     if request.path.startswith('/api/'):
         return jsonify(error=str(e)), 404
-    
-    logger.error(f"404 error for path: {request.path}")
-    logger.error(f"Static folder exists: {os.path.exists(app.static_folder)}")
-    if os.path.exists(app.static_folder):
-        logger.error(f"Static folder contents: {os.listdir(app.static_folder)}")
-    
-    try:
-        return send_from_directory(app.static_folder, 'index.html')
-    except Exception as err:
-        logger.error(f"Error serving static file: {str(err)}")
-        return jsonify(error=f"Static file error: {str(err)}"), 500
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze():
-    # Get the GitHub token from an environment variable
-    token = os.getenv('GITHUB_PAT')
-    if not token:
+    logger.info(f"404 error for path: {request.path}")
+    response = static_assets.respond('', request.headers)
+    if response is None:
+        return jsonify(error='Frontend build not found'), 404
+    return response
+
+class AnalysisError(Exception):
+    """An analysis that could not be produced, with the HTTP status to report."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def authenticate_github():
+    """Return the login analyses are recorded under, raising AnalysisError if no token is valid.
+
+    Identities are cached by the token pool, so this only reaches GitHub the
+    first time and on the pool's background refresh.
+    """
+    if not github_tokens.tokens:
         raise Exception('GitHub PAT not found. Ensure it is set in the environment.')
-    
-    try:
-        # Github authentication check
-        headers = {
-            'Authorization': f'token {token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        user_response = requests.get('https://api.github.com/user', headers=headers)
-        if user_response.status_code != 200:
-            return jsonify({'error': 'GitHub authentication failed'}), 401
-            
-        user_data = user_response.json()
-        username = user_data['login']
-        
-        # Get repository URL
-        repo_url = request.json.get('repo_url')
-        if not repo_url:
-            return jsonify({'error': 'Repository URL is required'}), 400
-                
-        analysis = analyze_repository(repo_url)
+    username = github_tokens.username()
+    if not username:
+        raise AnalysisError('GitHub authentication failed', 401)
+    return username
+
+
+def run_analysis(repo_url, force_refresh=False, progress=None, username=None):
+    """Produce the response body for a repository, from the cache when possible.
+
+    Pass `username` when the pool was already checked, as batches do once for
+    every repository. Raises AnalysisError when the analysis cannot be produced.
+    """
+    # Serve repeat lookups from the cache unless the caller asks for a fresh run
+    repo_hash = get_repo_hash(repo_url)
+    if not force_refresh:
+        cached = lookup_analysis(repo_hash)
+        if cached:
+            return cached_body(cached)
+
+    requested_at = time.time()
+    with single_flight.lead(repo_hash):
+        # Another request may have finished this repository while we waited
+        cached = lookup_analysis(repo_hash, newer_than=requested_at if force_refresh else 0)
+        if cached:
+            return cached_body(cached)
+
+        username = username or authenticate_github()
+        timings = Timings()
+        with span('analysis', timings):
+            analysis = analyze_repository(repo_url, progress=progress, timings=timings, force_refresh=force_refresh)
 
         if not analysis:
-            return jsonify({'error': 'Analysis failed'}), 500
-            
+            ANALYSES.labels(outcome='failed').inc()
+            raise AnalysisError('Analysis failed')
+
         if analysis == 'Invalid':
-            return jsonify({'error': 'Invalid GitHub Repository'}), 500
-                
-        response_data = {
+            ANALYSES.labels(outcome='invalid').inc()
+            raise AnalysisError('Invalid GitHub Repository')
+
+        payload = {
             'analysis': analysis,
-            'cached': False,
             'analyzed_by': username,
             'analyzed_at': datetime.now(timezone.utc).isoformat()
         }
-        
-        return jsonify(response_data)
-        
+        analysis_cache.set(repo_hash, normalize_repo_url(repo_url), payload)
+    ANALYSES.labels(outcome='ok').inc()
+
+    # Timings describe this run only, so they are left out of the cached payload
+    return {**payload, 'cached': False, 'cache_age': 0, 'timings': timings.breakdown()}
+
+
+def lookup_analysis(repo_hash, newer_than=0):
+    """analysis_cache.get, counted as a cache hit or miss."""
+    cached = analysis_cache.get(repo_hash, newer_than=newer_than)
+    CACHE_LOOKUPS.labels(cache='analysis', result='hit' if cached else 'miss').inc()
+    if cached:
+        ANALYSES.labels(outcome='cached').inc()
+    return cached
+
+
+def cached_body(cached):
+    payload, cached_at = cached
+    return {
+        **payload,
+        'cached': True,
+        'cache_age': round(time.time() - cached_at, 1)
+    }
+
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze():
+    try:
+        # Get repository URL
+        repo_url = request.json.get('repo_url')
+        if not repo_url:
+            return jsonify({'error': 'Repository URL is required'}), 400
+        force_refresh = bool(request.json.get('force_refresh'))
+
+        # Job mode: hand the analysis to the background pool and return at once
+        if request.json.get('async'):
+            job = job_runner.submit(repo_url, lambda progress: run_analysis(repo_url, force_refresh, progress))
+            if not job:
+                return jsonify({'error': 'Too many analyses queued, try again shortly'}), 503
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/analyze/{job.id}',
+                'events_url': f'/api/analyze/{job.id}/events'
+            }), 202
+
+        return jsonify(run_analysis(repo_url, force_refresh))
+
+    except AnalysisError as e:
+        return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         print(f"Error in analyze route: {str(e)}")
         traceback.print_exc()  # Print full stack trace
         return jsonify({'error': str(e)}), 500
 
 
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Server-sent events for one analysis.
+
+    Emits `progress` per stage, `grade` as soon as the first tokens name it,
+    `token` for each text delta of the verdict, then `result` with the same
+    body /api/analyze returns. Failures end the stream with an `error` event.
+    """
+    repo_url = request.json.get('repo_url')
+    if not repo_url:
+        return jsonify({'error': 'Repository URL is required'}), 400
+    force_refresh = bool(request.json.get('force_refresh'))
+
+    def generate():
+        try:
+            repo_hash = get_repo_hash(repo_url)
+            if not force_refresh:
+                cached = lookup_analysis(repo_hash)
+                if cached:
+                    yield sse_event('result', cached_body(cached))
+                    return
+
+            requested_at = time.time()
+            with single_flight.lead(repo_hash):
+                cached = lookup_analysis(repo_hash, newer_than=requested_at if force_refresh else 0)
+                if cached:
+                    yield sse_event('result', cached_body(cached))
+                    return
+
+                username = authenticate_github()
+                timings = Timings()
+                started = time.perf_counter()
+
+                # Collect on a helper thread so stage progress can be forwarded live
+                events = queue.Queue()
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(timed('collect', lambda: collect_analysis(
+                        repo_url, lambda stage, state: events.put({'stage': stage, 'state': state}), timings,
+                        force_refresh
+                    ), timings))
+                    while not (future.done() and events.empty()):
+                        try:
+                            yield sse_event('progress', events.get(timeout=0.1))
+                        except queue.Empty:
+                            continue
+                    collected = future.result()
+
+                if collected == "Invalid":
+                    ANALYSES.labels(outcome='invalid').inc()
+                    raise AnalysisError('Invalid GitHub Repository')
+
+                if 'previous_insights' in collected:
+                    # Nothing was pushed since the last analysis, so its verdict is replayed as is
+                    analysis_text = collected['previous_insights']
+                    model = collected['previous_model']
+                    yield sse_event('grade', {'grade': parse_grade(analysis_text)})
+                    yield sse_event('token', {'text': analysis_text})
+                    yield sse_event('progress', {'stage': 'ai', 'state': 'done'})
+                else:
+                    yield sse_event('progress', {'stage': 'ai', 'state': 'running'})
+                    chunks = []
+                    grade = None
+                    completion = stream_code_with_ai(collected['ai_input'], collected['files_content'], url=repo_url,
+                                                     prompt=collected['prompt'])
+                    with span('ai', timings):
+                        for delta in completion:
+                            chunks.append(delta)
+                            if not grade:
+                                head = ''.join(chunks)
+                                grade = parse_grade(head, default=None) or (parse_grade(head) if len(head) >= 25 else None)
+                                if grade:
+                                    yield sse_event('grade', {'grade': grade})
+                            yield sse_event('token', {'text': delta})
+                    analysis_text = ''.join(chunks)
+                    model = completion.model
+                    if not grade:
+                        yield sse_event('grade', {'grade': parse_grade(analysis_text)})
+                    yield sse_event('progress', {'stage': 'ai', 'state': 'done'})
+
+                payload = {
+                    'analysis': finalize_analysis(collected['repo_data'],
+                                                  build_ai_analysis(analysis_text, collected['metrics'], model=model)),
+                    'analyzed_by': username,
+                    'analyzed_at': datetime.now(timezone.utc).isoformat()
+                }
+                analysis_cache.set(repo_hash, normalize_repo_url(repo_url), payload)
+                save_snapshot(repo_url, collected, payload['analysis']['ai_analysis'])
+                observe('analysis', time.perf_counter() - started, timings)
+            ANALYSES.labels(outcome='ok').inc()
+
+            yield sse_event('result', {**payload, 'cached': False, 'cache_age': 0, 'timings': timings.breakdown()})
+        except AnalysisError as e:
+            yield sse_event('error', {'error': e.message})
+        except Exception as e:
+            ANALYSES.labels(outcome='failed').inc()
+            print(f"Error in analyze stream: {str(e)}")
+            traceback.print_exc()
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/analyze/<job_id>', methods=['GET'])
+def analysis_job(job_id):
+    job = db.session.get(AnalysisJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/analyze/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """Server-sent events: a `progress` event per stage change, then `result` or `error`."""
+    if not db.session.get(AnalysisJob, job_id):
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        last_stages = None
+        while True:
+            # End the read transaction so the next poll sees other workers' writes
+            db.session.rollback()
+            job = db.session.get(AnalysisJob, job_id).to_dict()
+            if job['stages'] != last_stages:
+                last_stages = job['stages']
+                yield sse_event('progress', {'status': job['status'], 'stages': job['stages']})
+            if job['status'] == 'done':
+                yield sse_event('result', job['result'])
+                return
+            if job['status'] == 'failed':
+                yield sse_event('error', {'error': job['error']})
+                return
+            time.sleep(0.5)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def analyze_batch_repos(repo_urls, username, force_refresh=False, workers=BATCH_WORKERS):
+    """Run a batch through the scheduler, yielding a record per repository as each finishes."""
+    def analyze_one(repo_url):
+        with app.app_context():
+            return run_analysis(repo_url, force_refresh, username=username)
+
+    scheduler = BatchScheduler(
+        analyze_one,
+        limits=[(github_tokens, BATCH_GITHUB_COST), (llm_limit, 1)],
+        max_workers=workers
+    )
+    return scheduler.run(repo_urls)
+
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a list of repositories, streaming one NDJSON line per repository.
+
+    The response lasts as long as the whole batch; it holds one gthread
+    thread (see gunicorn.conf.py) rather than a worker for that long.
+    """
+    try:
+        repo_urls = request.json.get('repo_urls')
+        if not isinstance(repo_urls, list) or not repo_urls or not all(isinstance(url, str) for url in repo_urls):
+            return jsonify({'error': 'repo_urls must be a non-empty list of repository URLs'}), 400
+        repo_urls = read_repo_urls(repo_urls)
+        if len(repo_urls) > BATCH_MAX_REPOS:
+            return jsonify({'error': f'At most {BATCH_MAX_REPOS} repositories per batch'}), 400
+        force_refresh = bool(request.json.get('force_refresh'))
+        username = authenticate_github()
+
+    except AnalysisError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        print(f"Error in batch route: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+    records = analyze_batch_repos(repo_urls, username, force_refresh)
+    return Response(
+        stream_with_context(json.dumps(record) + '\n' for record in records),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.cli.command('analyze-batch')
+@click.argument('input_file', type=click.File('r'))
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='NDJSON file to append results to. Repositories already analyzed in it are skipped.')
+@click.option('--force-refresh', is_flag=True, help='Ignore cached analyses.')
+@click.option('--workers', type=int, default=BATCH_WORKERS, show_default=True, help='Repositories analyzed at once.')
+def analyze_batch_command(input_file, output, force_refresh, workers):
+    """Analyze every repository URL in INPUT_FILE, one per line (- for stdin).
+
+    Each result is written as soon as it finishes, so an interrupted batch
+    picks up where it stopped when run again with the same --output.
+    """
+    repo_urls = read_repo_urls(input_file)
+    if output:
+        done = completed_repo_urls(output)
+        if done:
+            click.echo(f"Skipping {len(done)} repositories already in {output}", err=True)
+        repo_urls = [repo_url for repo_url in repo_urls if repo_url not in done]
+
+    try:
+        username = authenticate_github()
+    except AnalysisError as e:
+        raise click.ClickException(e.message)
+
+    out = open_results(output) if output else click.get_text_stream('stdout')
+    try:
+        for index, record in enumerate(analyze_batch_repos(repo_urls, username, force_refresh, workers), 1):
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            click.echo(f"[{index}/{len(repo_urls)}] {record['status']} {record['repo_url']} ({record['elapsed']}s)", err=True)
+    finally:
+        if output:
+            out.close()
+
+
+@app.cli.command('rescore')
+@click.option('--dry-run', is_flag=True, help='Report rating changes without saving them.')
+def rescore_command(dry_run):
+    """Recompute the deterministic score of every stored analysis.
+
+    Run after tuning the weights in backend/metrics.py; the LLM verdict is
+    kept as it is. Running servers pick the new scores up as their in-memory
+    cache entries expire.
+    """
+    rows = AnalysisResult.query.all()
+    payloads = [json.loads(row.payload) for row in rows]
+    scorable = [(row, payload) for row, payload in zip(rows, payloads) if payload['analysis'].get('score_inputs')]
+    if not scorable:
+        click.echo("No stored analyses with score inputs")
+        return
+
+    started = time.perf_counter()
+    results = score_rows([payload['analysis']['score_inputs'] for _, payload in scorable])
+    elapsed = time.perf_counter() - started
+
+    changed = 0
+    for (row, payload), metrics in zip(scorable, results):
+        ai_analysis = payload['analysis']['ai_analysis']
+        if ai_analysis.get('score') != metrics['score']:
+            changed += 1
+        if not dry_run:
+            ai_analysis.update(metrics)
+            row.payload = json.dumps(payload)
+    db.session.commit()
+    click.echo(f"Rescored {len(scorable)} analyses in {elapsed:.3f}s, {changed} ratings changed"
+               + (" (dry run)" if dry_run else ""))
+
+
+@app.route('/api/github/tokens', methods=['GET'])
+def github_token_health():
+    """Validity and remaining quota of each pooled GitHub token."""
+    return jsonify(github_tokens.snapshot())
+
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({'github_http': github_http.stats()}), 200
+
+
 @app.route('/health')
 def health_check():
     return jsonify({"status": "healthy"}), 200
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus exposition of stage latencies, GitHub and LLM usage, cache hits and errors."""
+    body, content_type = render()
+    return Response(body, content_type=content_type)
     
 
 if __name__ == '__main__':
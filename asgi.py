@@ -0,0 +1,378 @@
+"""ASGI entry point that runs analyses on the event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8080
+
+POST /api/analyze is served natively: every GitHub and OpenRouter call of an
+analysis is awaited on the worker's event loop, so an analysis holds no
+thread while it waits and one worker keeps hundreds in flight. The steps
+that block (archive ingestion, database access, scoring and prompt
+packing) run on bounded thread pools. Every other route, including job
+mode and the event streams, is the Flask app behind WsgiToAsgi. The
+gunicorn entry point, app:app, serves the same routes synchronously.
+"""
+import asyncio
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (AI_UNAVAILABLE, COMMIT_HISTORY_MAX, FETCH_STAGE_TIMEOUT, FETCH_STAGES, GITHUB_API_URL, GITHUB_GRAPHQL,
+                 GITHUB_HEADERS, INCREMENTAL_MAX_FILES,
+                 AnalysisError, analysis_cache, app, authenticate_github, build_ai_analysis, build_collected,
+                 build_incremental, cached_body, finalize_analysis, get_repo_hash, github_async, github_http,
+                 llm_async, llm_client, load_snapshot, lookup_analysis, normalize_repo_url, record_full_run,
+                 repository_ingest, repository_parts, repository_scraper, reused_analysis, save_snapshot,
+                 single_flight)
+from backend.github_graphql import fetch_repository_metadata_async
+from backend.github_rest import (cadence_result, commit_history, commit_page_tasks, contents_url, count_from_response,
+                                 file_from_contents, graphql_metadata, graphql_tasks, needs_weekly_stats,
+                                 rest_metadata, rest_metadata_tasks)
+from backend.incremental import ChangeSet, IncrementalUnavailable, changed_files, head_commit
+from backend.jobs import StageTracker
+from backend.telemetry import ANALYSES, Timings, span, timed_async
+
+# Archives are parsed as they download, so each ingestion holds a thread; at most this many run at once
+ingest_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASYNC_INGEST_WORKERS', 4 * (os.cpu_count() or 1))),
+                                     thread_name_prefix='ingest')
+
+flask_application = WsgiToAsgi(app)
+
+
+async def in_app_context(func, *args):
+    """Run a blocking call that needs the database on the default thread pool."""
+    def run():
+        with app.app_context():
+            return func(*args)
+    return await asyncio.to_thread(run)
+
+
+async def fetch_json_async(url, headers, params=None, default=None):
+    """GET a GitHub endpoint and return its JSON body, or `default` if the call fails."""
+    try:
+        response = await github_http.aget(github_async, url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        # httpx timeouts carry no message
+        print(f"Error fetching {url}: {str(e) or type(e).__name__}")
+        return default
+
+
+async def count_items_async(url, headers, params=None):
+    """count_items over the async client."""
+    response = await github_http.aget(github_async, url, headers=headers, params={**(params or {}), 'per_page': 1})
+    return count_from_response(response)
+
+
+async def run_concurrently_async(tasks, timeout=FETCH_STAGE_TIMEOUT, on_complete=None):
+    """run_concurrently for coroutine functions, which all share the event loop.
+
+    Calls that miss the stage deadline are cancelled instead of left to
+    their per-call timeouts.
+    """
+    if not tasks:
+        return {}
+
+    futures = {name: asyncio.ensure_future(func()) for name, (func, _) in tasks.items()}
+    if on_complete:
+        for name, future in futures.items():
+            future.add_done_callback(lambda _, name=name: on_complete(name))
+    await asyncio.wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        default = tasks[name][1]
+        if not future.done():
+            print(f"Timed out fetching {name}")
+            future.cancel()
+            results[name] = default
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"Error fetching {name}: {str(e) or type(e).__name__}")
+            results[name] = default
+    return results
+
+
+async def fetch_stage_async(tasks, progress, timings=None):
+    tracker = StageTracker(progress, {name: FETCH_STAGES[name] for name in tasks})
+    tracker.start()
+    tasks = {name: (timed_async(name, func, timings), default) for name, (func, default) in tasks.items()}
+    fetched = await run_concurrently_async(tasks, on_complete=tracker.complete)
+    tracker.finish()
+    return fetched
+
+
+async def fetch_commit_history_async(base_url, headers):
+    total_commits = await count_items_async(f'{base_url}/commits', headers)
+    history = commit_history(await run_concurrently_async(
+        commit_page_tasks(base_url, headers, fetch_json_async, total_commits, COMMIT_HISTORY_MAX)))
+
+    stats = None
+    if needs_weekly_stats(history, total_commits):
+        stats = await fetch_json_async(f'{base_url}/stats/contributors', headers, default=[])
+    return cadence_result(history, stats, total_commits)
+
+
+async def fetch_rest_metadata_async(repo_url, base_url, headers, progress=None, timings=None):
+    """fetch_rest_metadata; the visibility check's response doubles as the repository info."""
+    with span('visibility', timings):
+        try:
+            response = await github_http.aget(github_async, base_url, headers=headers)
+        except Exception as e:
+            print(f"Error checking repository visibility: {str(e)}")
+            return None
+    if response.status_code != 200:
+        return None
+
+    fetched = await fetch_stage_async({
+        # The scraper parses pages synchronously and keeps its own cache
+        'scraped_info': (lambda: asyncio.to_thread(repository_scraper.scrape, repo_url), None),
+        **rest_metadata_tasks(base_url, headers, fetch_json_async, count_items_async)
+    }, progress, timings)
+    fetched['repo_info'] = response.json()
+    return rest_metadata(fetched, base_url)
+
+
+def metadata_tasks_async(owner, repo, base_url):
+    if not GITHUB_GRAPHQL:
+        return {}
+    return graphql_tasks(lambda: fetch_repository_metadata_async(owner, repo, github_async,
+                                                                 url=f'{GITHUB_API_URL}/graphql'),
+                         base_url, GITHUB_HEADERS, count_items_async)
+
+
+async def resolve_metadata_async(fetched, repo_url, base_url, progress=None, timings=None):
+    metadata = graphql_metadata(fetched)
+    if metadata is False:
+        print(f"Falling back to REST metadata for {base_url}")
+        return await fetch_rest_metadata_async(repo_url, base_url, GITHUB_HEADERS, progress, timings)
+    return metadata
+
+
+async def collect_repository_data_async(repo_url, progress=None, timings=None):
+    parts = repository_parts(repo_url)
+    if not parts:
+        return "Invalid"
+    owner, repo = parts
+    base_url = f'{GITHUB_API_URL}/repos/{owner}/{repo}'
+
+    ingest, consumers = repository_ingest(owner, repo)
+    loop = asyncio.get_running_loop()
+    tasks = {
+        # Cancelling the future doesn't stop a running thread, ingest.finish below does
+        'files_content': (lambda: loop.run_in_executor(ingest_executor, ingest.run), []),
+        'commit_history': (lambda: fetch_commit_history_async(base_url, GITHUB_HEADERS), (None, None, None)),
+        **metadata_tasks_async(owner, repo, base_url)
+    }
+    fetched = await fetch_stage_async(tasks, progress, timings)
+    await asyncio.to_thread(ingest.finish)
+
+    metadata = await resolve_metadata_async(fetched, repo_url, base_url, progress, timings)
+    if metadata is None:
+        return "Invalid"
+    return await asyncio.to_thread(build_collected, repo_url, metadata, fetched, consumers, timings)
+
+
+async def fetch_file_at_async(base_url, path, ref):
+    response = await github_http.aget(github_async, contents_url(base_url, path), headers=GITHUB_HEADERS,
+                                      params={'ref': ref})
+    response.raise_for_status()
+    return file_from_contents(path, response.json())
+
+
+async def collect_incremental_async(repo_url, snapshot, progress=None, timings=None):
+    parts = repository_parts(repo_url)
+    if not parts:
+        return "Invalid"
+    owner, repo = parts
+    base_url = f'{GITHUB_API_URL}/repos/{owner}/{repo}'
+
+    fetched = await fetch_stage_async(metadata_tasks_async(owner, repo, base_url), progress, timings)
+    metadata = await resolve_metadata_async(fetched, repo_url, base_url, progress, timings)
+    if metadata is None:
+        return "Invalid"
+    head_sha = head_commit(metadata)
+
+    if progress:
+        progress('files', 'running')
+    with span('changes', timings):
+        if head_sha == snapshot['head_sha']:
+            changes = ChangeSet(head_sha, head_sha)
+        else:
+            comparison = await fetch_json_async(f"{base_url}/compare/{snapshot['head_sha']}...{head_sha}",
+                                                GITHUB_HEADERS)
+            changes = ChangeSet.from_compare(comparison, snapshot['head_sha'], head_sha, INCREMENTAL_MAX_FILES)
+        paths = changes.changed_paths
+        results = await run_concurrently_async({
+            path: (lambda path=path: fetch_file_at_async(base_url, path, head_sha), False) for path in paths
+        })
+        files = changed_files(results, paths)
+    if progress:
+        progress('files', 'done')
+    return await asyncio.to_thread(build_incremental, repo_url, snapshot, metadata, changes, files, timings)
+
+
+async def collect_analysis_async(repo_url, progress=None, timings=None, force_refresh=False):
+    snapshot = None if force_refresh else await asyncio.to_thread(load_snapshot, repo_url)
+    reason = 'refresh requested' if force_refresh else None
+    if snapshot:
+        try:
+            return await collect_incremental_async(repo_url, snapshot, progress, timings)
+        except IncrementalUnavailable as e:
+            reason = str(e)
+            print(f"Running a full analysis of {repo_url}: {reason}")
+
+    return record_full_run(await collect_repository_data_async(repo_url, progress, timings), reason)
+
+
+async def analyze_code_with_ai_async(collected, timings=None):
+    try:
+        with span('ai_request', timings):
+            completion = await llm_client.acomplete([{"role": "user", "content": collected['prompt']}])
+        return build_ai_analysis(completion['text'], collected['metrics'], model=completion['model'])
+    except Exception as e:
+        print(f"Error in AI analysis: {str(e)}")
+        return {**build_ai_analysis(AI_UNAVAILABLE, collected['metrics']), "grade": None}
+
+
+async def analyze_repository_async(repo_url, progress=None, timings=None, force_refresh=False):
+    try:
+        with span('collect', timings):
+            collected = await collect_analysis_async(repo_url, progress=progress, timings=timings,
+                                                     force_refresh=force_refresh)
+        if collected == "Invalid":
+            return "Invalid"
+
+        reused = reused_analysis(collected, progress)
+        if reused:
+            return reused
+
+        if progress:
+            progress('ai', 'running')
+        with span('ai', timings):
+            ai_analysis = await analyze_code_with_ai_async(collected, timings)
+        if progress:
+            progress('ai', 'done')
+
+        await asyncio.to_thread(save_snapshot, repo_url, collected, ai_analysis)
+        return finalize_analysis(collected['repo_data'], ai_analysis)
+    except Exception as e:
+        print(e)
+
+
+async def run_analysis_async(repo_url, force_refresh=False):
+    """run_analysis on the event loop. Raises AnalysisError when the analysis cannot be produced."""
+    repo_hash = get_repo_hash(repo_url)
+    if not force_refresh:
+        cached = await in_app_context(lookup_analysis, repo_hash)
+        if cached:
+            return cached_body(cached)
+
+    requested_at = time.time()
+    async with single_flight.alead(repo_hash):
+        # Another request may have finished this repository while we waited
+        cached = await in_app_context(lookup_analysis, repo_hash, requested_at if force_refresh else 0)
+        if cached:
+            return cached_body(cached)
+
+        username = await asyncio.to_thread(authenticate_github)
+        timings = Timings()
+        with span('analysis', timings):
+            analysis = await analyze_repository_async(repo_url, timings=timings, force_refresh=force_refresh)
+
+        if not analysis:
+            ANALYSES.labels(outcome='failed').inc()
+            raise AnalysisError('Analysis failed')
+
+        if analysis == 'Invalid':
+            ANALYSES.labels(outcome='invalid').inc()
+            raise AnalysisError('Invalid GitHub Repository')
+
+        payload = {
+            'analysis': analysis,
+            'analyzed_by': username,
+            'analyzed_at': datetime.now(timezone.utc).isoformat()
+        }
+        await in_app_context(analysis_cache.set, repo_hash, normalize_repo_url(repo_url), payload)
+    ANALYSES.labels(outcome='ok').inc()
+
+    return {**payload, 'cached': False, 'cache_age': 0, 'timings': timings.breakdown()}
+
+
+async def analyze(body):
+    """`(status, body)` for a POST /api/analyze outside job mode, as the Flask route answers it."""
+    repo_url = body.get('repo_url')
+    if not repo_url:
+        return 400, {'error': 'Repository URL is required'}
+    try:
+        return 200, await run_analysis_async(repo_url, bool(body.get('force_refresh')))
+    except AnalysisError as e:
+        return e.status_code, {'error': e.message}
+    except Exception as e:
+        print(f"Error in analyze route: {str(e)}")
+        traceback.print_exc()
+        return 500, {'error': str(e)}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+def replay_body(body, receive):
+    """`receive` that hands an already-read body to the next application first."""
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def replay():
+        return pending.pop() if pending else await receive()
+    return replay
+
+
+async def send_json(send, status, body):
+    payload = f'{app.json.dumps(body)}\n'.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await github_async.aclose()
+            await llm_async.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/analyze':
+        body = await read_body(receive)
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            payload = None
+        # Job mode and malformed bodies get the Flask route's handling
+        if isinstance(payload, dict) and not payload.get('async'):
+            return await send_json(send, *await analyze(payload))
+        receive = replay_body(body, receive)
+
+    await flask_application(scope, receive, send)
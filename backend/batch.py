@@ -0,0 +1,92 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class BatchScheduler:
+    """Analyze many repositories with bounded concurrency, paced by rate limits.
+
+    `limits` pairs each RateLimit with what one repository is expected to cost
+    against it. Each repository takes its share of every budget before it
+    starts, so a batch slows down as a budget runs low and resumes when the
+    window resets, rather than failing halfway through.
+    """
+
+    def __init__(self, analyze, limits=(), max_workers=4):
+        self.analyze = analyze
+        self.limits = limits
+        self.max_workers = max_workers
+
+    def run(self, repo_urls):
+        """Yield one record per repository, in completion order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for repo_url in repo_urls:
+                # Only start work when a slot frees up, so pacing applies to every start
+                while len(pending) >= self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                for limit, cost in self.limits:
+                    limit.acquire(cost)
+                pending.add(executor.submit(self._analyze_one, repo_url))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def _analyze_one(self, repo_url):
+        started = time.monotonic()
+        try:
+            record = {'repo_url': repo_url, 'status': 'ok', 'result': self.analyze(repo_url)}
+        except Exception as e:
+            record = {'repo_url': repo_url, 'status': 'error', 'error': getattr(e, 'message', str(e))}
+        record['elapsed'] = round(time.monotonic() - started, 2)
+        return record
+
+
+def read_repo_urls(lines):
+    """Repository URLs from text lines, skipping blanks, comments and repeats."""
+    seen = set()
+    repo_urls = []
+    for line in lines:
+        repo_url = line.strip()
+        if repo_url and not repo_url.startswith('#') and repo_url not in seen:
+            seen.add(repo_url)
+            repo_urls.append(repo_url)
+    return repo_urls
+
+
+def completed_repo_urls(path):
+    """URLs already analyzed successfully in an NDJSON results file, for resuming a batch."""
+    done = set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half written
+                    continue
+                if record.get('status') == 'ok':
+                    done.add(record['repo_url'])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def open_results(path):
+    """Open an NDJSON results file for appending, one record per line."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            partial = f.read(1) != b'\n'
+    except OSError:
+        # Missing or empty
+        partial = False
+    f = open(path, 'a', encoding='utf-8')
+    # Start on a fresh line if a crash cut the last record short
+    if partial:
+        f.write('\n')
+    return f
@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from backend.models import db, AnalysisResult
+
+
+class AnalysisCache:
+    """Two-tier cache of finished analyses.
+
+    An in-process LRU answers hot repositories without touching the database;
+    the database tier is shared by every gunicorn worker and survives restarts.
+    Entries older than `ttl` seconds are treated as missing in both tiers.
+    """
+
+    def __init__(self, ttl=6 * 3600, max_entries=256, max_rows=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, repo_hash, newer_than=0):
+        """Return `(payload, cached_at)` for a fresh entry, or None.
+
+        `newer_than` ignores entries cached before that timestamp, which lets a
+        caller pick up a result another worker produced while it was waiting.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(repo_hash)
+            if entry:
+                if now - entry[1] >= self.ttl:
+                    del self._entries[repo_hash]
+                elif entry[1] >= newer_than:
+                    self._entries.move_to_end(repo_hash)
+                    return entry
+
+        row = db.session.get(AnalysisResult, repo_hash)
+        if not row or now - row.cached_at >= self.ttl or row.cached_at < newer_than:
+            return None
+
+        entry = (json.loads(row.payload), row.cached_at)
+        self._remember(repo_hash, entry)
+        return entry
+
+    def set(self, repo_hash, repo_url, payload):
+        """Store a payload in both tiers and prune the database tier."""
+        cached_at = time.time()
+        db.session.merge(AnalysisResult(
+            repo_hash=repo_hash,
+            repo_url=repo_url,
+            payload=json.dumps(payload),
+            cached_at=cached_at
+        ))
+        db.session.commit()
+        self._remember(repo_hash, (payload, cached_at))
+        self.prune()
+
+    def invalidate(self, repo_hash):
+        with self._lock:
+            self._entries.pop(repo_hash, None)
+        AnalysisResult.query.filter_by(repo_hash=repo_hash).delete()
+        db.session.commit()
+
+    def prune(self):
+        """Drop expired rows, then the oldest rows beyond `max_rows`."""
+        AnalysisResult.query.filter(AnalysisResult.cached_at < time.time() - self.ttl).delete()
+        overflow = AnalysisResult.query.count() - self.max_rows
+        if overflow > 0:
+            oldest = db.session.query(AnalysisResult.repo_hash) \
+                .order_by(AnalysisResult.cached_at).limit(overflow).subquery()
+            AnalysisResult.query.filter(AnalysisResult.repo_hash.in_(db.select(oldest))) \
+                .delete(synchronize_session=False)
+        db.session.commit()
+
+    def _remember(self, repo_hash, entry):
+        with self._lock:
+            self._entries[repo_hash] = entry
+            self._entries.move_to_end(repo_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
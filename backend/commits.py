@@ -0,0 +1,170 @@
+from array import array
+
+import numpy as np
+
+DAY = 86400
+WEEK = 7 * DAY
+
+
+class CommitHistory:
+    """Commit timestamps and author ids held as compact NumPy arrays.
+
+    Timestamps are int64 seconds since the epoch and authors int32 codes into
+    `logins`, both sorted oldest first. A 100k commit history takes about
+    1.2 MB instead of 100k JSON objects.
+    """
+
+    def __init__(self, timestamps, authors, logins=()):
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order]
+        self.authors = authors[order]
+        self.logins = list(logins)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_pages(cls, pages):
+        """Build from pages of the REST `/commits` listing, parsing dates a page at a time."""
+        timestamps = array('q')
+        authors = array('i')
+        codes = {}
+        for page in pages:
+            if not page:
+                continue
+            dates = []
+            for commit in page:
+                author = commit['commit']['author']
+                dates.append(author['date'].rstrip('Z'))
+                # Prefer the GitHub account, fall back to the git identity
+                login = (commit.get('author') or {}).get('login') or author.get('email') or author.get('name')
+                authors.append(codes.setdefault(login, len(codes)))
+            timestamps.extend(np.array(dates, dtype='datetime64[s]').astype(np.int64))
+
+        return cls(
+            np.frombuffer(timestamps, dtype=np.int64).copy(),
+            np.frombuffer(authors, dtype=np.int32).copy(),
+            logins=codes
+        )
+
+    def merge(self, other, limit=None):
+        """This history plus `other`'s commits, keeping the newest `limit`."""
+        codes = {login: code for code, login in enumerate(self.logins)}
+        remap = np.array([codes.setdefault(login, len(codes)) for login in other.logins] or [0], dtype=np.int32)
+        merged = CommitHistory(
+            np.concatenate([self.timestamps, other.timestamps]),
+            np.concatenate([self.authors, remap[other.authors]]),
+            logins=codes
+        )
+        if limit is not None and len(merged) > limit:
+            merged = CommitHistory(merged.timestamps[-limit:], merged.authors[-limit:], merged.logins)
+        return merged
+
+    def to_state(self):
+        return {'timestamps': self.timestamps.tolist(), 'authors': self.authors.tolist(), 'logins': self.logins}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(np.array(state['timestamps'], dtype=np.int64), np.array(state['authors'], dtype=np.int32),
+                   state['logins'])
+
+
+class WeeklyActivity:
+    """Whole-history commit counts per author per week from `/stats/contributors`."""
+
+    def __init__(self, weeks, counts):
+        # weeks: (n_weeks,) week start timestamps, counts: (n_authors, n_weeks)
+        self.weeks = weeks
+        self.counts = counts
+
+    @classmethod
+    def from_contributor_stats(cls, stats):
+        if not stats:
+            return None
+        weeks = np.array([week['w'] for week in stats[0]['weeks']], dtype=np.int64)
+        counts = np.array([[week['c'] for week in author['weeks']] for author in stats], dtype=np.int64)
+        if counts.sum() == 0:
+            return None
+        return cls(weeks, counts)
+
+    def to_state(self):
+        return {'weeks': self.weeks.tolist(), 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        if not state:
+            return None
+        return cls(np.array(state['weeks'], dtype=np.int64), np.array(state['counts'], dtype=np.int64))
+
+
+def cadence_features(history, weekly=None, total_commits=None):
+    """Cadence statistics used as scam signals.
+
+    Day-level features (span, active-day ratio, burstiness) come from the
+    sampled timestamps. Whole-history features (first-week share, author
+    concentration) come from the sample when it is complete, otherwise from
+    the weekly contributor stats at week resolution. Without either they are
+    None: the newest commits say nothing about the first week or who wrote
+    the rest.
+    """
+    n = len(history)
+    total = max(total_commits or 0, n)
+    features = {
+        'total_commits': total,
+        'sampled_commits': n,
+        'complete': n >= total,
+        'first_commit_at': None,
+        'last_commit_at': None,
+        'span_days': 0,
+        'active_day_ratio': 0.0,
+        'burstiness': 0.0,
+        'first_week_share': 0.0,
+        'top_author_share': 0.0,
+        'author_hhi': 0.0,
+        'authors': 0
+    }
+    if n == 0:
+        return features
+
+    timestamps = history.timestamps
+    days = timestamps // DAY
+    span_days = int(days[-1] - days[0]) + 1
+    features.update({
+        'first_commit_at': np.datetime_as_string(timestamps[0].astype('datetime64[s]')) + 'Z',
+        'last_commit_at': np.datetime_as_string(timestamps[-1].astype('datetime64[s]')) + 'Z',
+        'span_days': span_days,
+        'active_day_ratio': round(np.unique(days).size / span_days, 3),
+        'burstiness': round(burstiness(np.diff(timestamps)), 3)
+    })
+
+    if features['complete']:
+        first_week_share = np.count_nonzero(timestamps < timestamps[0] + WEEK) / n
+        author_counts = np.bincount(history.authors)
+    elif weekly is None:
+        features.update({'first_week_share': None, 'top_author_share': None, 'author_hhi': None, 'authors': None})
+        return features
+    else:
+        per_week = weekly.counts.sum(axis=0)
+        first_active = np.flatnonzero(per_week)[0]
+        first_week_share = per_week[first_active] / per_week.sum()
+        author_counts = weekly.counts.sum(axis=1)
+
+    shares = author_counts[author_counts > 0] / author_counts.sum()
+    features.update({
+        'first_week_share': round(float(first_week_share), 3),
+        'top_author_share': round(float(shares.max()), 3),
+        'author_hhi': round(float(np.square(shares).sum()), 3),
+        'authors': int(shares.size)
+    })
+    return features
+
+
+def burstiness(gaps):
+    """Goh-Barabasi burstiness of inter-commit gaps: -1 periodic, 0 random, 1 bursty."""
+    if gaps.size < 2:
+        return 0.0
+    gaps = gaps.astype(np.float64)
+    mean, std = gaps.mean(), gaps.std()
+    if mean + std == 0:
+        return 0.0
+    return float((std - mean) / (std + mean))
@@ -0,0 +1,220 @@
+import hashlib
+import heapq
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from backend.ingest import PRIORITY_FILES
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Files that show how a project starts up, at any depth
+ENTRY_POINTS = {'main.py', 'app.py', '__main__.py', 'cli.py', 'server.py', 'index.js', 'index.ts', 'main.js',
+                'main.ts', 'server.js', 'server.ts', 'app.js', 'app.ts', 'main.rs', 'lib.rs', 'main.go', 'program.cs'}
+SOURCE_EXTENSIONS = {'.py', '.js', '.jsx', '.ts', '.tsx', '.mjs', '.rs', '.sol', '.go', '.java', '.kt', '.c', '.cc',
+                     '.cpp', '.cs', '.rb', '.php', '.swift', '.scala', '.move', '.vy', '.cairo'}
+LOW_SIGNAL_EXTENSIONS = {'.md', '.rst', '.txt', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.scss', '.lock'}
+COMMENT_LINE = re.compile(r'^\s*(#(?!!)|//|/\*.*\*/\s*$|<!--.*-->\s*$)')
+# Inline blobs (base64, hex, minified data) cost many tokens and say nothing
+LONG_TOKEN = re.compile(r'[A-Za-z0-9+/=_\-]{120,}')
+# Rough tokens for the fallback estimate: words, number runs and single symbols
+ESTIMATE_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+MAX_LINE_CHARS = 300
+# Cut files are only worth including if this much of them fits
+MIN_CHUNK_TOKENS = 200
+
+
+class TokenCounter:
+    """Counts prompt tokens with the model's tokenizer, memoized by content hash.
+
+    The encoding is loaded on first use. Without tiktoken, or when the
+    encoding cannot be fetched, counts fall back to an estimate that errs
+    high for code; `exact` says which one is in use.
+    """
+
+    def __init__(self, encoding='o200k_base', max_entries=8192):
+        self.encoding_name = encoding
+        self.max_entries = max_entries
+        self._encoding = None
+        self._loaded = False
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self):
+        return self._load() is not None
+
+    def count(self, text):
+        key = hashlib.blake2b(text.encode('utf-8', errors='ignore'), digest_size=16).digest()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                return cached
+
+        encoding = self._load()
+        if encoding is not None:
+            count = len(encoding.encode(text, disallowed_special=()))
+        else:
+            count = estimate_tokens(text)
+
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+    def _load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._encoding = tiktoken.get_encoding(self.encoding_name) if tiktoken else None
+                    except Exception as e:
+                        print(f"Error loading tokenizer {self.encoding_name}, estimating token counts: {str(e)}")
+                    self._loaded = True
+        return self._encoding
+
+
+def estimate_tokens(text):
+    """Token estimate for BPE tokenizers: long words split about every four letters."""
+    return sum(1 + (len(piece) - 1) // 4 if piece[0].isalpha() else 1 + (len(piece) - 1) // 3
+               for piece in ESTIMATE_PIECES.findall(text))
+
+
+def file_signal(path):
+    """How much a file says about the project, before any scanner results."""
+    parts = path.lower().split('/')
+    name = parts[-1]
+    extension = os.path.splitext(name)[1]
+    depth = len(parts) - 1
+
+    score = 0.0
+    if name in PRIORITY_FILES:
+        score += 6.0
+    if name in ENTRY_POINTS:
+        score += 5.0 if depth <= 2 else 3.0
+    if extension in SOURCE_EXTENSIONS:
+        score += 3.0
+    elif extension in LOW_SIGNAL_EXTENSIONS:
+        score -= 1.0
+    if any('test' in part or part in ('examples', 'example', 'docs', 'fixtures') for part in parts[:-1]) \
+            or name.startswith('test'):
+        score -= 2.0
+    return score - 0.5 * depth
+
+
+def minify(content, redacted_lines=()):
+    """Drop blank and comment-only lines and elide blobs; flagged lines are masked.
+
+    `redacted_lines` are 1-based line numbers holding exposed credentials,
+    which the prompt lists separately and should never quote.
+    """
+    lines = []
+    # Split on newlines only, as the scanner counts them; splitlines also breaks on \r, \f and
+    # the like, which would shift every number after one and mask the wrong lines
+    for number, line in enumerate(content.split('\n'), 1):
+        if number in redacted_lines:
+            lines.append(f'{line[:len(line) - len(line.lstrip())]}<credential redacted>')
+            continue
+        line = line.rstrip()
+        if not line.strip() or COMMENT_LINE.match(line):
+            continue
+        line = LONG_TOKEN.sub(lambda match: f'<{len(match.group())} chars>', line)
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + ' …'
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+class ContextPacker:
+    """Ingestion consumer that packs the most telling code into a token budget.
+
+    Every ingested file is scored as it streams past and the best
+    `max_candidates` are kept. `pack` then boosts files the scanners flagged,
+    minifies and deduplicates the candidates, and fills the budget in order,
+    cutting the file that no longer fits at a line boundary. No single file
+    takes more than `max_file_share` of the budget.
+    """
+
+    def __init__(self, counter, max_candidates=200, max_file_chars=20000, max_file_share=0.3):
+        self.counter = counter
+        self.max_candidates = max_candidates
+        self.max_file_chars = max_file_chars
+        self.max_file_share = max_file_share
+        self.seen = 0
+        self._candidates = []
+
+    def add(self, file):
+        self.seen += 1
+        entry = (file_signal(file['path']), file['path'], file['content'][:self.max_file_chars])
+        if len(self._candidates) < self.max_candidates:
+            heapq.heappush(self._candidates, entry)
+        elif entry[:2] > self._candidates[0][:2]:
+            heapq.heapreplace(self._candidates, entry)
+
+    def pack(self, budget, flagged=None, secret_lines=None):
+        """Files for the prompt plus what was spent.
+
+        `flagged` maps paths to a score boost (near-duplicates, secret
+        findings); `secret_lines` maps paths to line numbers to redact.
+        """
+        flagged = flagged or {}
+        secret_lines = secret_lines or {}
+        ranked = sorted(self._candidates, key=lambda entry: (-(entry[0] + flagged.get(entry[1], 0.0)), entry[1]))
+        file_cap = max(1, int(budget * self.max_file_share))
+
+        files, used, duplicates, seen_hashes = [], 0, 0, set()
+        for _, path, content in ranked:
+            remaining = budget - used
+            if remaining < 32:
+                break
+            content = minify(content, set(secret_lines.get(path, ())))
+            digest = hashlib.blake2b(content.encode('utf-8', errors='ignore'), digest_size=16).digest()
+            if not content or digest in seen_hashes:
+                duplicates += bool(content)
+                continue
+            seen_hashes.add(digest)
+
+            header = f'--- {path} ---\n'
+            allowance = min(remaining, file_cap) - self.counter.count(header)
+            tokens = self.counter.count(content)
+            truncated = tokens > allowance
+            if truncated:
+                # A smaller file further down may still fit whole
+                if allowance < MIN_CHUNK_TOKENS:
+                    continue
+                content = self._truncate(content, tokens, allowance)
+                if not content:
+                    continue
+                tokens = self.counter.count(content)
+            files.append({'path': path, 'content': header + content, 'tokens': tokens + self.counter.count(header),
+                          'truncated': truncated})
+            used += files[-1]['tokens']
+
+        return {
+            'files': files,
+            'budget': budget,
+            'tokens': used,
+            'candidates': len(self._candidates),
+            'files_seen': self.seen,
+            'duplicates': duplicates,
+            'exact_tokens': self.counter.exact
+        }
+
+    def _truncate(self, content, tokens, allowance):
+        """Longest prefix of whole lines within `allowance` tokens."""
+        if allowance <= 0:
+            return ''
+        # Start from the file's own chars-per-token ratio, then shrink until it fits
+        cut = int(len(content) * allowance / tokens)
+        while cut > 0:
+            prefix = content[:cut].rsplit('\n', 1)[0] if '\n' in content[:cut] else content[:cut]
+            if self.counter.count(prefix) <= allowance:
+                return prefix
+            cut = int(cut * 0.85)
+        return ''
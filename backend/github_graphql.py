@@ -0,0 +1,122 @@
+import requests
+
+GRAPHQL_URL = 'https://api.github.com/graphql'
+
+# Everything the report needs about a repository in a single round trip
+REPOSITORY_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+    name
+    description
+    isPrivate
+    stargazerCount
+    forkCount
+    createdAt
+    updatedAt
+    openIssues: issues(states: OPEN) { totalCount }
+    openPullRequests: pullRequests(states: OPEN) { totalCount }
+    watchers { totalCount }
+    tags: refs(refPrefix: "refs/tags/") { totalCount }
+    collaborators { totalCount }
+    languages(first: 25, orderBy: {field: SIZE, direction: DESC}) {
+      edges { size node { name } }
+    }
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          oid
+          history(first: 30) {
+            totalCount
+            nodes { oid message committedDate author { name date } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def fetch_repository_metadata(owner, repo, token=None, timeout=None, session=None, url=GRAPHQL_URL):
+    """Fetch repository metadata, languages, counts and recent commits via GraphQL.
+
+    Returns None if the repository does not exist or is private. Raises when
+    the query itself fails so the caller can fall back to the REST endpoints.
+    Leave out `token` when the session signs its own requests.
+    """
+    response = (session or requests).post(
+        url,
+        headers={'Authorization': f'bearer {token}'} if token else None,
+        json={'query': REPOSITORY_QUERY, 'variables': {'owner': owner, 'name': repo}},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return repository_metadata(response.json())
+
+
+async def fetch_repository_metadata_async(owner, repo, client, url=GRAPHQL_URL):
+    """fetch_repository_metadata over an httpx.AsyncClient that signs its own requests."""
+    response = await client.post(url, json={'query': REPOSITORY_QUERY, 'variables': {'owner': owner, 'name': repo}})
+    response.raise_for_status()
+    return repository_metadata(response.json())
+
+
+def repository_metadata(body):
+    """The normalized repository from a query response; None if missing or private, raises on query errors."""
+    repository = (body.get('data') or {}).get('repository')
+    errors = body.get('errors') or []
+    if repository is None:
+        if any(error.get('type') == 'NOT_FOUND' for error in errors):
+            return None
+        raise Exception(f"GraphQL query failed: {errors}")
+    if repository['isPrivate']:
+        return None
+
+    return normalize_repository(repository)
+
+
+def normalize_repository(repository):
+    """Reshape a GraphQL repository into the REST-style fields the analysis uses.
+
+    Connections the token cannot see (collaborators without push access) come
+    back as null and count as zero, matching how the REST path degrades.
+    """
+    history = {'totalCount': 0, 'nodes': []}
+    branch = repository.get('defaultBranchRef')
+    if branch and branch.get('target') and branch['target'].get('history'):
+        history = branch['target']['history']
+
+    return {
+        'repo_info': {
+            'name': repository['name'],
+            'description': repository['description'],
+            'stargazers_count': repository['stargazerCount'],
+            'forks_count': repository['forkCount'],
+            # REST counts open pull requests as issues too
+            'open_issues_count': repository['openIssues']['totalCount'] + repository['openPullRequests']['totalCount'],
+            'created_at': repository['createdAt'],
+            'updated_at': repository['updatedAt']
+        },
+        'languages': {edge['node']['name']: edge['size'] for edge in repository['languages']['edges']},
+        'commits': [_commit(node) for node in history['nodes']],
+        'total_commits': history['totalCount'],
+        'watchers_count': _total(repository.get('watchers')),
+        'tags_count': _total(repository.get('tags')),
+        'collaborators_count': _total(repository.get('collaborators'))
+    }
+
+
+def _commit(node):
+    # Null for commits by deleted ("ghost") accounts
+    author = node.get('author') or {}
+    return {
+        'sha': node['oid'],
+        'commit': {
+            'message': node['message'],
+            'author': {'name': author.get('name'), 'date': author.get('date') or node['committedDate']}
+        }
+    }
+
+
+def _total(connection):
+    return connection['totalCount'] if connection else 0
@@ -0,0 +1,121 @@
+"""The GitHub REST calls of an analysis, less the transport.
+
+app.py makes these calls over a pooled requests session and asgi.py over an
+httpx.AsyncClient. Both pass in their own `fetch_json(url, headers,
+params=None, default=None)` and `count_items(url, headers)` and run the
+`(callable, default)` fetch tasks built here with their own
+run_concurrently, so the helpers below decide what to fetch and what the
+responses mean and nothing else.
+"""
+import base64
+import math
+import urllib.parse
+
+from backend.commits import CommitHistory, WeeklyActivity, cadence_features
+
+COMMITS_PER_PAGE = 100
+
+
+def count_from_response(response):
+    """The item count of a one-per-page listing response.
+
+    The page number of the `rel="last"` link is the item count, so the list
+    itself is never downloaded.
+    """
+    if response.status_code == 204:
+        return 0
+    response.raise_for_status()
+    last = response.links.get('last', {}).get('url')
+    if last:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(last).query)
+        return int(query['page'][0])
+    return len(response.json())
+
+
+def contents_url(base_url, path):
+    return f'{base_url}/contents/{urllib.parse.quote(path)}'
+
+
+def file_from_contents(path, body):
+    """The file in a contents API body; None for files it won't inline."""
+    if not isinstance(body, dict) or body.get('encoding') != 'base64':
+        return None
+    content = base64.b64decode(body['content']).decode('utf-8', errors='ignore')
+    return {'path': path, 'size': body.get('size', len(content)), 'content': content}
+
+
+def commit_page_tasks(base_url, headers, fetch_json, total_commits, limit):
+    """Fetch tasks, by page number, for the commit listing pages that hold the newest `limit` commits."""
+    pages = max(1, min(math.ceil(total_commits / COMMITS_PER_PAGE), limit // COMMITS_PER_PAGE))
+    return {
+        page: (lambda page=page: fetch_json(f'{base_url}/commits', headers,
+                                            params={'per_page': COMMITS_PER_PAGE, 'page': page}, default=[]), [])
+        for page in range(1, pages + 1)
+    }
+
+
+def commit_history(pages):
+    """The CommitHistory of the pages commit_page_tasks fetched."""
+    return CommitHistory.from_pages(pages[page] for page in sorted(pages))
+
+
+def needs_weekly_stats(history, total_commits):
+    """Whether the paged history misses commits, so whole-history figures need /stats/contributors."""
+    return len(history) < total_commits
+
+
+def cadence_result(history, stats, total_commits):
+    """`(features, history, weekly)` from the paged history and the /stats/contributors body, None if not fetched."""
+    # GitHub answers 202 with an empty body while it computes the stats
+    weekly = WeeklyActivity.from_contributor_stats(stats) if isinstance(stats, list) else None
+    return cadence_features(history, weekly, total_commits), history, weekly
+
+
+def graphql_tasks(fetch_graphql, base_url, headers, count_items):
+    """Fetch tasks for the GraphQL metadata path; `fetch_graphql()` runs the query."""
+    return {
+        'graphql': (fetch_graphql, False),
+        # The one count GraphQL does not expose
+        'contributors_count': (lambda: count_items(f'{base_url}/contributors', headers), 0)
+    }
+
+
+def graphql_metadata(fetched):
+    """The metadata graphql_tasks fetched; None if the repository isn't public, False if the REST chain must stand in."""
+    metadata = fetched.get('graphql', False)
+    if metadata:
+        metadata['contributors_count'] = fetched['contributors_count']
+    return metadata
+
+
+def rest_metadata_tasks(base_url, headers, fetch_json, count_items):
+    """Fetch tasks for the REST metadata chain, apart from the repository info and the page scrape."""
+    return {
+        'languages': (lambda: fetch_json(f'{base_url}/languages', headers, default={}), {}),
+        'commits': (lambda: fetch_json(f'{base_url}/commits', headers, params={'per_page': 30}, default=[]), []),
+        # Counted from the last page link rather than listed, which also lifts the 30 item cap
+        'total_commits': (lambda: count_items(f'{base_url}/commits', headers), None),
+        'watchers_count': (lambda: count_items(f'{base_url}/watchers', headers), 0),
+        'tags_count': (lambda: count_items(f'{base_url}/tags', headers), 0),
+        'collaborators_count': (lambda: count_items(f'{base_url}/collaborators', headers), 0),
+    }
+
+
+def rest_metadata(fetched, base_url):
+    """The metadata fields from the REST fetch tasks' results."""
+    if not fetched['repo_info']:
+        raise Exception(f'Unable to fetch repository metadata for {base_url}')
+
+    # Web scrape repo -----------------
+    scraped_info = fetched['scraped_info'] or {'contributors_count': 0}
+
+    return {
+        'repo_info': fetched['repo_info'],
+        'languages': fetched['languages'],
+        'commits': fetched['commits'],
+        'total_commits': fetched['total_commits'] if fetched['total_commits'] is not None else len(fetched['commits']),
+        'watchers_count': fetched['watchers_count'],
+        'tags_count': fetched['tags_count'],
+        'collaborators_count': fetched['collaborators_count'],
+        'contributors_count': scraped_info['contributors_count']
+    }
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+
+import requests
+from requests.auth import AuthBase
+
+from backend.ratelimit import RateLimit
+
+API_URL = 'https://api.github.com'
+
+
+class PooledToken:
+    """One PAT with its own rate-limit budget and cached identity."""
+
+    def __init__(self, value, reserve=0, number=1):
+        self.value = value
+        self.number = number
+        self.authorization = f'token {value}'
+        self.limit = RateLimit('github', reserve=reserve)
+        self.login = None
+        self.valid = None
+        self.validated_at = 0.0
+
+    @property
+    def label(self):
+        """The token's last characters, for server logs only."""
+        return f'…{self.value[-4:]}'
+
+
+class TokenPool(AuthBase):
+    """Spread GitHub traffic over several PATs by remaining quota.
+
+    Installed as a session's auth, the pool picks the token with the most
+    headroom for every request; installed as its response hook, it credits
+    each response's rate-limit headers to the token that sent it. It also
+    stands in for a RateLimit in the batch scheduler, where it only blocks
+    once no token can afford the work.
+
+    Token identities are checked with `GET /user` once and cached, then
+    re-checked in the background every `refresh_interval` seconds.
+    """
+
+    def __init__(self, tokens, reserve=0, refresh_interval=900, timeout=None, max_wait=3600, api_url=API_URL,
+                 session=None):
+        self.tokens = [PooledToken(value, reserve, number)
+                       for number, value in enumerate((value for value in dict.fromkeys(tokens) if value), 1)]
+        self.user_url = f'{api_url}/user'
+        # Identity checks send their own token, so this must not be a session the pool signs
+        self.session = session or requests
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self._by_authorization = {token.authorization: token for token in self.tokens}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._unsigned = False
+
+    @property
+    def fingerprint(self):
+        """A digest of the pooled tokens, which changes whenever the pool does."""
+        values = '\n'.join(sorted(token.value for token in self.tokens))
+        return hashlib.sha256(values.encode()).hexdigest()[:16]
+
+    def __call__(self, request):
+        token = self.choose()
+        if token:
+            request.headers['Authorization'] = token.authorization
+        elif self.tokens and not self._unsigned:
+            # Logged once each time the pool runs dry, not for every request
+            print(f"All {len(self.tokens)} GitHub tokens are invalid, sending requests unauthenticated")
+        self._unsigned = token is None and bool(self.tokens)
+        return request
+
+    def choose(self):
+        """The usable token with the most requests left, preferring ones not yet heard from."""
+        usable = self._usable()
+        if not usable:
+            return None
+        return max(usable, key=lambda token: float('inf') if token.limit.headroom() is None else token.limit.headroom())
+
+    def observe(self, response, *args, **kwargs):
+        token = self._by_authorization.get(response.request.headers.get('Authorization')) if response.request else None
+        if not token:
+            return
+        token.limit.observe(response)
+        if response.status_code == 401:
+            # Revoked or expired; skipped until the next refresh says otherwise
+            token.valid = False
+
+    def acquire(self, cost=1):
+        """Block until some token can afford `cost` requests; returns seconds waited."""
+        started = time.monotonic()
+        while True:
+            usable = sorted(self._usable(), key=lambda token: -(token.limit.headroom() or 0))
+            retry_at = []
+            for token in usable:
+                ready_at = token.limit.try_acquire(cost)
+                if not ready_at:
+                    return time.monotonic() - started
+                retry_at.append(ready_at)
+            waited = time.monotonic() - started
+            if not retry_at or waited >= self.max_wait:
+                return waited
+            time.sleep(max(0.05, min(min(retry_at) - time.time(), self.max_wait - waited)))
+
+    def username(self):
+        """Login of the first valid token, validating every token on first use."""
+        self._start_refresher()
+        for token in self.tokens:
+            if not token.validated_at:
+                self.validate(token)
+        return next((token.login for token in self.tokens if token.valid), None)
+
+    def validate(self, token):
+        """Check the token against `GET /user`, caching its login and quota.
+
+        Only a 401 marks the token invalid. Any other answer without a login
+        leaves it as it was, to be checked again.
+        """
+        try:
+            response = self.session.get(self.user_url, headers={'Authorization': token.authorization,
+                                                           'Accept': 'application/vnd.github.v3+json'},
+                                        timeout=self.timeout)
+        except requests.RequestException as e:
+            # Network trouble says nothing about the token, keep what we knew
+            print(f"Error validating GitHub token {token.label}: {str(e)}")
+            return token.valid
+        token.limit.observe(response)
+        if response.status_code == 401:
+            token.valid, token.login = False, None
+        else:
+            try:
+                body = response.json() if response.status_code == 200 else None
+            except ValueError:
+                body = None
+            if not isinstance(body, dict) or not body.get('login'):
+                # An outage or proxy error page (HTML 502 and the like) says nothing about the token either
+                print(f"Error validating GitHub token {token.label}: HTTP {response.status_code} without a login")
+                return token.valid
+            token.valid, token.login = True, body['login']
+        token.validated_at = time.time()
+        return token.valid
+
+    def snapshot(self):
+        """Pool health: per-token validity and quota, plus totals.
+
+        Tokens are told apart by their position in the pool only; this is
+        served publicly and exported to metrics, so neither the token nor the
+        account it belongs to is included.
+        """
+        now = time.time()
+        tokens = [{
+            'token': str(token.number),
+            'valid': token.valid,
+            'validated_ago': round(now - token.validated_at) if token.validated_at else None,
+            'headroom': token.limit.headroom(),
+            'budgets': token.limit.snapshot()
+        } for token in self.tokens]
+        return {
+            'tokens': tokens,
+            # 0 means requests are going out unauthenticated
+            'usable': len(self._usable()),
+            'total_headroom': sum(token.limit.headroom() or 0 for token in self._usable())
+        }
+
+    def _usable(self):
+        # Validated tokens only, unless none has been checked yet
+        valid = [token for token in self.tokens if token.valid]
+        return valid or [token for token in self.tokens if token.valid is None]
+
+    def _start_refresher(self):
+        with self._lock:
+            # Started lazily so the thread lives in the serving process, not a pre-fork parent
+            if self._refresher is not None or not self.refresh_interval:
+                return
+            self._refresher = threading.Thread(target=self._refresh_forever, name='github-token-refresh', daemon=True)
+            self._refresher.start()
+
+    def _refresh_forever(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            for token in self.tokens:
+                try:
+                    self.validate(token)
+                except Exception as e:
+                    print(f"Error refreshing GitHub token {token.label}: {str(e)}")
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlencode
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Response headers worth keeping alongside a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+FRAMING_HEADERS = ('content-length', 'content-encoding', 'transfer-encoding')
+
+
+class ConditionalCache:
+    """On-disk HTTP cache that revalidates with If-None-Match / If-Modified-Since.
+
+    Each URL is stored as its own JSON file and replaced atomically, so every
+    gunicorn worker pointed at the same directory shares one cache. GitHub
+    answers a matching validator with a 304 that does not count against the
+    rate limit, in which case the stored body is replayed.
+
+    Entries are keyed by the credentials they were fetched with: a request's
+    own Authorization header when it sets one, otherwise `credentials`, which
+    names whatever auth the session signs with. Once the directory grows past
+    `max_bytes` the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory, max_body_bytes=5 * 1024 * 1024, session=None, credentials='',
+                 max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_body_bytes = max_body_bytes
+        self.session = session or requests
+        self.credentials = credentials
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pruning = threading.Lock()
+        self._counts = {'requests': 0, 'revalidated': 0, 'stored': 0, 'uncached': 0}
+        # Other workers write here too, so the size is measured on disk; the first store does it
+        self._written = max_bytes // 10
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        """Drop-in replacement for `requests.get` that returns a `requests.Response`."""
+        path, entry, headers = self._conditional(url, headers, params)
+        response = self.session.get(url, headers=headers, params=params, timeout=timeout)
+        if response.status_code == 304 and entry:
+            self._count('revalidated')
+            self._touch(path)
+            return self._replay(entry, response)
+        self._keep(path, response)
+        return response
+
+    async def aget(self, client, url, headers=None, params=None):
+        """`get` over an httpx.AsyncClient, returning an `httpx.Response`."""
+        path, entry, headers = self._conditional(url, headers, params)
+        response = await client.get(url, headers=headers, params=params)
+        if response.status_code == 304 and entry:
+            self._count('revalidated')
+            self._touch(path)
+            return self._replay_httpx(entry, response)
+        self._keep(path, response)
+        return response
+
+    def _conditional(self, url, headers, params):
+        """The entry's path, the stored entry if any, and `headers` plus its validators."""
+        headers = dict(headers or {})
+        path = self._path(url, params, headers.get('Accept', ''), headers.get('Authorization'))
+        entry = self._load(path)
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return path, entry, headers
+
+    def _keep(self, path, response):
+        if response.status_code == 200 and (response.headers.get('ETag') or response.headers.get('Last-Modified')) \
+                and len(response.content) <= self.max_body_bytes:
+            self._store(path, response)
+            self._count('stored')
+        else:
+            self._count('uncached')
+
+    def stats(self):
+        """Counters for this process plus the 304 ratio."""
+        with self._lock:
+            counts = dict(self._counts)
+        counts['revalidated_ratio'] = round(counts['revalidated'] / counts['requests'], 3) if counts['requests'] else 0.0
+        return counts
+
+    def _path(self, url, params, accept, authorization=None):
+        query = urlencode(sorted((params or {}).items()))
+        credentials = hashlib.sha256(authorization.encode()).hexdigest() if authorization else self.credentials
+        key = hashlib.sha256(f'{url}?{query}|{accept}|{credentials}'.encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counts['requests'] += 1
+            self._counts[outcome] += 1
+
+    def _load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, path, response):
+        entry = {
+            'url': str(response.url),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            'encoding': response.encoding or 'utf-8',
+            'body': response.content.decode(response.encoding or 'utf-8', errors='replace')
+        }
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing HTTP cache entry: {str(e)}")
+            return
+        with self._lock:
+            self._written += size
+            due = self._written >= self.max_bytes // 10
+            if due:
+                self._written = 0
+        if due:
+            self.prune()
+
+    def _touch(self, path):
+        """Mark an entry as just used; pruning goes by modification time."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Delete the least recently used entries until the cache is back under 90% of `max_bytes`.
+
+        Runs after every tenth of `max_bytes` this process writes. Workers may
+        prune at the same time; a file another one already removed is skipped.
+        """
+        if not self.max_bytes or not self._pruning.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+        finally:
+            self._pruning.release()
+
+    def _replay(self, entry, not_modified):
+        """Build a 200 response from a stored entry and the fresh 304 headers."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response.encoding = entry['encoding']
+        response._content = entry['body'].encode(entry['encoding'])
+        # The body is already here; without this iter_content would try to read it from a connection
+        response._content_consumed = True
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers.update(not_modified.headers)
+        response.request = not_modified.request
+        return response
+
+    def _replay_httpx(self, entry, not_modified):
+        """`_replay` for httpx; the stored body's own length replaces the 304's framing headers."""
+        headers = dict(entry['headers'])
+        headers.update((name, value) for name, value in not_modified.headers.items()
+                       if name.lower() not in FRAMING_HEADERS)
+        return httpx.Response(200, headers=headers, content=entry['body'].encode(entry['encoding']),
+                              request=not_modified.request)
@@ -0,0 +1,229 @@
+import json
+import time
+from collections import Counter
+
+from backend.context import ContextPacker
+from backend.ingest import FileSampler, is_text_path
+from backend.models import db, AnalysisSnapshot
+from backend.secrets_scan import MAX_FINDINGS, finding_counts, finding_lines, scan_text
+
+# Compare statuses whose path holds new content at the head
+CONTENT_STATUSES = {'added', 'modified', 'renamed', 'copied', 'changed'}
+# The compare endpoint lists at most this many files and commits; a listing that reaches either is cut short
+COMPARE_MAX_FILES = 300
+COMPARE_MAX_COMMITS = 250
+MAX_LISTED_COMMITS = 50
+MAX_LISTED_FILES = 100
+
+
+class IncrementalUnavailable(Exception):
+    """The change since the last analysis can't be applied on top of it; run a full analysis instead."""
+
+
+class SnapshotStore:
+    """The state each repository's last analysis derived, by repository hash.
+
+    Incremental runs carry some figures over from the full analysis the state
+    was built up from (whole-history weekly totals, sample slots of removed
+    files), so snapshots older than `max_age` seconds since that full run are
+    ignored and the next analysis rebuilds them.
+    """
+
+    def __init__(self, max_age=7 * 24 * 3600):
+        self.max_age = max_age
+
+    def get(self, repo_hash):
+        row = db.session.get(AnalysisSnapshot, repo_hash)
+        if not row or time.time() - row.rebuilt_at >= self.max_age:
+            return None
+        return json.loads(row.state)
+
+    def set(self, repo_hash, repo_url, state):
+        now = time.time()
+        db.session.merge(AnalysisSnapshot(
+            repo_hash=repo_hash,
+            repo_url=repo_url,
+            head_sha=state['head_sha'],
+            state=json.dumps(state),
+            rebuilt_at=state.get('rebuilt_at', now),
+            updated_at=now
+        ))
+        db.session.commit()
+
+
+class ChangeSet:
+    """Commits and files between the analyzed head and the current one, from `/compare/{base}...{head}`."""
+
+    def __init__(self, base_sha, head_sha, commits=(), files=()):
+        self.base_sha = base_sha
+        self.head_sha = head_sha
+        self.commits = list(commits)
+        self.files = list(files)
+
+    @classmethod
+    def from_compare(cls, body, base_sha, head_sha, max_files):
+        """Raises IncrementalUnavailable when the comparison is missing, rewritten or too large."""
+        if not isinstance(body, dict):
+            raise IncrementalUnavailable(f'no comparison from {base_sha[:7]}')
+        status = body.get('status')
+        if status == 'identical':
+            return cls(base_sha, head_sha)
+        if status != 'ahead':
+            # behind or diverged: the analyzed commit is no longer in the branch history
+            raise IncrementalUnavailable(f'history {status} since {base_sha[:7]}')
+
+        commits = body.get('commits') or []
+        files = body.get('files') or []
+        if body.get('total_commits', len(commits)) > len(commits) or len(commits) >= COMPARE_MAX_COMMITS:
+            raise IncrementalUnavailable(f"{body.get('total_commits', len(commits))} commits since {base_sha[:7]}")
+        if len(files) >= COMPARE_MAX_FILES:
+            raise IncrementalUnavailable(f'{len(files)} files changed since {base_sha[:7]}')
+
+        changes = cls(base_sha, head_sha, commits, files)
+        if len(changes.changed_paths) > max_files:
+            raise IncrementalUnavailable(f'{len(changes.changed_paths)} text files changed since {base_sha[:7]}')
+        return changes
+
+    @property
+    def changed_paths(self):
+        """Text files with new content at the head, to fetch and reprocess."""
+        return [file['filename'] for file in self.files
+                if file['status'] in CONTENT_STATUSES and is_text_path(file['filename'])]
+
+    @property
+    def touched(self):
+        """Every path whose previous content no longer applies, including rename sources."""
+        paths = {file['filename'] for file in self.files}
+        paths.update(file['previous_filename'] for file in self.files if file.get('previous_filename'))
+        return paths
+
+    def summary(self):
+        """Commit and file listing for the update prompt."""
+        lines = [f'Commits since {self.base_sha[:7]}:']
+        for commit in self.commits[-MAX_LISTED_COMMITS:]:
+            author = commit['commit']['author']
+            login = (commit.get('author') or {}).get('login') or author.get('name')
+            message = commit['commit']['message'].strip().split('\n', 1)[0]
+            lines.append(f"- {commit['sha'][:7]} {author['date']} {login}: {message}")
+        if len(self.commits) > MAX_LISTED_COMMITS:
+            lines.append(f'- and {len(self.commits) - MAX_LISTED_COMMITS} earlier commits')
+
+        lines.append('Files changed:')
+        for file in self.files[:MAX_LISTED_FILES]:
+            renamed = f" (from {file['previous_filename']})" if file.get('previous_filename') else ''
+            lines.append(f"- {file['status']} {file['filename']}{renamed} "
+                         f"+{file.get('additions', 0)} -{file.get('deletions', 0)}")
+        if len(self.files) > MAX_LISTED_FILES:
+            lines.append(f'- and {len(self.files) - MAX_LISTED_FILES} more files')
+        return '\n'.join(lines)
+
+    def pack_patches(self, counter, budget, flagged=None):
+        """The most telling diffs within `budget` tokens, credentials masked, as ContextPacker.pack returns them.
+
+        Each hunk is scanned on its own, so one that opens partway through a
+        key block is masked from its first line to the block's END.
+        """
+        packer = ContextPacker(counter)
+        findings = []
+        for file in self.files:
+            patch = file.get('patch')
+            if not patch:
+                continue
+            packer.add({'path': file['filename'], 'content': patch})
+            for offset, hunk in patch_hunks(patch):
+                for finding in scan_text(file['filename'], hunk):
+                    finding['line'] += offset
+                    finding['end_line'] += offset
+                    findings.append(finding)
+        return packer.pack(budget, flagged=flagged, secret_lines=finding_lines(findings))
+
+
+def patch_hunks(patch):
+    """`(line offset, text)` for each hunk of a unified diff, header line included."""
+    lines = patch.split('\n')
+    starts = [number for number, line in enumerate(lines) if line.startswith('@@')]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return [(start, '\n'.join(lines[start:end])) for start, end in zip(starts, starts[1:] + [len(lines)])]
+
+
+def head_commit(metadata):
+    """The sha of the newest commit in the repository metadata; raises IncrementalUnavailable without one."""
+    if not metadata['commits']:
+        raise IncrementalUnavailable('head commit unknown')
+    return metadata['commits'][0]['sha']
+
+
+def changed_files(results, paths):
+    """The new content of `paths` from their fetch results, False for a failed fetch and None for an uninlined file.
+
+    Raises IncrementalUnavailable when any fetch failed, since the merge would keep that file's stale figures.
+    """
+    if any(results[path] is False for path in paths):
+        raise IncrementalUnavailable('changed files could not be fetched')
+    return [results[path] for path in paths if results[path]]
+
+
+def merge_sample(sample, files, touched, limit, max_chars):
+    """The stored file sample with touched paths dropped and the changed files offered in their place."""
+    sampler = FileSampler(limit=limit, max_chars=max_chars)
+    for file in sample:
+        if file['path'] not in touched:
+            sampler.add(file)
+    for file in files:
+        sampler.add(file)
+    return sampler.result()
+
+
+def merge_secret_scan(previous, files, touched):
+    """The stored scan result with findings in touched paths replaced by a scan of their new content.
+
+    Counts are adjusted by every finding the touched paths held, not just
+    the reported ones; file and byte totals still describe the full scan the
+    snapshot started from.
+    """
+    kept = [finding for finding in previous['findings'] if finding['path'] not in touched]
+    found = [finding for file in files for finding in scan_text(file['path'], file['content'])]
+
+    path_counts = {path: kinds for path, kinds in previous['path_counts'].items() if path not in touched}
+    path_counts.update(finding_counts(found))
+    counts = Counter()
+    for kinds in path_counts.values():
+        counts.update(kinds)
+
+    lines = {path: path_lines for path, path_lines in previous['lines'].items() if path not in touched}
+    lines.update(finding_lines(found))
+    return {
+        'files_scanned': previous['files_scanned'],
+        'bytes_scanned': previous['bytes_scanned'],
+        'counts': {kind: count for kind, count in counts.items() if count > 0},
+        'findings': (kept + found)[:MAX_FINDINGS],
+        'lines': lines,
+        'path_counts': path_counts
+    }
+
+
+def merge_matches(previous, matches, touched, limit=20):
+    """Stored near-duplicate matches for untouched files plus the changed files' new matches."""
+    merged = [match for match in previous if match['path'] not in touched] + matches
+    merged.sort(key=lambda match: -match['similarity'])
+    return merged[:limit]
+
+
+def merge_static_analysis(previous, current, touched):
+    """The stored StaticAnalyzer state with touched paths replaced by the analysis of their new content.
+
+    The duplicated share is dropped (None) rather than carried over: it is
+    counted from line hashes the stored per-file figures don't keep, so it
+    can't be brought up to date, and the full run's figure would go stale.
+    """
+    files = {path: record for path, record in previous['files'].items() if path not in touched}
+    files.update(current['files'])
+    manifests = {path: manifest for path, manifest in previous['manifests'].items() if path not in touched}
+    manifests.update(current['manifests'])
+    return {
+        'files': files,
+        'manifests': manifests,
+        'duplicate_ratio': None,
+        'files_reused': current['files_reused']
+    }
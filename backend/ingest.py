@@ -0,0 +1,176 @@
+import hashlib
+import heapq
+import os
+import tarfile
+import threading
+import time
+
+import requests
+
+# Extensions and bare filenames treated as text worth reading
+TEXT_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs', '.rs', '.sol', '.go', '.java', '.kt', '.c', '.h',
+    '.cc', '.cpp', '.hpp', '.cs', '.rb', '.php', '.swift', '.scala', '.sh', '.bash', '.move', '.vy', '.cairo',
+    '.md', '.rst', '.txt', '.json', '.toml', '.yaml', '.yml', '.ini', '.cfg', '.env', '.html', '.css', '.scss',
+    '.sql', '.graphql', '.proto', '.xml', '.gradle'
+}
+TEXT_FILENAMES = {'dockerfile', 'makefile', 'license', 'procfile', '.gitignore', '.env', '.env.example'}
+
+# Directories and files that are generated, vendored or otherwise noise
+SKIPPED_DIRS = {'.git', 'node_modules', 'vendor', 'dist', 'build', 'target', '__pycache__', '.next', 'coverage'}
+SKIPPED_FILES = {'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'cargo.lock', 'poetry.lock'}
+
+# Files always kept in a sample because they say the most about a project
+PRIORITY_FILES = {'readme.md', 'readme', 'package.json', 'requirements.txt', 'pyproject.toml', 'setup.py',
+                  'cargo.toml', 'go.mod', 'foundry.toml', 'hardhat.config.js', 'hardhat.config.ts', 'anchor.toml'}
+
+
+class IngestStop:
+    """Stop flag for an ingest run that also trips by itself `seconds` after it is created."""
+
+    def __init__(self, seconds=None):
+        self._event = threading.Event()
+        self._expires = time.monotonic() + seconds if seconds else None
+
+    def set(self):
+        self._event.set()
+
+    def is_set(self):
+        return self._event.is_set() or (self._expires is not None and time.monotonic() >= self._expires)
+
+
+class IngestRun:
+    """One ingest call feeding consumers, run as a fetch task and stopped by the thread that reads them.
+
+    `func` is called with `stop`, an IngestStop that trips after `timeout`
+    seconds or on `finish`, and must return soon after it does. Consumers
+    are not thread-safe, so call `finish` before reading them: it stops the
+    run and waits for it to return, and doesn't wait on a run that never
+    started.
+    """
+
+    def __init__(self, func, timeout=None):
+        self.func = func
+        self.stop = IngestStop(timeout)
+        self._lock = threading.Lock()
+        self._started = False
+        self._done = threading.Event()
+
+    def run(self):
+        with self._lock:
+            if self.stop.is_set():
+                self._done.set()
+                return []
+            self._started = True
+        try:
+            return self.func(self.stop)
+        finally:
+            self._done.set()
+
+    def finish(self):
+        with self._lock:
+            self.stop.set()
+            if not self._started:
+                self._done.set()
+        self._done.wait()
+
+
+class _LimitedReader:
+    """File-like wrapper that reports end of stream after `limit` bytes, or once `stop` is set."""
+
+    def __init__(self, raw, limit, stop=None):
+        self.raw = raw
+        self.remaining = limit
+        self.stop = stop
+
+    def read(self, size=-1):
+        if self.remaining <= 0 or (self.stop is not None and self.stop.is_set()):
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.raw.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def is_text_path(path):
+    parts = path.lower().split('/')
+    name = parts[-1]
+    if any(part in SKIPPED_DIRS for part in parts[:-1]) or name in SKIPPED_FILES or name.endswith('.min.js'):
+        return False
+    return name in TEXT_FILENAMES or os.path.splitext(name)[1] in TEXT_EXTENSIONS
+
+
+def iter_repository_files(owner, repo, headers, max_file_bytes=512 * 1024, max_archive_bytes=512 * 1024 * 1024,
+                          timeout=None, session=None, api_url='https://api.github.com', stop=None):
+    """Stream the repository tarball and yield `{'path', 'size', 'content'}` per text file.
+
+    The archive is decompressed as it downloads and members are read one at a
+    time, so memory stays bounded by `max_file_bytes` whatever the repository
+    size. Oversized, binary and vendored files are skipped; the download stops
+    quietly after `max_archive_bytes` of compressed data, or once the
+    IngestStop `stop` is set.
+    """
+    response = (session or requests).get(
+        f'{api_url}/repos/{owner}/{repo}/tarball',
+        headers=headers,
+        stream=True,
+        timeout=timeout
+    )
+    response.raise_for_status()
+    try:
+        with tarfile.open(fileobj=_LimitedReader(response.raw, max_archive_bytes, stop), mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile() or member.size > max_file_bytes:
+                    continue
+                # Drop the "{owner}-{repo}-{sha}/" directory GitHub wraps the tree in
+                path = member.name.split('/', 1)[-1]
+                if not is_text_path(path):
+                    continue
+                data = archive.extractfile(member).read()
+                if b'\0' in data[:8192]:
+                    continue
+                yield {
+                    'path': path,
+                    'size': member.size,
+                    'content': data.decode('utf-8', errors='ignore')
+                }
+    except (tarfile.ReadError, EOFError) as e:
+        # Raised when the archive is cut short by max_archive_bytes or `stop`
+        print(f"Stopped reading archive for {owner}/{repo}: {str(e)}")
+    finally:
+        response.close()
+
+
+class FileSampler:
+    """Picks up to `limit` files spread across the whole tree.
+
+    Priority files (README, manifests) at any depth are always considered
+    first; the rest are chosen by the smallest hash of their path, which is a
+    uniform sample that stays stable between runs. Only `limit` files are held
+    at a time, each truncated to `max_chars`.
+    """
+
+    def __init__(self, limit=20, max_chars=4000):
+        self.limit = limit
+        self.max_chars = max_chars
+        self._priority = []
+        self._reservoir = []
+
+    def add(self, file):
+        entry = {'path': file['path'], 'content': file['content'][:self.max_chars]}
+        if file['path'].rsplit('/', 1)[-1].lower() in PRIORITY_FILES:
+            self._priority.append((file['path'].count('/'), file['path'], entry))
+            self._priority = sorted(self._priority)[:self.limit]
+            return
+        # Max-heap on the hash so the largest key is evicted first
+        key = -int(hashlib.md5(file['path'].encode()).hexdigest()[:12], 16)
+        if len(self._reservoir) < self.limit:
+            heapq.heappush(self._reservoir, (key, file['path'], entry))
+        elif key > self._reservoir[0][0]:
+            heapq.heapreplace(self._reservoir, (key, file['path'], entry))
+
+    def result(self):
+        chosen = [entry for _, _, entry in self._priority]
+        chosen += [entry for _, _, entry in sorted(self._reservoir, key=lambda item: item[1])]
+        return chosen[:self.limit]
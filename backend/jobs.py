@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.models import db, AnalysisJob
+
+STAGES = ('metadata', 'commits', 'files', 'ai')
+
+
+class JobRunner:
+    """Runs analyses on a bounded thread pool and records their progress.
+
+    Job state lives in the database so a job submitted to one gunicorn worker
+    can be polled through any other. The pool size bounds how many analyses
+    run at once independently of how many HTTP requests are being served.
+    """
+
+    def __init__(self, app, max_workers=4, max_pending=64, ttl=24 * 3600):
+        self.app = app
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stages = {}
+
+    def submit(self, repo_url, func):
+        """Queue `func(progress)` and return its job, or None when the queue is full.
+
+        `func` receives a `progress(stage, state)` callback and returns the
+        JSON-serializable result stored on the job.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+
+        now = time.time()
+        job = AnalysisJob(
+            id=uuid.uuid4().hex,
+            repo_url=repo_url,
+            status='queued',
+            stages=json.dumps({stage: 'pending' for stage in STAGES}),
+            created_at=now,
+            updated_at=now
+        )
+        db.session.add(job)
+        AnalysisJob.query.filter(AnalysisJob.created_at < now - self.ttl).delete()
+        db.session.commit()
+
+        self._executor.submit(self._run, job.id, func)
+        return job
+
+    def progress(self, job_id, stage, state):
+        """Record a stage transition; safe to call from any thread."""
+        with self._lock:
+            stages = self._stages.setdefault(job_id, {stage: 'pending' for stage in STAGES})
+            stages[stage] = state
+            snapshot = json.dumps(stages)
+        self._update(job_id, stages=snapshot)
+
+    def _run(self, job_id, func):
+        try:
+            self._update(job_id, status='running')
+            with self.app.app_context():
+                result = func(lambda stage, state: self.progress(job_id, stage, state))
+            self._update(job_id, status='done', result=json.dumps(result))
+        except Exception as e:
+            print(f"Error in analysis job {job_id}: {str(e)}")
+            self._update(job_id, status='failed', error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._stages.pop(job_id, None)
+
+    def _update(self, job_id, **fields):
+        with self.app.app_context():
+            AnalysisJob.query.filter_by(id=job_id).update({**fields, 'updated_at': time.time()})
+            db.session.commit()
+
+
+class StageTracker:
+    """Turns completions of individual fetch tasks into per-stage progress.
+
+    `stage_of` maps each task name to the stage, or tuple of stages, it
+    contributes to; a stage is done once all of its tasks have completed.
+    """
+
+    def __init__(self, progress, stage_of):
+        self.progress = progress or (lambda stage, state: None)
+        self.stage_of = {
+            name: (stages,) if isinstance(stages, str) else tuple(stages)
+            for name, stages in stage_of.items()
+        }
+        self._remaining = Counter(stage for stages in self.stage_of.values() for stage in stages)
+        self._lock = threading.Lock()
+
+    def start(self):
+        for stage in self._remaining:
+            self.progress(stage, 'running')
+
+    def complete(self, name):
+        done = []
+        with self._lock:
+            for stage in self.stage_of[name]:
+                self._remaining[stage] -= 1
+                if self._remaining[stage] == 0:
+                    done.append(stage)
+        for stage in done:
+            self.progress(stage, 'done')
+
+    def finish(self):
+        """Close out stages whose tasks were abandoned at the stage deadline."""
+        with self._lock:
+            unfinished = [stage for stage, count in self._remaining.items() if count > 0]
+            for stage in unfinished:
+                self._remaining[stage] = 0
+        for stage in unfinished:
+            self.progress(stage, 'done')
@@ -0,0 +1,417 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import numpy as np
+
+from backend.telemetry import LLM_ATTEMPTS, LLM_COMPLETIONS, observe_llm_usage
+
+
+class LLMUnavailable(Exception):
+    """No model produced a completion: each failed, missed its deadline or had its circuit open."""
+
+
+class CircuitBreaker:
+    """Stops sending to a model after `failures` consecutive failed attempts.
+
+    Once `reset_after` seconds have passed a single trial attempt is let
+    through; its success closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, failures=3, reset_after=60):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+            self._trial = True
+            return True
+
+    def succeeded(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failed(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def released(self):
+        """An attempt that was cancelled before it could succeed or fail."""
+        with self._lock:
+            self._trial = False
+
+
+class LatencyTracker:
+    """Recent successful latencies of one model, to decide when a request is running late."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q, default=None):
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < self.min_samples:
+            return default
+        return float(np.percentile(samples, q))
+
+
+class LLMClient:
+    """OpenRouter chat completions over a primary model and its fallbacks.
+
+    Each attempt has its own deadline. When the running attempt passes its
+    model's recent `hedge_percentile` latency, the same request is sent to
+    the next model as well and whichever answers first is used; the other is
+    abandoned to its own timeout. A failed or expired attempt fails over to
+    the next model, and models whose circuit breaker is open are skipped.
+    Until a model has enough samples, `hedge_delay` stands in for its
+    percentile. Attempts run on the client's own thread pool, or as tasks
+    over `async_session` (an httpx.AsyncClient) for `acomplete`.
+    """
+
+    def __init__(self, session, url, models, api_key=None, timeout=90, connect_timeout=10, stream_timeout=60,
+                 hedge_delay=30, hedge_percentile=90, breaker_failures=3, breaker_reset=60, max_workers=32,
+                 async_session=None):
+        self.session = session
+        self.async_session = async_session
+        self.url = url
+        self.models = list(dict.fromkeys(model for model in models if model))
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.stream_timeout = stream_timeout
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.breakers = {model: CircuitBreaker(breaker_failures, breaker_reset) for model in self.models}
+        # Whole completions and time to the first streamed token are tracked apart
+        self.latency = {model: LatencyTracker() for model in self.models}
+        self.first_token = {model: LatencyTracker() for model in self.models}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    def snapshot(self):
+        return {
+            model: {
+                'circuit': self.breakers[model].state,
+                'hedge_after': round(self.hedge_after(model, self.latency), 3)
+            }
+            for model in self.models
+        }
+
+    def hedge_after(self, model, trackers):
+        return trackers[model].percentile(self.hedge_percentile, default=self.hedge_delay)
+
+    def complete(self, messages):
+        """`{'text', 'usage', 'model', 'hedged'}` from the first model to answer; raises LLMUnavailable."""
+        race = _Race(self, self.latency, lambda model: self._executor.submit(self._complete_once, model, messages))
+        race.launch()
+        while race.pending:
+            done, _ = wait(race.pending, timeout=race.wait_time(), return_when=FIRST_COMPLETED)
+            for future in done:
+                model = race.pending.pop(future)[0]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    race.errors.append(f'{model}: {str(e)}')
+                    continue
+                LLM_COMPLETIONS.labels(model=model, hedged=str(race.hedged).lower()).inc()
+                return {**result, 'model': model, 'hedged': race.hedged}
+            # Expired attempts are left to their own read timeout, which also counts their failure
+            race.expire()
+            race.advance()
+        raise LLMUnavailable('; '.join(race.errors) or 'No model configured')
+
+    async def acomplete(self, messages):
+        """`complete` on the event loop; attempts still running when it returns are cancelled."""
+        def start(model):
+            task = asyncio.ensure_future(self._acomplete_once(model, messages))
+            # Expired attempts finish unawaited; retrieve their outcome so asyncio doesn't report it
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            return task
+
+        race = _Race(self, self.latency, start)
+        try:
+            race.launch()
+            while race.pending:
+                done, _ = await asyncio.wait(race.pending, timeout=race.wait_time(),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model = race.pending.pop(task)[0]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        race.errors.append(f'{model}: {str(e)}')
+                        continue
+                    LLM_COMPLETIONS.labels(model=model, hedged=str(race.hedged).lower()).inc()
+                    return {**result, 'model': model, 'hedged': race.hedged}
+                race.expire()
+                race.advance()
+            raise LLMUnavailable('; '.join(race.errors) or 'No model configured')
+        finally:
+            for task in race.pending:
+                task.cancel()
+
+    def stream(self, messages):
+        """A StreamingCompletion; iterate it for text deltas."""
+        return StreamingCompletion(self, messages)
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _complete_once(self, model, messages):
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, headers=self._headers(),
+                                         json={"model": model, "messages": messages},
+                                         timeout=(self.connect_timeout, self.timeout))
+            response.raise_for_status()
+            body = response.json()
+            text = completion_text(body)
+        except Exception:
+            self._failed(model)
+            raise
+        return self._completed(model, started, text, body)
+
+    async def _acomplete_once(self, model, messages):
+        started = time.perf_counter()
+        try:
+            response = await self.async_session.post(self.url, headers=self._headers(),
+                                                     json={"model": model, "messages": messages},
+                                                     timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout))
+            response.raise_for_status()
+            body = response.json()
+            text = completion_text(body)
+        except asyncio.CancelledError:
+            # Lost the race, which says nothing about the model
+            self.breakers[model].released()
+            LLM_ATTEMPTS.labels(model=model, outcome='cancelled').inc()
+            raise
+        except Exception:
+            self._failed(model)
+            raise
+        return self._completed(model, started, text, body)
+
+    def _completed(self, model, started, text, body):
+        self._succeeded(model)
+        self.latency[model].record(time.perf_counter() - started)
+        observe_llm_usage(body.get('usage') or {})
+        return {'text': text, 'usage': body.get('usage') or {}}
+
+    def _stream_once(self, attempt, model, messages, events, cancel):
+        """Run one streamed attempt, putting `(attempt, kind, payload)` events for the reader."""
+        started = time.perf_counter()
+        usage = {}
+        first = True
+        try:
+            with self.session.post(self.url, headers=self._headers(),
+                                   json={"model": model, "messages": messages, "stream": True}, stream=True,
+                                   timeout=(self.connect_timeout, self.stream_timeout)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if cancel.is_set():
+                        break
+                    # Skip keep-alive comments and blank separators between events
+                    if not line or not line.startswith('data: '):
+                        continue
+                    data = line[len('data: '):]
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    if 'error' in chunk:
+                        raise Exception(chunk['error'].get('message', 'OpenRouter stream error'))
+                    # Only the final chunk carries usage, and only when the provider reports it
+                    if chunk.get('usage'):
+                        usage = chunk['usage']
+                    if not chunk.get('choices'):
+                        continue
+                    delta = chunk['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        if first:
+                            self.first_token[model].record(time.perf_counter() - started)
+                            first = False
+                        events.put((attempt, 'delta', delta))
+        except Exception as e:
+            if not cancel.is_set():
+                self._failed(model)
+                events.put((attempt, 'error', e))
+                return
+        if cancel.is_set():
+            self.breakers[model].released()
+            LLM_ATTEMPTS.labels(model=model, outcome='cancelled').inc()
+            return
+        self._succeeded(model)
+        observe_llm_usage(usage)
+        events.put((attempt, 'done', usage))
+
+    def _succeeded(self, model):
+        self.breakers[model].succeeded()
+        LLM_ATTEMPTS.labels(model=model, outcome='ok').inc()
+
+    def _failed(self, model):
+        self.breakers[model].failed()
+        LLM_ATTEMPTS.labels(model=model, outcome='failed').inc()
+
+
+def completion_text(body):
+    """The message text of a chat completion body; raises on an error body."""
+    if 'error' in body:
+        raise Exception(body['error'].get('message', 'OpenRouter error'))
+    return body['choices'][0]['message']['content']
+
+
+class _Race:
+    """Attempts in flight for one request: when to hedge, which have expired, what to try next."""
+
+    def __init__(self, client, trackers, start):
+        self.client = client
+        self.trackers = trackers
+        self.start = start
+        self.queue = list(client.models)
+        # handle -> (model, started)
+        self.pending = {}
+        self.errors = []
+        self.hedged = False
+        self.hedge_at = None
+
+    def launch(self):
+        """Start the next model whose circuit allows it; False when none is left."""
+        while self.queue:
+            model = self.queue.pop(0)
+            if self.client.breakers[model].allow():
+                self.pending[self.start(model)] = (model, time.monotonic())
+                if self.hedge_at is None:
+                    self.hedge_at = time.monotonic() + self.client.hedge_after(model, self.trackers)
+                return True
+            LLM_ATTEMPTS.labels(model=model, outcome='skipped').inc()
+            self.errors.append(f'{model}: circuit open')
+        return False
+
+    def wait_time(self):
+        wake = min(started for _, started in self.pending.values()) + self.client.timeout
+        if not self.hedged and self.queue:
+            wake = min(wake, self.hedge_at)
+        return max(0.0, wake - time.monotonic())
+
+    def expire(self):
+        """Drop attempts past their deadline; returns their handles."""
+        now = time.monotonic()
+        expired = [handle for handle, (_, started) in self.pending.items() if now >= started + self.client.timeout]
+        for handle in expired:
+            model = self.pending.pop(handle)[0]
+            self.errors.append(f'{model}: no answer within {self.client.timeout:g}s')
+        return expired
+
+    def advance(self):
+        """Hedge once the first attempt runs late, fail over once nothing is left running."""
+        if not self.pending:
+            self.launch()
+        elif not self.hedged and self.queue and time.monotonic() >= self.hedge_at:
+            self.hedged = self.launch()
+
+
+class StreamingCompletion:
+    """Text deltas from the first model to start answering.
+
+    Attempts race as in LLMClient.complete, hedged on time to the first
+    token. The first attempt to produce text wins and the rest are
+    cancelled; from then on the stream follows the winner and can no longer
+    fail over. `model`, `hedged` and `usage` are filled in as they become
+    known.
+    """
+
+    def __init__(self, client, messages):
+        self.client = client
+        self.messages = messages
+        self.model = None
+        self.hedged = False
+        self.usage = {}
+
+    def __iter__(self):
+        client = self.client
+        events = queue.Queue()
+        cancels = {}
+
+        def start(model):
+            attempt = len(cancels)
+            cancels[attempt] = threading.Event()
+            client._executor.submit(client._stream_once, attempt, model, self.messages, events, cancels[attempt])
+            return attempt
+
+        race = _Race(client, client.first_token, start)
+        try:
+            race.launch()
+            winner = None
+            while winner is None:
+                if not race.pending:
+                    raise LLMUnavailable('; '.join(race.errors) or 'No model configured')
+                try:
+                    attempt, kind, payload = events.get(timeout=race.wait_time())
+                except queue.Empty:
+                    for attempt in race.expire():
+                        cancels[attempt].set()
+                    race.advance()
+                    continue
+                if attempt not in race.pending:
+                    continue
+                if kind == 'error':
+                    race.errors.append(f'{race.pending.pop(attempt)[0]}: {str(payload)}')
+                    race.advance()
+                    continue
+
+                winner = attempt
+                self.model, self.hedged = race.pending[attempt][0], race.hedged
+                LLM_COMPLETIONS.labels(model=self.model, hedged=str(self.hedged).lower()).inc()
+                for other in race.pending:
+                    if other != winner:
+                        cancels[other].set()
+                if kind == 'done':
+                    self.usage = payload
+                    return
+                yield payload
+
+            while True:
+                try:
+                    attempt, kind, payload = events.get(timeout=client.stream_timeout)
+                except queue.Empty:
+                    raise LLMUnavailable(f'{self.model} sent nothing for {client.stream_timeout:g}s')
+                if attempt != winner:
+                    continue
+                if kind == 'error':
+                    raise payload
+                if kind == 'done':
+                    self.usage = payload
+                    return
+                yield payload
+        finally:
+            # Also reached when the reader stops early, e.g. the client disconnected
+            for cancel in cancels.values():
+                cancel.set()
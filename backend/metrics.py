@@ -1,189 +1,222 @@
-import traceback
-from flask import redirect, url_for, session
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from flask_dance.contrib.github import make_github_blueprint, github
-from flask_sqlalchemy import SQLAlchemy
-import json
-import os
-import requests
-import urllib
 from datetime import datetime, timezone
-import hashlib
-from dotenv import load_dotenv
-import base64
-import random
 
-def generate_metrics(repo_info, files_content, url):
-    score_components = {}
-    total_score = 0
-    max_score = 5
-    findings = {"strengths": [], "areas_for_improvement": [], "recommendations": []}
-    
-    # Documentation Score (1 point)
+import numpy as np
+
+# Columns score_batch reads; readme_length is -1 when there is no README
+INPUT_COLUMNS = (
+    'stars', 'forks', 'watchers', 'collaborators', 'tags', 'total_commits', 'open_issues',
+    'created_at', 'last_updated', 'readme_length', 'has_requirements', 'has_gitignore', 'has_tests'
+)
+
+# Each component scores 0-1; the weighted total is scaled to 0-5
+COMPONENT_WEIGHTS = {
+    'documentation': 1.0,
+    'structure': 1.0,
+    'engagement': 1.0,
+    'maintenance': 1.0,
+    'issues': 1.0,
+    'maturity': 1.0
+}
+
+# Engagement is the sum of each signal over its scale, capped per signal
+ENGAGEMENT_SIGNALS = {
+    'stars': (100, 0.3),
+    'forks': (50, 0.2),
+    'watchers': (50, 0.15),
+    'collaborators': (5, 0.15),
+    'tags': (10, 0.1),
+    'commit_frequency': (20, 0.1)
+}
+
+RATINGS = ('Excellent', 'Good', 'Average', 'Poor', 'Bad')
+RATING_THRESHOLDS = (4.5, 3.5, 2.5, 1.5)
+
+
+def to_datetime64(values):
+    """Second-resolution datetimes from GitHub timestamps or anything NumPy already reads."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'OUS':
+        # NumPy rejects the trailing "Z" of GitHub's UTC timestamps
+        values = np.array([str(value)[:19] for value in values])
+    return values.astype('datetime64[s]')
+
+
+def round_half(values, digits):
+    """np.round, with ties settled like Python's round so batch and single scores agree.
+
+    np.round scales before rounding, which can tip a value sitting just below
+    a halfway point (0.975 is really 0.97499...) the other way.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(float(value), digits) for value in values[near_half]]
+    return rounded
+
+
+def score_batch(columns, now=None, weights=None):
+    """Score many repositories at once from a dict of equal-length columns.
+
+    Every component is computed for the whole batch with array operations,
+    so rescoring tens of thousands of stored inputs after a weight change
+    takes milliseconds. Returns arrays: `components` by name, `total`,
+    `numeric_score` (0-5), `rating`, plus `age_days`, `days_since_update`
+    and `commit_frequency`.
+    """
+    weights = weights or COMPONENT_WEIGHTS
+    now = np.datetime64(now or datetime.now(timezone.utc).replace(tzinfo=None), 's')
+    column = {name: np.asarray(columns[name], dtype=float) for name in INPUT_COLUMNS
+              if name not in ('created_at', 'last_updated')}
+    day = np.timedelta64(1, 'D')
+    age_days = (now - to_datetime64(columns['created_at'])) // day
+    days_since_update = (now - to_datetime64(columns['last_updated'])) // day
+
+    # Commits per month
+    commit_frequency = np.where(age_days < 1, 0.0, column['total_commits'] * 30 / np.maximum(age_days, 1))
+
+    readme_length = column['readme_length']
+    documentation = np.select([readme_length > 500, readme_length >= 0], [1.0, 0.5], 0.0)
+
+    structure = (0.4 * (column['has_requirements'] > 0) + 0.3 * (column['has_gitignore'] > 0)
+                 + 0.3 * (column['has_tests'] > 0))
+
+    signals = {**column, 'commit_frequency': commit_frequency}
+    engagement = sum(np.minimum(signals[name] / scale, cap) for name, (scale, cap) in ENGAGEMENT_SIGNALS.items())
+    engagement = round_half(np.minimum(engagement, 1.0), 2)
+
+    frequency_score = np.select([commit_frequency >= 10, commit_frequency >= 4, commit_frequency >= 1], [0.6, 0.4, 0.2], 0.1)
+    recency_score = np.select([days_since_update < 7, days_since_update < 30, days_since_update < 90], [0.4, 0.3, 0.2], 0.0)
+    maintenance = frequency_score + recency_score
+
+    open_issues = column['open_issues']
+    issues = np.select([open_issues == 0, open_issues < 10, open_issues < 50], [1.0, 0.8, 0.6], 0.4)
+
+    maturity = np.select([age_days <= 7, age_days <= 30], [0.2, 0.6], 1.0)
+
+    components = {
+        'documentation': documentation,
+        'structure': structure,
+        'engagement': engagement,
+        'maintenance': maintenance,
+        'issues': issues,
+        'maturity': maturity
+    }
+    total = sum(components[name] * weight for name, weight in weights.items())
+    numeric_score = round_half(total / sum(weights.values()) * 5, 1)
+    rating = np.select([numeric_score >= threshold for threshold in RATING_THRESHOLDS], RATINGS[:-1], RATINGS[-1])
+
+    return {
+        'components': components,
+        'total': total,
+        'numeric_score': numeric_score,
+        'rating': rating,
+        'age_days': age_days,
+        'days_since_update': days_since_update,
+        'commit_frequency': commit_frequency
+    }
+
+
+def metric_inputs(repo_info, files_content):
+    """One repository's row of score_batch inputs.
+
+    Test and manifest checks also count what static analysis found across
+    the whole tree, not just in the sampled files.
+    """
     readme_files = [f for f in files_content if f['path'].lower() == 'readme.md']
-    has_readme = len(readme_files) > 0
-    
-    if has_readme:
-        readme_content = readme_files[0]['content']
-        readme_length = len(readme_content)
-        if readme_length > 500:
-            score_components['documentation'] = 1
-            findings['strengths'].append("Comprehensive README documentation")
-        else:
-            score_components['documentation'] = 0.5
-            findings['areas_for_improvement'].append("README could be more detailed")
-            findings['recommendations'].append("Expand README with installation, usage, and contribution guidelines")
+    static_analysis = repo_info.get('static_analysis') or {}
+    return {
+        'stars': repo_info['stars'],
+        'forks': repo_info['forks'],
+        'watchers': repo_info.get('watchers_count', 0),
+        'collaborators': repo_info.get('collaborators_count', len(repo_info.get('collaborators', []))),
+        'tags': repo_info.get('tags_count', len(repo_info.get('tags', []))),
+        'total_commits': repo_info.get('total_commits', 0),
+        'open_issues': repo_info['open_issues_count'],
+        'created_at': repo_info['created_at'],
+        'last_updated': repo_info['last_updated'],
+        'readme_length': len(readme_files[0]['content']) if readme_files else -1,
+        'has_requirements': any(f['path'].endswith(('.txt', '.toml', 'requirements.txt', 'package.json'))
+                                for f in files_content) or bool(static_analysis.get('manifests')),
+        'has_gitignore': any(f['path'] == '.gitignore' for f in files_content),
+        'has_tests': any('test' in f['path'].lower() for f in files_content) or bool(static_analysis.get('test_files'))
+    }
+
+
+def describe(inputs, breakdown, age_days):
+    """Strengths, areas for improvement and recommendations for one scored repository."""
+    findings = {"strengths": [], "areas_for_improvement": [], "recommendations": []}
+
+    if inputs['readme_length'] > 500:
+        findings['strengths'].append("Comprehensive README documentation")
+    elif inputs['readme_length'] >= 0:
+        findings['areas_for_improvement'].append("README could be more detailed")
+        findings['recommendations'].append("Expand README with installation, usage, and contribution guidelines")
     else:
-        score_components['documentation'] = 0
         findings['areas_for_improvement'].append("Missing README documentation")
         findings['recommendations'].append("Add a README.md file with project documentation")
 
-    # Project Structure Score (1 point)
-    has_requirements = any(f['path'].endswith(('.txt', '.toml', 'requirements.txt', 'package.json')) for f in files_content)
-    has_gitignore = any(f['path'] == '.gitignore' for f in files_content)
-    has_tests = any('test' in f['path'].lower() for f in files_content)
-    
-    structure_score = 0
-    if has_requirements:
-        structure_score += 0.4
+    if inputs['has_requirements']:
         findings['strengths'].append("Dependency management files present")
     else:
         findings['recommendations'].append("Add dependency management files (requirements.txt/package.json)")
-    
-    if has_gitignore:
-        structure_score += 0.3
+    if inputs['has_gitignore']:
         findings['strengths'].append("Proper git configuration with .gitignore")
-    
-    if has_tests:
-        structure_score += 0.3
+    if inputs['has_tests']:
         findings['strengths'].append("Testing infrastructure present")
     else:
         findings['areas_for_improvement'].append("No tests found")
         findings['recommendations'].append("Add unit tests to ensure code quality")
-    
-    score_components['structure'] = structure_score
-
-    # Community Engagement Score (1 point)
-    stars = repo_info['stars']
-    forks = repo_info['forks']
-    watchers = repo_info.get('watchers_count', 0)
-    collaborators = len(repo_info.get('collaborators', []))
-    tags = len(repo_info.get('tags', []))
-    
-    repo_created = datetime.strptime(repo_info['created_at'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
-    last_update = datetime.strptime(repo_info['last_updated'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
-    now = datetime.now(timezone.utc)
-
-    # Maintenance Score (1 point)
-    repo_age_days = (now - repo_created).days
-    days_since_update = (now - last_update).days
-    total_commits = repo_info.get('total_commits', 0)
-    
-    # Calculate commit frequency (commits per month)
-    if repo_age_days < 1:
-        commit_frequency = 0
-    else:
-        commit_frequency = (total_commits * 30) / repo_age_days
-
-    # Calculate engagement score based on multiple factors
-    engagement_factors = {
-        'stars': min(stars / 100, 0.3),
-        'forks': min(forks / 50, 0.2),
-        'watchers': min(watchers / 50, 0.15),
-        'collaborators': min(collaborators / 5, 0.15),
-        'tags': min(tags / 10, 0.1),
-        'commit_activity': min(commit_frequency / 20, 0.1)
-    }
-    
-    engagement_score = sum(engagement_factors.values())
-    engagement_score = round(min(engagement_score, 1.0), 2)
-    score_components['engagement'] = engagement_score
-    
-    engagement_details = []
-    if stars > 0:
-        engagement_details.append(f"{stars} stars")
-    if forks > 0:
-        engagement_details.append(f"{forks} forks")
-    if watchers > 0:
-        engagement_details.append(f"{watchers} watchers")
-    
+
+    engagement_details = [f"{inputs[name]} {name}" for name in ('stars', 'forks', 'watchers') if inputs[name] > 0]
     if engagement_details:
         findings['strengths'].append(f"Community engagement: {', '.join(engagement_details)}")
-    
-    if engagement_score < 0.3:
+    if breakdown['engagement'] < 0.3:
         findings['areas_for_improvement'].append("Could benefit from more community engagement")
         findings['recommendations'].append("Consider promoting the repository to attract more contributors")
 
-    if commit_frequency >= 10:
-        frequency_score = 0.6
-    elif commit_frequency >= 4:
-        frequency_score = 0.4
-    elif commit_frequency >= 1:
-        frequency_score = 0.2
-    else:
-        frequency_score = 0.1
-
-    if days_since_update < 7:
-        recency_score = 0.4
-    elif days_since_update < 30:
-        recency_score = 0.3
-    elif days_since_update < 90:
-        recency_score = 0.2
-    else:
-        recency_score = 0
-
-    maintenance_score = frequency_score + recency_score
-    
-    if maintenance_score >= 0.8:
+    if breakdown['maintenance'] >= 0.8:
         findings['strengths'].append("Highly active maintenance with regular commits")
-    elif maintenance_score >= 0.5:
+    elif breakdown['maintenance'] >= 0.5:
         findings['strengths'].append("Regular maintenance activity")
-    elif maintenance_score >= 0.3:
+    elif breakdown['maintenance'] >= 0.3:
         findings['areas_for_improvement'].append("Repository could benefit from more frequent updates")
     else:
         findings['areas_for_improvement'].append("Repository appears to be unmaintained")
-    
-    score_components['maintenance'] = maintenance_score
-
-    # Issues Score (1 point)
-    open_issues = repo_info['open_issues_count']
-    if open_issues == 0:
-        issues_score = 1
-    elif open_issues < 10:
-        issues_score = 0.8
-    elif open_issues < 50:
-        issues_score = 0.6
-    else:
-        issues_score = 0.4
-        findings['areas_for_improvement'].append(f"Large number of open issues ({open_issues})")
-    
-    score_components['issues'] = issues_score
 
-    if repo_age_days <= 7:
-        maturity_score = 0.2
+    if inputs['open_issues'] >= 50:
+        findings['areas_for_improvement'].append(f"Large number of open issues ({inputs['open_issues']})")
+
+    if age_days <= 7:
         findings['areas_for_improvement'].append("Repository is very new with limited commit history")
         findings['recommendations'].append("Continue developing the project and making regular commits")
-    elif repo_age_days <= 30:
-        maturity_score = 0.6
+    elif age_days <= 30:
         findings['areas_for_improvement'].append("Repository is relatively new")
     else:
-        maturity_score = 1.0
         findings['strengths'].append("Repository has established history")
-    
-    score_components['maturity'] = maturity_score
-    max_score = 6
-
-    total_score = sum(score_components.values())
-    normalized_score = round((total_score / max_score) * 5, 1)
-    
-    if normalized_score >= 4.5:
-        rating = "Excellent"
-    elif normalized_score >= 3.5:
-        rating = "Good"
-    elif normalized_score >= 2.5:
-        rating = "Average"
-    elif normalized_score >= 1.5:
-        rating = "Poor"
-    else:
-        rating = "Bad"
+
+    return findings
+
+
+def score_rows(rows, now=None, weights=None):
+    """Score a list of metric_inputs rows; one result dict per row, as generate_metrics returns."""
+    if not rows:
+        return []
+    scored = score_batch({name: [row[name] for row in rows] for name in INPUT_COLUMNS}, now=now, weights=weights)
+    results = []
+    for index, row in enumerate(rows):
+        breakdown = {name: round(float(values[index]), 2) for name, values in scored['components'].items()}
+        findings = describe(row, breakdown, int(scored['age_days'][index]))
+        results.append({
+            'score': str(scored['rating'][index]),
+            'numeric_score': float(scored['numeric_score'][index]),
+            'score_breakdown': breakdown,
+            **findings
+        })
+    return results
+
+
+def generate_metrics(repo_info, files_content, url):
+    """Deterministic 0-5 score, its six-part breakdown and findings for one repository."""
+    return score_rows([metric_inputs(repo_info, files_content)])[0]
@@ -0,0 +1,81 @@
+import json
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+class AnalysisResult(db.Model):
+    """A finished analysis, keyed on the hash of the normalized repository URL."""
+    __tablename__ = 'analysis_results'
+
+    repo_hash = db.Column(db.String(32), primary_key=True)
+    repo_url = db.Column(db.String(512), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    # Seconds since the epoch, indexed so expired rows can be pruned cheaply
+    cached_at = db.Column(db.Float, nullable=False, index=True)
+
+
+class AnalysisJob(db.Model):
+    """An analysis running in the background, polled by id from any worker."""
+    __tablename__ = 'analysis_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    repo_url = db.Column(db.String(512), nullable=False)
+    # queued, running, done or failed
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    # JSON object of stage name -> pending, running or done
+    stages = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.Float, nullable=False, index=True)
+    updated_at = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'repo_url': self.repo_url,
+            'status': self.status,
+            'stages': json.loads(self.stages),
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class IndexedFile(db.Model):
+    """A source file's MinHash signature in the plagiarism index."""
+    __tablename__ = 'indexed_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    repo_hash = db.Column(db.String(32), nullable=False, index=True)
+    repo_url = db.Column(db.String(512), nullable=False)
+    path = db.Column(db.String(1024), nullable=False)
+    # NUM_PERM uint32 values
+    signature = db.Column(db.LargeBinary, nullable=False)
+    indexed_at = db.Column(db.Float, nullable=False)
+
+
+class LshBucket(db.Model):
+    """One LSH band of an indexed file; files sharing a band key are candidates."""
+    __tablename__ = 'lsh_buckets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    band_key = db.Column(db.BigInteger, nullable=False, index=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('indexed_files.id'), nullable=False, index=True)
+
+
+class AnalysisSnapshot(db.Model):
+    """What the last analysis of a repository derived, so the next one only processes what changed."""
+    __tablename__ = 'analysis_snapshots'
+
+    repo_hash = db.Column(db.String(32), primary_key=True)
+    repo_url = db.Column(db.String(512), nullable=False)
+    # Default branch commit the snapshot describes
+    head_sha = db.Column(db.String(40), nullable=False)
+    # JSON object of commit history, file sample, scanner findings, packed context and verdict
+    state = db.Column(db.Text, nullable=False)
+    # Seconds since the epoch of the last full analysis the state was built up from
+    rebuilt_at = db.Column(db.Float, nullable=False, index=True)
+    updated_at = db.Column(db.Float, nullable=False)
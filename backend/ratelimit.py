@@ -0,0 +1,151 @@
+import email.utils
+import re
+import threading
+import time
+
+# GitHub sends the first pair, OpenAI-style APIs the second
+REMAINING_HEADERS = ('X-RateLimit-Remaining', 'X-RateLimit-Remaining-Requests')
+RESET_HEADERS = ('X-RateLimit-Reset', 'X-RateLimit-Reset-Requests')
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+# Pause after a 429 that says nothing about when to come back
+DEFAULT_BACKOFF = 60
+
+
+def parse_reset(value, now=None):
+    """Seconds until a rate-limit window resets, or None if `value` is unreadable.
+
+    Accepts epoch seconds (GitHub), epoch milliseconds (OpenRouter), a delay
+    in seconds, or a duration such as "1m30s" (OpenAI).
+    """
+    now = time.time() if now is None else now
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        parts = DURATION_PATTERN.findall(value or '')
+        return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts) if parts else None
+    if number > 1e12:
+        return max(0.0, number / 1000 - now)
+    if number > 1e9:
+        return max(0.0, number - now)
+    return max(0.0, number)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds from a Retry-After header, which is either a delay or an HTTP date."""
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimit:
+    """Shared view of one API's request budget, kept current from response headers.
+
+    `observe` is installed as a response hook on the API's session, so every
+    response updates the remaining count and reset time. `acquire` is called
+    before starting a unit of work and blocks while the budget is too low for
+    it, instead of letting the work run into 403s and 429s. GitHub reports a
+    separate budget per resource (core, graphql, search), each tracked apart.
+    """
+
+    def __init__(self, name, reserve=0, max_wait=3600):
+        self.name = name
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._budgets = {}
+        self._condition = threading.Condition()
+
+    def observe(self, response, *args, **kwargs):
+        headers = response.headers
+        remaining = next((headers[name] for name in REMAINING_HEADERS if name in headers), None)
+        reset = next((headers[name] for name in RESET_HEADERS if name in headers), None)
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        now = time.time()
+
+        with self._condition:
+            budget = self._budgets.setdefault(headers.get('X-RateLimit-Resource', 'default'), [None, 0.0])
+            if remaining is not None:
+                try:
+                    budget[0] = int(float(remaining))
+                except ValueError:
+                    pass
+            delay = parse_reset(reset, now) if reset is not None else None
+            if delay is not None:
+                budget[1] = now + delay
+
+            # 403 is also plain "forbidden", only treat it as a limit when it says so
+            if response.status_code == 429 or (response.status_code == 403 and (retry_after is not None or budget[0] == 0)):
+                budget[0] = 0
+                if retry_after is not None:
+                    budget[1] = max(budget[1], now + retry_after)
+                elif budget[1] <= now:
+                    budget[1] = now + DEFAULT_BACKOFF
+            self._condition.notify_all()
+
+    def acquire(self, cost=1):
+        """Block until every budget has `cost` requests to spare; returns seconds waited."""
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                retry_at = self._take(cost)
+                waited = time.monotonic() - started
+                if not retry_at:
+                    return waited
+                if waited >= self.max_wait:
+                    self._deduct(cost)
+                    return waited
+                self._condition.wait(min(retry_at - time.time(), self.max_wait - waited))
+
+    def try_acquire(self, cost=1):
+        """Take `cost` without blocking; returns 0 on success, else when to retry."""
+        with self._condition:
+            return self._take(cost)
+
+    def headroom(self):
+        """Fewest requests left in any budget, None until a response has reported one."""
+        with self._condition:
+            self._roll_over(time.time())
+            known = [budget[0] for budget in self._budgets.values() if budget[0] is not None]
+            return min(known) - self.reserve if known else None
+
+    def _take(self, cost):
+        # The cost is deducted from the estimate straight away so concurrent
+        # callers don't all pass on the same reading; the next response
+        # replaces the estimate with the server's count.
+        now = time.time()
+        self._roll_over(now)
+        retry_at = max((budget[1] for budget in self._budgets.values()
+                        if budget[0] is not None and budget[0] - cost < self.reserve and budget[1]), default=0.0)
+        if not retry_at:
+            self._deduct(cost)
+        return retry_at
+
+    def _deduct(self, cost):
+        for budget in self._budgets.values():
+            if budget[0] is not None:
+                budget[0] -= cost
+
+    def _roll_over(self, now):
+        for budget in self._budgets.values():
+            if budget[1] and now >= budget[1]:
+                # The window reset, the next response reports the new budget
+                budget[0], budget[1] = None, 0.0
+
+    def snapshot(self):
+        """Current budgets as `{resource: {'remaining', 'resets_in'}}`."""
+        now = time.time()
+        with self._condition:
+            return {
+                resource: {'remaining': remaining, 'resets_in': round(max(0.0, resets_at - now), 1) if resets_at else None}
+                for resource, (remaining, resets_at) in self._budgets.items()
+            }
+
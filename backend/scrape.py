@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml tokenizes several times faster than the stdlib parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Blocks that never hold anything we extract; inline JSON payloads and icons
+# make up much of a repository page
+NOISE_PATTERN = re.compile(r'<(script|style|svg|template)\b.*?</\1\s*>', re.S | re.I)
+COUNTER_LINKS = ('stargazers', 'forks', 'contributors')
+CREATED_PATTERN = re.compile(r'>\s*Created\s*<.{0,400}?<relative-time[^>]*\sdatetime="([^"]+)"', re.S)
+
+
+class RepositoryPageStrainer(SoupStrainer):
+    """Only build the counter links, language stats and timestamps into the tree.
+
+    Everything inside an allowed element is kept, the rest of the page is
+    tokenized but never turned into Tag objects.
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        attrs = attrs or {}
+        if name == 'a':
+            return (attrs.get('href') or '').endswith(COUNTER_LINKS)
+        return name == 'relative-time' or attrs.get('data-test-selector') == 'languages-stats'
+
+    def allow_string_creation(self, string):
+        return False
+
+
+def parse_number(text):
+    """Parse numbers that might include k, m suffixes"""
+    if not text:
+        return 0
+
+    # Clean up the text
+    text = text.strip().lower()
+
+    # Handle k/m suffixes
+    multiplier = 1
+    if 'k' in text:
+        multiplier = 1000
+        text = text.replace('k', '')
+    elif 'm' in text:
+        multiplier = 1000000
+        text = text.replace('m', '')
+
+    try:
+        # Extract numeric part
+        number = float(''.join(c for c in text if c.isdigit() or c == '.'))
+        return int(number * multiplier)
+    except (ValueError, TypeError):
+        return 0
+
+
+def read_page(soup, html):
+    """Repository details from a parsed page; dates are None when the page lacks them."""
+    def counter(link):
+        element = soup.select_one(f'a[href$="{link}"] span.Counter')
+        return parse_number(element.text.strip() if element else '0')
+
+    languages = {}
+    for lang_elem in soup.select('div[data-test-selector="languages-stats"] span.color-fg-default'):
+        percent_elem = lang_elem.find_next_sibling('span', class_='color-fg-muted')
+        if percent_elem:
+            try:
+                languages[lang_elem.text.strip()] = float(percent_elem.text.strip().rstrip('%'))
+            except ValueError:
+                continue
+
+    # Last updated is typically the first relative-time element
+    last_updated = soup.find('relative-time')
+    created = CREATED_PATTERN.search(html)
+
+    return {
+        'stars': counter('stargazers'),
+        'forks': counter('forks'),
+        'languages': languages,
+        'created_at': created.group(1) if created else None,
+        'last_updated': last_updated.get('datetime') if last_updated else None,
+        'contributors_count': counter('contributors')
+    }
+
+
+def extract_full(html):
+    """Reference extractor: the whole page through BeautifulSoup."""
+    return read_page(BeautifulSoup(html, HTML_PARSER), html)
+
+
+def extract_strained(html):
+    """Drop script, style and icon blocks, then build only the elements we read."""
+    return read_page(BeautifulSoup(NOISE_PATTERN.sub('', html), HTML_PARSER, parse_only=RepositoryPageStrainer()), html)
+
+
+EXTRACTORS = {
+    'strained': extract_strained,
+    'full': extract_full
+}
+
+
+class RepositoryScraper:
+    """Fetch a repository's GitHub page and extract its details, cached per repository.
+
+    `extractor` names one of EXTRACTORS. Results are kept for `ttl` seconds
+    in a small in-process LRU; failed scrapes return None and are not cached.
+    Pages are fetched from `web_url` plus the repository URL's path.
+    """
+
+    def __init__(self, extractor='strained', ttl=300, max_entries=512, timeout=None, session=None,
+                 web_url='https://github.com'):
+        self.extract = EXTRACTORS[extractor]
+        self.web_url = web_url.rstrip('/')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.session = session or requests
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scrape(self, repo_url):
+        key = repo_url.rstrip('/').lower()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        try:
+            response = self.session.get(self.web_url + urlparse(repo_url).path, timeout=self.timeout)
+            response.raise_for_status()
+            info = self.extract(response.text)
+        except Exception as e:
+            print(f"Error scraping repository: {e}")
+            return None
+
+        with self._lock:
+            self._entries[key] = (info, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
@@ -0,0 +1,239 @@
+import multiprocessing
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Each rule pairs lowercase keywords, at least one of which appears on any
+# line the rule can match, with the pattern itself. Patterns that also match
+# surrounding context capture the secret in their first group.
+SECRET_RULES = {
+    'aws_access_key': (('akia', 'asia'), r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b'),
+    'aws_secret_key': (('aws',), r'(?i:aws.{0,20}?(?:secret|private).{0,20}?[=:]\s*["\']?)([A-Za-z0-9/+]{40})\b'),
+    'openai_key': (('sk-',), r'\bsk-(?:proj-|svcacct-|admin-)?[A-Za-z0-9_-]{20,}T3BlbkFJ[A-Za-z0-9_-]{20,}|\bsk-proj-[A-Za-z0-9_-]{40,}'),
+    'anthropic_key': (('sk-',), r'\bsk-ant-(?:api|admin)\d{2}-[A-Za-z0-9_-]{80,}'),
+    'github_token': (('ghp_', 'gho_', 'ghu_', 'ghs_', 'ghr_', 'github_pat_'), r'\bgh[pousr]_[A-Za-z0-9]{36}\b|\bgithub_pat_[A-Za-z0-9_]{80,}'),
+    'slack_token': (('xox',), r'\bxox[abposr]-[A-Za-z0-9-]{10,}'),
+    'stripe_key': (('_live_',), r'\b[rs]k_live_[A-Za-z0-9]{24,}'),
+    'google_api_key': (('aiza',), r'\bAIza[0-9A-Za-z_-]{35}\b'),
+    'telegram_bot_token': ((':aa',), r'\b\d{8,10}:AA[A-Za-z0-9_-]{33}\b'),
+    'private_key_block': (('private',), r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY(?: BLOCK)?-----'),
+    # Raw keys only count next to a telling name, a bare 64-char hex is usually a hash
+    'eth_private_key': (('key',), r'(?i:(?:private|priv|secret|wallet|signer|deployer)[_\s-]?key.{0,10}?[=:]\s*["\']?)((?:0x)?[a-fA-F0-9]{64})\b'),
+    'solana_private_key': (('key',), r'(?i:(?:private|secret|wallet|keypair)[_\s-]?key.{0,10}?[=:]\s*["\']?)([1-9A-HJ-NP-Za-km-z]{86,88})\b'),
+    # Anything else assigned to a secret-sounding name, kept only if high entropy
+    'generic_secret': (('key', 'token', 'secret', 'passw'),
+                       r'(?i:(?:api|access|auth|client|secret|private)[_-]?(?:key|token|secret)|password|passwd|secret)'
+                       r'["\']?\s*[:=]\s*["\']([^"\'\s]{16,})["\']'),
+}
+RULE_PATTERNS = {name: re.compile(pattern) for name, (_, pattern) in SECRET_RULES.items()}
+KEYWORD_RULES = {
+    keyword: [name for name, (keywords, _) in SECRET_RULES.items() if keyword in keywords]
+    for keywords, _ in SECRET_RULES.values() for keyword in keywords
+}
+
+# Every keyword in one alternation, run once over the lowercased file; rules
+# then only run on the lines where one of their keywords occurs. Far cheaper
+# than running each pattern, most of them case-insensitive, over everything.
+KEYWORD_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in sorted(KEYWORD_RULES, key=len, reverse=True)))
+
+# A key block runs from its BEGIN line to this; the base64 body between is the secret
+KEY_BLOCK_END = re.compile(r'-----END [A-Z ]*PRIVATE KEY(?: BLOCK)?-----')
+
+# Solana keypair files are JSON arrays of 64 bytes, often spread over many lines
+KEYPAIR_PATTERN = re.compile(r'\[\s*(?:\d{1,3}\s*,\s*){63}\d{1,3}\s*\]')
+KEYPAIR_ANCHOR = re.compile(r'\[\s*\d{1,3}\s*,\s*\d{1,3}\s*,\s*\d{1,3}\s*,')
+
+# Values that are clearly examples, templates or references to the environment
+PLACEHOLDER_PATTERN = re.compile(
+    r'(?i)example|sample|dummy|placeholder|changeme|your[_-]|<[^>]*>|\$\{|\{\{|process\.env|os\.environ|getenv|'
+    r'xxxx|\*\*\*\*|test|fake|redacted|insert|replace|todo'
+)
+
+# Generic candidates below these Shannon entropies (bits per character) are ignored
+GENERIC_MIN_ENTROPY = 3.5
+MAX_FINDINGS = 50
+
+
+def shannon_entropy(values):
+    """Per-string Shannon entropy for a batch of strings, computed in one pass."""
+    if not values:
+        return np.empty(0)
+    encoded = [value.encode('utf-8', errors='ignore') for value in values]
+    lengths = np.array([len(value) for value in encoded])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+    rows = np.repeat(np.arange(len(encoded)), lengths)
+    counts = np.bincount(rows * 256 + data, minlength=len(encoded) * 256).reshape(len(encoded), 256)
+    probabilities = counts / np.maximum(lengths, 1)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.nansum(np.where(probabilities > 0, probabilities * np.log2(probabilities), 0), axis=1)
+
+
+def is_placeholder(value):
+    return not value.strip() or bool(PLACEHOLDER_PATTERN.search(value)) or len(set(value)) <= 3
+
+
+def redact(value):
+    return f'{value[:4]}…{value[-2:]}' if len(value) > 8 else '…'
+
+
+def lowercase_aligned(content):
+    """`content.lower()` with offsets that still line up with `content`."""
+    lowered = content.lower()
+    if len(lowered) == len(content):
+        return lowered
+    # A handful of characters lowercase to two; leave those alone
+    return ''.join(char.lower() if len(char.lower()) == 1 else char for char in content)
+
+
+def match_end(kind, content, match):
+    """Where a finding's secret ends; a key block without its END line runs to the end of the file."""
+    if kind != 'private_key_block':
+        return match.end()
+    end = KEY_BLOCK_END.search(content, match.end())
+    return end.end() if end else len(content)
+
+
+def scan_text(path, content):
+    """All findings in one file: `{'type', 'path', 'line', 'end_line', 'preview'}`.
+
+    `line` to `end_line` is every line the secret spans, which for a key
+    block is the whole block.
+    """
+    candidates = []
+    checked = set()
+    for hit in KEYWORD_PATTERN.finditer(lowercase_aligned(content)):
+        line_start = content.rfind('\n', 0, hit.start()) + 1
+        line_end = content.find('\n', hit.end())
+        if line_end == -1:
+            line_end = len(content)
+        for kind in KEYWORD_RULES[hit.group()]:
+            if (kind, line_start) in checked:
+                continue
+            checked.add((kind, line_start))
+            pattern = RULE_PATTERNS[kind]
+            for match in pattern.finditer(content, line_start, line_end):
+                candidates.append((kind, match.start(), match_end(kind, content, match),
+                                   match.group(1) if pattern.groups else match.group()))
+
+    # An END line before any BEGIN means the block started before this text did, as when a diff hunk
+    # opens partway through a key; everything up to it is key material
+    if any(kind == 'private_key_block' for kind, _ in checked):
+        end = KEY_BLOCK_END.search(content)
+        if end and not any(kind == 'private_key_block' and start < end.start() for kind, start, _, _ in candidates):
+            candidates.append(('private_key_block', 0, end.end(), end.group()))
+
+    for anchor in KEYPAIR_ANCHOR.finditer(content):
+        match = KEYPAIR_PATTERN.match(content, anchor.start())
+        if match:
+            candidates.append(('solana_private_key', match.start(), match.end(), match.group()))
+
+    # A value a provider rule already recognised is not reported again as generic
+    known = {value for kind, _, _, value in candidates if kind != 'generic_secret'}
+    candidates = sorted(
+        ((kind, start, end, value) for kind, start, end, value in candidates
+         if not is_placeholder(value) and not (kind == 'generic_secret' and value in known)),
+        key=lambda candidate: candidate[1]
+    )
+    generic = [value for kind, _, _, value in candidates if kind == 'generic_secret']
+    entropies = iter(shannon_entropy(generic))
+    findings = []
+    for kind, start, end, value in candidates:
+        if kind == 'generic_secret' and next(entropies) < GENERIC_MIN_ENTROPY:
+            continue
+        line = content.count('\n', 0, start) + 1
+        findings.append({
+            'type': kind,
+            'path': path,
+            'line': line,
+            'end_line': line + content.count('\n', start, end),
+            'preview': redact(value)
+        })
+    return findings
+
+
+def finding_lines(findings):
+    """`{path: [line, ...]}` covering every line of every finding, the lines that must never reach a prompt."""
+    lines = {}
+    for finding in findings:
+        lines.setdefault(finding['path'], []).extend(range(finding['line'], finding['end_line'] + 1))
+    return lines
+
+
+def finding_counts(findings):
+    """`{path: {type: count}}` for every finding, so counts can be taken back out per file."""
+    counts = {}
+    for finding in findings:
+        path_counts = counts.setdefault(finding['path'], {})
+        path_counts[finding['type']] = path_counts.get(finding['type'], 0) + 1
+    return counts
+
+
+def scan_batch(files):
+    """Scan a list of `(path, content)` pairs; the unit of work sent to pool processes."""
+    findings = []
+    for path, content in files:
+        findings.extend(scan_text(path, content))
+    return findings
+
+
+class SecretScanner:
+    """Ingestion consumer that scans every text file for exposed credentials.
+
+    Without an executor files are scanned inline as they stream past. With a
+    process pool they are grouped into batches of about `batch_bytes` and
+    scanned in parallel while ingestion continues.
+    """
+
+    def __init__(self, executor=None, batch_bytes=4 * 1024 * 1024):
+        self.executor = executor
+        self.batch_bytes = batch_bytes
+        self.files_scanned = 0
+        self.bytes_scanned = 0
+        self._findings = []
+        self._batch = []
+        self._batch_size = 0
+        self._futures = []
+
+    def add(self, file):
+        self.files_scanned += 1
+        self.bytes_scanned += len(file['content'])
+        if self.executor is None:
+            self._findings.extend(scan_text(file['path'], file['content']))
+            return
+        self._batch.append((file['path'], file['content']))
+        self._batch_size += len(file['content'])
+        if self._batch_size >= self.batch_bytes:
+            self._submit()
+
+    def result(self):
+        if self._batch:
+            self._submit()
+        for future in self._futures:
+            try:
+                self._findings.extend(future.result())
+            except Exception as e:
+                print(f"Error scanning for secrets: {str(e)}")
+        self._futures = []
+
+        counts = Counter(finding['type'] for finding in self._findings)
+        return {
+            'files_scanned': self.files_scanned,
+            'bytes_scanned': self.bytes_scanned,
+            'counts': dict(counts),
+            'findings': self._findings[:MAX_FINDINGS],
+            # Uncapped, so redaction and incremental counts cover findings past the reported ones
+            'lines': finding_lines(self._findings),
+            'path_counts': finding_counts(self._findings)
+        }
+
+    def _submit(self):
+        self._futures.append(self.executor.submit(scan_batch, self._batch))
+        self._batch = []
+        self._batch_size = 0
+
+
+def create_scan_pool(processes):
+    """Process pool for SecretScanner; spawned so workers don't inherit the server's threads."""
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
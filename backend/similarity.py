@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import insert
+
+from backend.models import db, IndexedFile, LshBucket
+
+# Only source code is indexed; prose, config and licenses match trivially
+SOURCE_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.mjs', '.rs', '.sol', '.go', '.java', '.kt', '.c', '.h', '.cc',
+    '.cpp', '.hpp', '.cs', '.rb', '.php', '.swift', '.scala', '.move', '.vy', '.cairo'
+}
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+MIN_SHINGLES = 30
+CHUNK = 2048
+
+TOKEN_RE = re.compile(r'[A-Za-z_]\w*|\d+|[^\s\w]')
+
+# Fixed seeds so signatures stay comparable across processes and restarts
+_rng = np.random.RandomState(0x5EED)
+_A = _rng.randint(1, 2 ** 62, size=NUM_PERM, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.randint(0, 2 ** 62, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_SHINGLE_POWERS = np.array([(0x01000193 ** i) & 0xFFFFFFFFFFFFFFFF for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.randint(1, 2 ** 62, size=ROWS, dtype=np.int64).astype(np.uint64)
+_BAND_OFFSETS = (np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+
+def is_source_path(path):
+    return os.path.splitext(path.lower())[1] in SOURCE_EXTENSIONS
+
+
+def shingle_hashes(content):
+    """Unique 32-bit hashes of the file's 5-token shingles, ignoring case and whitespace."""
+    tokens = TOKEN_RE.findall(content.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+    # Hash each distinct token once, then map back onto the token stream
+    unique, inverse = np.unique(np.array(tokens), return_inverse=True)
+    token_hashes = np.array([zlib.crc32(token.encode()) for token in unique], dtype=np.uint64)[inverse]
+    windows = np.lib.stride_tricks.sliding_window_view(token_hashes, SHINGLE_SIZE)
+    return np.unique((windows * _SHINGLE_POWERS).sum(axis=1) & np.uint64(0xFFFFFFFF))
+
+
+def minhash(shingles):
+    """128-permutation MinHash signature using multiply-shift hashing, in chunks to bound memory."""
+    signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, shingles.size, CHUNK):
+        chunk = shingles[start:start + CHUNK]
+        hashed = (_A[:, None] * chunk[None, :] + _B[:, None]) >> np.uint64(32)
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_keys(signature):
+    """One signed 63-bit key per LSH band, distinct between bands."""
+    bands = signature.astype(np.uint64).reshape(BANDS, ROWS)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=1) + _BAND_OFFSETS
+    return (keys & np.uint64(0x7FFFFFFFFFFFFFFF)).astype(np.int64)
+
+
+class SignatureCollector:
+    """Ingestion consumer that MinHashes up to `max_files` source files."""
+
+    def __init__(self, max_files=500):
+        self.max_files = max_files
+        self._signatures = []
+        self._lock = threading.Lock()
+
+    def add(self, file):
+        if not is_source_path(file['path']):
+            return
+        with self._lock:
+            if len(self._signatures) >= self.max_files:
+                return
+        shingles = shingle_hashes(file['content'])
+        if shingles.size < MIN_SHINGLES:
+            return
+        signature = minhash(shingles)
+        with self._lock:
+            if len(self._signatures) < self.max_files:
+                self._signatures.append((file['path'], signature))
+
+    def result(self):
+        with self._lock:
+            return list(self._signatures)
+
+
+class SimilarityIndex:
+    """Persisted MinHash LSH index over every analyzed repository's source files.
+
+    With 32 bands of 4 rows, pairs above roughly 0.45 Jaccard similarity
+    share a band with high probability; candidates are then scored on their
+    full signatures.
+    """
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+
+    def query(self, signatures, exclude_repo_hash=None, limit=20):
+        """Best match in other repositories for each file, most similar first."""
+        if not signatures:
+            return []
+
+        keys_by_file = [band_keys(signature) for _, signature in signatures]
+        owners = {}
+        for index, keys in enumerate(keys_by_file):
+            for key in keys.tolist():
+                owners.setdefault(key, []).append(index)
+
+        candidates = {}
+        all_keys = list(owners)
+        for start in range(0, len(all_keys), 500):
+            rows = db.session.query(LshBucket.band_key, LshBucket.file_id) \
+                .join(IndexedFile, IndexedFile.id == LshBucket.file_id) \
+                .filter(LshBucket.band_key.in_(all_keys[start:start + 500])) \
+                .filter(IndexedFile.repo_hash != exclude_repo_hash) \
+                .all()
+            for key, file_id in rows:
+                for index in owners[key]:
+                    candidates.setdefault(index, set()).add(file_id)
+        if not candidates:
+            return []
+
+        file_ids = set().union(*candidates.values())
+        indexed = {row.id: row for row in IndexedFile.query.filter(IndexedFile.id.in_(file_ids)).all()}
+
+        matches = []
+        for index, ids in candidates.items():
+            # Files replaced since their buckets were read are gone, and may have been every candidate
+            ids = [file_id for file_id in ids if file_id in indexed]
+            if not ids:
+                continue
+            others = np.stack([np.frombuffer(indexed[file_id].signature, dtype=np.uint32) for file_id in ids])
+            scores = (others == signatures[index][1]).mean(axis=1)
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                match = indexed[ids[best]]
+                matches.append({
+                    'path': signatures[index][0],
+                    'similarity': round(float(scores[best]), 2),
+                    'match_repo': match.repo_url,
+                    'match_path': match.path
+                })
+        matches.sort(key=lambda match: -match['similarity'])
+        return matches[:limit]
+
+    def add(self, repo_hash, repo_url, signatures):
+        """Replace the repository's files in the index."""
+        old_ids = db.session.query(IndexedFile.id).filter_by(repo_hash=repo_hash)
+        LshBucket.query.filter(LshBucket.file_id.in_(old_ids.scalar_subquery())).delete(synchronize_session=False)
+        IndexedFile.query.filter_by(repo_hash=repo_hash).delete(synchronize_session=False)
+        self._insert(repo_hash, repo_url, signatures)
+
+    def replace_paths(self, repo_hash, repo_url, signatures, paths):
+        """Replace only the given paths of the repository, e.g. the files a push changed."""
+        paths = list(paths)
+        for start in range(0, len(paths), 500):
+            old_ids = [file_id for file_id, in db.session.query(IndexedFile.id).filter_by(repo_hash=repo_hash)
+                       .filter(IndexedFile.path.in_(paths[start:start + 500]))]
+            LshBucket.query.filter(LshBucket.file_id.in_(old_ids)).delete(synchronize_session=False)
+            IndexedFile.query.filter(IndexedFile.id.in_(old_ids)).delete(synchronize_session=False)
+        self._insert(repo_hash, repo_url, signatures)
+
+    def _insert(self, repo_hash, repo_url, signatures):
+        now = time.time()
+        for path, signature in signatures:
+            indexed = IndexedFile(repo_hash=repo_hash, repo_url=repo_url, path=path,
+                                  signature=signature.tobytes(), indexed_at=now)
+            db.session.add(indexed)
+            db.session.flush()
+            db.session.execute(insert(LshBucket), [
+                {'band_key': key, 'file_id': indexed.id} for key in band_keys(signature).tolist()
+            ])
+        db.session.commit()
@@ -0,0 +1,68 @@
+import asyncio
+import fcntl
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+class SingleFlight:
+    """Cross-process single-flight built on advisory file locks.
+
+    Every caller for the same key serializes on `<directory>/<key>.lock`, which
+    works across threads and gunicorn workers alike. The first caller does the
+    work while the rest wait, then find its result in the shared cache.
+    """
+
+    def __init__(self, directory, timeout=120, poll_interval=0.1):
+        self.directory = directory
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def lead(self, key):
+        """Hold the lock for `key`, yielding False if it could not be taken in time.
+
+        Callers that time out proceed without the lock rather than failing, so
+        a stuck leader only costs duplicated work.
+        """
+        fd = os.open(os.path.join(self.directory, f'{key}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        acquired = False
+        try:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(self.poll_interval)
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @asynccontextmanager
+    async def alead(self, key):
+        """`lead` for coroutines, polling without blocking the event loop."""
+        fd = os.open(os.path.join(self.directory, f'{key}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        acquired = False
+        try:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
@@ -0,0 +1,449 @@
+import ast
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Languages analyzed by file extension; Python is parsed, the rest tokenized
+LANGUAGES = {
+    '.py': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.rs': 'rust',
+    '.sol': 'solidity'
+}
+# Dependency manifests by lowercase file name
+MANIFESTS = {
+    'requirements.txt': 'pypi',
+    'pyproject.toml': 'pypi',
+    'package.json': 'npm',
+    'cargo.toml': 'cargo',
+    'go.mod': 'go'
+}
+TEST_DIRS = {'test', 'tests', '__tests__', 'spec', 'specs', 'testing'}
+TEST_NAME = re.compile(r'^(?:test_.*\.py|.*_test\.py|conftest\.py|.*\.(?:test|spec)\.[jt]sx?|.*\.t\.sol)$')
+
+# Functions above this cyclomatic complexity are reported as hard to follow
+COMPLEX_FUNCTION = 10
+# Repeated runs of this many normalized lines count as duplicated code
+DUPLICATE_WINDOW = 6
+MAX_WINDOWS = 5000
+# Lines this short ("}", "else:", "end") repeat everywhere and say nothing about copying
+MIN_LINE_CHARS = 4
+MAX_DEPENDENCIES = 200
+MOST_COMPLEX = 5
+
+# Control flow nodes that add a path through a Python function
+PYTHON_DECISIONS = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.match_case)
+
+# Comments and string literals, which are dropped before counting lines and tokens
+JS_STRIPPED = re.compile(r'''(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)|(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\[\s\S]|[^`\\])*`)''')
+RUST_STRIPPED = re.compile(r'''(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)|(?P<string>r(?P<hashes>#*)"[\s\S]*?"(?P=hashes)|"(?:\\[\s\S]|[^"\\])*"|'(?:\\.|[^'\\\n])')''')
+SOLIDITY_STRIPPED = re.compile(r'''(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)|(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')''')
+# Words, the operators that branch or declare, braces and line breaks; "=" only as an assignment
+CODE_TOKEN = re.compile(r'[A-Za-z_$][\w$]*|&&|\|\||\?\?|=>|\?(?![.:?])|(?<![=!<>+\-*/%&|^])=(?![=>])|[{};\n]')
+FUNCTION_NAME = re.compile(r'\s*\*?\s*([A-Za-z_$][\w$]*)')
+# A JavaScript method header just before its opening brace: `name(params)` and an optional return type
+METHOD_HEADER = re.compile(r'([A-Za-z_$][\w$]*)\s*\([^()]*\)\s*(?::\s*[^{};=()]+)?\s*$')
+CONTROL_WORDS = {'if', 'for', 'while', 'switch', 'catch', 'with', 'function', 'return'}
+
+# Per tokenized language: what strips it, what declares a function, and what adds a path through one
+TOKEN_LANGUAGES = {
+    'javascript': (JS_STRIPPED, {'function'}, {'if', 'for', 'while', 'case', 'catch', '&&', '||', '??', '?'}),
+    'typescript': (JS_STRIPPED, {'function'}, {'if', 'for', 'while', 'case', 'catch', '&&', '||', '??', '?'}),
+    # Each match arm is a branch
+    'rust': (RUST_STRIPPED, {'fn'}, {'if', 'for', 'while', '&&', '||', '=>'}),
+    'solidity': (SOLIDITY_STRIPPED, {'function', 'modifier', 'constructor', 'fallback', 'receive'},
+                 {'if', 'for', 'while', 'catch', '&&', '||', '?'})
+}
+
+REQUIREMENT_NAME = re.compile(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+GO_REQUIRE = re.compile(r'^\s*(?:require\s+)?([\w.\-~/]+\.[\w.\-~/]+)\s+v[\w.\-+]+', re.MULTILINE)
+
+
+def blob_sha(content):
+    """Git's blob SHA-1 of the file, which is the same in every commit and fork that holds this content.
+
+    Files are decoded leniently on ingest, so this matches the SHA git
+    reports for any file that was valid UTF-8.
+    """
+    data = content.encode('utf-8', errors='ignore')
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def file_kind(path):
+    """The language or manifest ecosystem `path` is analyzed as, or None."""
+    name = path.rsplit('/', 1)[-1].lower()
+    if name in MANIFESTS or (name.startswith('requirements') and name.endswith('.txt')):
+        return f"manifest:{MANIFESTS.get(name, 'pypi')}:{name}"
+    return LANGUAGES.get(os.path.splitext(name)[1])
+
+
+def is_test_path(path):
+    parts = path.lower().split('/')
+    return any(part in TEST_DIRS for part in parts[:-1]) or bool(TEST_NAME.match(parts[-1]))
+
+
+def window_hashes(lines):
+    """64-bit hashes of every run of DUPLICATE_WINDOW meaningful lines, packed into bytes."""
+    digests = [hashlib.blake2b(line.encode('utf-8', errors='ignore'), digest_size=8).digest()
+               for line in lines if len(line) >= MIN_LINE_CHARS]
+    windows = array('Q', (
+        int.from_bytes(hashlib.blake2b(b''.join(digests[start:start + DUPLICATE_WINDOW]), digest_size=8).digest(),
+                       'little')
+        for start in range(min(len(digests) - DUPLICATE_WINDOW + 1, MAX_WINDOWS))
+    ))
+    return windows.tobytes()
+
+
+def source_record(code_lines, functions, syntax_error=False):
+    """A file's figures from its meaningful lines and `(name, line, complexity)` per function."""
+    worst = max(functions, key=lambda function: function[2], default=None)
+    return {
+        'code_lines': len(code_lines),
+        'functions': len(functions),
+        'complexity': sum(function[2] for function in functions),
+        'max_complexity': worst[2] if worst else 0,
+        'complex_functions': sum(function[2] > COMPLEX_FUNCTION for function in functions),
+        'worst': list(worst) if worst else None,
+        'syntax_error': syntax_error
+    }
+
+
+def python_decisions(node):
+    """Branch points in a function body, leaving out the functions and classes nested in it."""
+    count = 0
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(child, PYTHON_DECISIONS):
+            count += 1
+        elif isinstance(child, ast.BoolOp):
+            count += len(child.values) - 1
+        elif isinstance(child, ast.comprehension):
+            count += 1 + len(child.ifs)
+        stack.extend(ast.iter_child_nodes(child))
+    return count
+
+
+def analyze_python(content):
+    lines = [line.strip() for line in content.splitlines()]
+    code_lines = [line for line in lines if line and not line.startswith('#')]
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError, RecursionError):
+        return source_record(code_lines, [], syntax_error=True), window_hashes(code_lines)
+
+    functions = []
+    stack = [(tree, '')]
+    while stack:
+        node, prefix = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = prefix + child.name
+                functions.append((name, child.lineno, 1 + python_decisions(child)))
+                stack.append((child, f'{name}.'))
+            elif isinstance(child, ast.ClassDef):
+                stack.append((child, f'{prefix}{child.name}.'))
+            else:
+                stack.append((child, prefix))
+    return source_record(code_lines, functions), window_hashes(code_lines)
+
+
+def strip_code(pattern, content):
+    """`content` with comments removed and string literals emptied, line breaks kept."""
+    def replace(match):
+        breaks = '\n' * match.group().count('\n')
+        return breaks if match.group('comment') is not None else '""' + breaks
+    return pattern.sub(replace, content)
+
+
+def analyze_tokens(language, content):
+    """Figures for a brace-delimited language from its token stream.
+
+    A function's body is the brace block opened after its declaration (or,
+    in JavaScript, after an arrow or a `name(params)` method header), and
+    every branch token inside it, but outside nested functions, adds one to
+    its complexity.
+    """
+    pattern, function_words, decision_tokens = TOKEN_LANGUAGES[language]
+    code = strip_code(pattern, content)
+    code_lines = [line for line in (line.strip() for line in code.split('\n')) if line]
+    javascript = language in ('javascript', 'typescript')
+
+    functions, stack = [], []
+    line, depth, pending, assigned, previous = 1, 0, None, None, ''
+    for match in CODE_TOKEN.finditer(code):
+        token = match.group()
+        if token == '\n':
+            line += 1
+            assigned = None
+        elif token in function_words:
+            name = FUNCTION_NAME.match(code, match.end())
+            if name and name.group(1) not in CONTROL_WORDS:
+                pending = (name.group(1), line)
+            elif javascript:
+                pending = (assigned or '<anonymous>', line)
+            elif token != 'fn':
+                # Solidity's constructor, receive and fallback go unnamed
+                pending = (token, line)
+            # Rust's `fn(u8) -> u8` is a type, not a function
+        elif token == '=>' and javascript:
+            pending = pending or (assigned or '<anonymous>', line)
+        elif token in decision_tokens:
+            if stack:
+                stack[-1][3] += 1
+        elif token == '=':
+            assigned = previous if previous[0].isalpha() or previous[0] in '_$' else None
+        elif token == '{':
+            depth += 1
+            if pending is None and javascript:
+                header = METHOD_HEADER.search(code, max(0, match.start() - 200), match.start())
+                if header and header.group(1) not in CONTROL_WORDS:
+                    pending = (header.group(1), line)
+            if pending:
+                stack.append([depth, pending[0], pending[1], 1])
+                pending = None
+        elif token == '}':
+            if stack and stack[-1][0] == depth:
+                functions.append(tuple(stack.pop()[1:]))
+            depth = max(0, depth - 1)
+        elif token == ';':
+            # A declaration without a body, or an arrow function without braces
+            pending = None
+        previous = token
+    functions.extend(tuple(entry[1:]) for entry in stack)
+    return source_record(code_lines, functions), window_hashes(code_lines)
+
+
+def requirement_names(lines):
+    names = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        match = REQUIREMENT_NAME.match(line)
+        if match:
+            names.append(match.group(1).lower())
+    return names
+
+
+def parse_manifest(ecosystem, name, content):
+    """`{'ecosystem', 'dependencies', 'dev_dependencies'}` from a manifest; unparseable ones list none."""
+    runtime, dev = [], []
+    try:
+        if name.endswith('.txt'):
+            runtime = requirement_names(content.splitlines())
+        elif name == 'package.json':
+            manifest = json.loads(content)
+            runtime = list(manifest.get('dependencies') or {}) + list(manifest.get('peerDependencies') or {})
+            dev = list(manifest.get('devDependencies') or {}) + list(manifest.get('optionalDependencies') or {})
+        elif name == 'go.mod':
+            runtime = GO_REQUIRE.findall(content)
+        elif tomllib is not None:
+            manifest = tomllib.loads(content)
+            if name == 'cargo.toml':
+                runtime = list(manifest.get('dependencies') or {})
+                dev = list(manifest.get('dev-dependencies') or {}) + list(manifest.get('build-dependencies') or {})
+            else:
+                project = manifest.get('project') or {}
+                poetry = (manifest.get('tool') or {}).get('poetry') or {}
+                runtime = requirement_names(project.get('dependencies') or [])
+                runtime += [package for package in poetry.get('dependencies') or {} if package != 'python']
+                dev = requirement_names(dependency for group in (project.get('optional-dependencies') or {}).values()
+                                        for dependency in group)
+                dev += [package for group in (poetry.get('group') or {}).values()
+                        for package in group.get('dependencies') or {}]
+    except (ValueError, AttributeError, TypeError) as e:
+        print(f"Error parsing {name}: {str(e)}")
+    return {
+        'ecosystem': ecosystem,
+        'dependencies': sorted(set(runtime))[:MAX_DEPENDENCIES],
+        'dev_dependencies': sorted(set(dev))[:MAX_DEPENDENCIES]
+    }
+
+
+def analyze_content(kind, content):
+    """What analyzing a file of `kind` yields; the same for any file with the same kind and blob."""
+    if kind.startswith('manifest:'):
+        _, ecosystem, name = kind.split(':', 2)
+        return parse_manifest(ecosystem, name, content)
+    if kind == 'python':
+        return analyze_python(content)
+    return analyze_tokens(kind, content)
+
+
+def analyze_batch(files):
+    """Analyze a list of `(path, key, kind, content)`; the unit of work sent to pool processes."""
+    return [(path, key, analyze_content(kind, content)) for path, key, kind, content in files]
+
+
+class AnalysisMemo:
+    """StaticAnalyzer results by file kind and blob SHA, least recently used dropped first.
+
+    Shared by every analysis in the process, so files that appear in many
+    repositories or don't change between runs are analyzed once.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class StaticAnalyzer:
+    """Ingestion consumer measuring code quality over every source file and dependency manifest.
+
+    Python files are parsed, JavaScript, TypeScript, Rust and Solidity are
+    tokenized, and each yields line counts and per-function cyclomatic
+    complexity; manifests yield their dependencies. Results are looked up in
+    `memo` by blob SHA first. Like SecretScanner, the rest are analyzed
+    inline without an executor, or in batches of about `batch_bytes` on a
+    process pool while ingestion continues. At most `max_files` source files
+    are analyzed.
+    """
+
+    def __init__(self, executor=None, memo=None, max_files=5000, batch_bytes=1024 * 1024):
+        self.executor = executor
+        self.memo = memo
+        self.max_files = max_files
+        self.batch_bytes = batch_bytes
+        self.source_files = 0
+        self.reused = 0
+        self._results = {}
+        self._batch = []
+        self._batch_size = 0
+        self._futures = []
+
+    def add(self, file):
+        kind = file_kind(file['path'])
+        if kind is None:
+            return
+        if not kind.startswith('manifest:'):
+            if self.source_files >= self.max_files:
+                return
+            self.source_files += 1
+
+        key = f"{kind}:{blob_sha(file['content'])}"
+        cached = self.memo.get(key) if self.memo else None
+        if cached is not None:
+            self.reused += 1
+            self._results[file['path']] = cached
+        elif self.executor is None:
+            self._keep(file['path'], key, analyze_content(kind, file['content']))
+        else:
+            self._batch.append((file['path'], key, kind, file['content']))
+            self._batch_size += len(file['content'])
+            if self._batch_size >= self.batch_bytes:
+                self._submit()
+
+    def result(self):
+        """Per-file figures, manifests and the duplicated share, as summarize and the snapshot take them."""
+        if self._batch:
+            self._submit()
+        for future in self._futures:
+            try:
+                for path, key, value in future.result():
+                    self._keep(path, key, value)
+            except Exception as e:
+                print(f"Error running static analysis: {str(e)}")
+        self._futures = []
+
+        files, manifests, windows = {}, {}, Counter()
+        for path, value in self._results.items():
+            if isinstance(value, dict):
+                manifests[path] = value
+                continue
+            record, blocks = value
+            files[path] = {'language': file_kind(path), 'test': is_test_path(path), **record}
+            windows.update(array('Q', blocks))
+        total = sum(windows.values())
+        duplicated = sum(count for count in windows.values() if count > 1)
+        return {
+            'files': files,
+            'manifests': manifests,
+            'duplicate_ratio': round(duplicated / total, 3) if total else 0.0,
+            'files_reused': self.reused
+        }
+
+    def _keep(self, path, key, value):
+        if self.memo:
+            self.memo.set(key, value)
+        self._results[path] = value
+
+    def _submit(self):
+        self._futures.append(self.executor.submit(analyze_batch, self._batch))
+        self._batch = []
+        self._batch_size = 0
+
+
+def summarize(state):
+    """Repository-wide code quality figures for the report and prompt from StaticAnalyzer.result()."""
+    files = state['files']
+    languages = {}
+    for record in files.values():
+        language = languages.setdefault(record['language'], {'files': 0, 'code_lines': 0})
+        language['files'] += 1
+        language['code_lines'] += record['code_lines']
+
+    code_lines = sum(record['code_lines'] for record in files.values() if not record['test'])
+    test_lines = sum(record['code_lines'] for record in files.values() if record['test'])
+    functions = sum(record['functions'] for record in files.values())
+    complexity = sum(record['complexity'] for record in files.values())
+    worst = sorted(((path, record['worst']) for path, record in files.items() if record['worst']),
+                   key=lambda entry: (-entry[1][2], entry[0]))[:MOST_COMPLEX]
+    return {
+        'files_analyzed': len(files),
+        'files_reused': state['files_reused'],
+        'languages': languages,
+        'code_lines': code_lines,
+        'test_files': sum(record['test'] for record in files.values()),
+        'test_lines': test_lines,
+        'test_to_code_ratio': round(test_lines / code_lines, 2) if code_lines else 0.0,
+        'functions': functions,
+        'average_complexity': round(complexity / functions, 2) if functions else 0.0,
+        'max_complexity': max((record['max_complexity'] for record in files.values()), default=0),
+        'complex_functions': sum(record['complex_functions'] for record in files.values()),
+        'most_complex': [{'path': path, 'name': name, 'line': line, 'complexity': value}
+                         for path, (name, line, value) in worst],
+        'duplicate_ratio': state['duplicate_ratio'],
+        'syntax_errors': sum(record['syntax_error'] for record in files.values()),
+        'manifests': {path: {'ecosystem': manifest['ecosystem'], 'dependencies': len(manifest['dependencies']),
+                             'dev_dependencies': len(manifest['dev_dependencies'])}
+                      for path, manifest in state['manifests'].items()},
+        'dependencies': sorted({name for manifest in state['manifests'].values()
+                                for name in manifest['dependencies']})
+    }
+
+
+def create_analysis_pool(processes):
+    """Process pool for StaticAnalyzer; spawned so workers don't inherit the server's threads."""
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
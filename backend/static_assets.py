@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Create React App names build outputs like main.3f2a1b4c.js and 787.0a1b2c3d.chunk.js
+FINGERPRINT_PATTERN = re.compile(r'\.[0-9a-f]{8,}\.')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/manifest+json',
+                      'application/xml', 'image/svg+xml')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+# Suffixes of build-time compressed copies, by the Content-Encoding they stand for
+ENCODING_SUFFIXES = {'.br': 'br', '.gz': 'gzip'}
+
+
+class Asset:
+    """One file of the frontend build held in memory with its encoded variants."""
+
+    def __init__(self, body, content_type, etag, cache_control):
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.variants = {'identity': body}
+
+    @property
+    def negotiable(self):
+        return len(self.variants) > 1
+
+
+class StaticAssets:
+    """In-memory manifest of a static build, served with compression and caching headers.
+
+    The build folder is walked once when the manifest is loaded; requests are
+    answered from memory without touching the filesystem. Compressible files
+    get gzip (and brotli, when the module is installed) variants computed up
+    front, unless the build already ships `.gz`/`.br` copies. Every file has a
+    strong ETag from its content hash; fingerprinted files are marked
+    immutable, the rest revalidate. Unknown paths fall back to `index`, so
+    client-side routes keep working.
+    """
+
+    def __init__(self, root, index='index.html', min_compress_size=512):
+        self.root = root
+        self.index = index
+        self.min_compress_size = min_compress_size
+        self.assets = {}
+
+    def load(self):
+        """(Re)build the manifest from disk; returns the number of files loaded."""
+        assets = {}
+        if os.path.isdir(self.root):
+            for directory, _, filenames in os.walk(self.root):
+                names = set(filenames)
+                for name in filenames:
+                    base, suffix = os.path.splitext(name)
+                    if suffix in ENCODING_SUFFIXES and base in names:
+                        continue
+                    path = os.path.join(directory, name)
+                    key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    assets[key] = self._load_asset(path, names, name)
+        self.assets = assets
+        return len(assets)
+
+    def _load_asset(self, path, names, name):
+        with open(path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        cache_control = IMMUTABLE_CACHE if FINGERPRINT_PATTERN.search(name) else REVALIDATE_CACHE
+        asset = Asset(body, content_type, hashlib.sha256(body).hexdigest()[:32], cache_control)
+
+        if not content_type.startswith(COMPRESSIBLE_TYPES) or len(body) < self.min_compress_size:
+            return asset
+        for suffix, encoding in ENCODING_SUFFIXES.items():
+            if name + suffix in names:
+                with open(path + suffix, 'rb') as f:
+                    asset.variants[encoding] = f.read()
+        if 'gzip' not in asset.variants:
+            asset.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if 'br' not in asset.variants and brotli is not None:
+            asset.variants['br'] = brotli.compress(body, quality=11)
+        # Keep only variants that actually save bytes
+        asset.variants = {encoding: variant for encoding, variant in asset.variants.items()
+                          if encoding == 'identity' or len(variant) < len(body)}
+        return asset
+
+    def lookup(self, path):
+        """The asset for a request path, falling back to the index for unknown paths."""
+        return self.assets.get(path.strip('/')) or self.assets.get(self.index)
+
+    def respond(self, path, headers):
+        """A Response for `path` given the request headers, or None without a build."""
+        asset = self.lookup(path)
+        if asset is None:
+            return None
+
+        encoding = choose_encoding(asset, headers.get('Accept-Encoding', ''))
+        etag = asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}'
+        response_headers = {'Cache-Control': asset.cache_control, 'ETag': f'"{etag}"'}
+        if asset.negotiable:
+            response_headers['Vary'] = 'Accept-Encoding'
+
+        if etag_matches(headers.get('If-None-Match'), asset.etag):
+            return Response(status=304, headers=response_headers)
+
+        if encoding != 'identity':
+            response_headers['Content-Encoding'] = encoding
+        return Response(asset.variants[encoding], headers=response_headers, content_type=asset.content_type)
+
+
+def choose_encoding(asset, accept_encoding):
+    """Smallest variant the client accepts; brotli beats gzip when both exist."""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip())
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether If-None-Match names this content, in any of its encodings."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"').split('-')[0] == etag:
+            return True
+    return False
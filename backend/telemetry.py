@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Stages range from a cache lookup to a minute-long completion
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+STAGE_SECONDS = Histogram('gitanalyze_stage_seconds', 'Time spent in each analysis stage', ['stage'],
+                          buckets=STAGE_BUCKETS)
+ANALYSES = Counter('gitanalyze_analyses_total', 'Analysis requests by outcome', ['outcome'])
+GITHUB_REQUESTS = Counter('gitanalyze_github_requests_total', 'Requests sent to the GitHub API by status code',
+                          ['status'])
+CACHE_LOOKUPS = Counter('gitanalyze_cache_lookups_total', 'Lookups by cache and result', ['cache', 'result'])
+LLM_TOKENS = Counter('gitanalyze_llm_tokens_total', 'Tokens OpenRouter reported using', ['kind'])
+LLM_ATTEMPTS = Counter('gitanalyze_llm_attempts_total', 'Completion attempts by model and outcome', ['model', 'outcome'])
+LLM_COMPLETIONS = Counter('gitanalyze_llm_completions_total', 'Completions by the model that served them',
+                          ['model', 'hedged'])
+ERRORS = Counter('gitanalyze_errors_total', 'Failed stages', ['stage'])
+HTTP_RETRIES = Counter('gitanalyze_http_retries_total', 'Retries of failed upstream requests, and retries the budget denied',
+                       ['host', 'reason', 'outcome'])
+
+
+class Timings:
+    """Seconds spent per stage of one analysis, returned with its response.
+
+    Stages running on fetch threads record into the same instance, so it is
+    passed explicitly to wherever a stage runs rather than kept thread-local.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def breakdown(self):
+        with self._lock:
+            return {stage: round(seconds, 3) for stage, seconds in self.stages.items()}
+
+
+def observe(stage, seconds, timings=None):
+    """Record a stage duration measured by the caller."""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+@contextmanager
+def span(stage, timings=None):
+    """Time a block into the stage histogram and `timings`, counting it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        observe(stage, time.perf_counter() - started, timings)
+
+
+def timed(stage, func, timings=None):
+    """`func` wrapped in a span, for handing to a thread pool."""
+    def run():
+        with span(stage, timings):
+            return func()
+    return run
+
+
+def timed_async(stage, func, timings=None):
+    """`timed` for a coroutine function, for gathering on the event loop."""
+    async def run():
+        with span(stage, timings):
+            return await func()
+    return run
+
+
+def observe_github_response(response, *args, **kwargs):
+    """Response hook counting GitHub API calls by status."""
+    GITHUB_REQUESTS.labels(status=str(response.status_code)).inc()
+
+
+def observe_llm_usage(usage):
+    """Count the `usage` block of an OpenAI-style completion."""
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            LLM_TOKENS.labels(kind=kind[:-len('_tokens')]).inc(usage[kind])
+
+
+class SnapshotCollector:
+    """Gauges read from live objects when Prometheus scrapes.
+
+    `rate_limits` maps an API name to an object with `snapshot()` (a RateLimit
+    or TokenPool); `http_cache` is the ConditionalCache whose revalidation
+    counters are exported with them, and `llm` the LLMClient whose circuit
+    breakers are.
+    """
+
+    def __init__(self, rate_limits, http_cache=None, llm=None):
+        self.rate_limits = rate_limits
+        self.http_cache = http_cache
+        self.llm = llm
+
+    def collect(self):
+        remaining = GaugeMetricFamily('gitanalyze_rate_limit_remaining', 'Requests left in the current window',
+                                      labels=['api', 'token', 'resource'])
+        for api, source in self.rate_limits.items():
+            snapshot = source.snapshot()
+            tokens = snapshot['tokens'] if 'tokens' in snapshot else [{'token': '', 'budgets': snapshot}]
+            for token in tokens:
+                for resource, budget in token['budgets'].items():
+                    if budget['remaining'] is not None:
+                        remaining.add_metric([api, token['token'], resource], budget['remaining'])
+        yield remaining
+
+        if self.http_cache is not None:
+            stats = self.http_cache.stats()
+            lookups = CounterMetricFamily('gitanalyze_http_cache_requests', 'Conditional GitHub requests by outcome',
+                                          labels=['outcome'])
+            for outcome in ('revalidated', 'stored', 'uncached'):
+                lookups.add_metric([outcome], stats[outcome])
+            yield lookups
+
+        if self.llm is not None:
+            circuit = GaugeMetricFamily('gitanalyze_llm_circuit_open', '1 while a model is skipped after failures',
+                                        labels=['model'])
+            for model, state in self.llm.snapshot().items():
+                circuit.add_metric([model], 1 if state['circuit'] == 'open' else 0)
+            yield circuit
+
+
+_collectors = []
+
+
+def install_collector(collector):
+    """Export `collector` alongside the module's metrics."""
+    REGISTRY.register(collector)
+    _collectors.append(collector)
+
+
+def render():
+    """The exposition body and its content type.
+
+    With PROMETHEUS_MULTIPROC_DIR set, every gunicorn worker writes its
+    samples there and any worker can serve the aggregate; the live snapshot
+    gauges then only describe the worker that answers.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
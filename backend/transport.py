@@ -0,0 +1,221 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.ratelimit import DEFAULT_BACKOFF, parse_reset, parse_retry_after
+from backend.telemetry import HTTP_RETRIES
+
+# Gateway errors and rate limits are worth another try, anything else is the caller's answer
+RETRY_STATUSES = {429, 502, 503, 504}
+# GitHub reports secondary rate limits as a 403 that says so in the body
+SECONDARY_LIMIT_MARKER = 'secondary rate limit'
+
+
+class RetryBudget:
+    """Process-wide allowance of retries as a share of requests.
+
+    Every request deposits `ratio` of a retry and every retry withdraws a
+    whole one, with `min_per_second` trickling in so a quiet process can
+    still retry. While an upstream is down retries stay a fraction of the
+    traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_balance=20):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._balance = float(max_balance)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._balance = min(self.max_balance, self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+
+class RetryPolicy:
+    """Which failed requests to retry and how long to wait first, for RetryingAdapter and AsyncRetryingTransport.
+
+    Connection errors and RETRY_STATUSES responses to `methods` are retried
+    up to `retries` times after a full-jitter exponential backoff, or after
+    the server's Retry-After (or rate-limit reset) when it gives one. Waits
+    longer than `max_retry_after` are left to the caller, and every retry
+    needs the shared `budget` to allow it. `timeout` is the default
+    `(connect, read)` pair.
+    """
+
+    def __init__(self, budget=None, retries=3, backoff=0.5, max_backoff=8, max_retry_after=10,
+                 methods=('GET', 'HEAD'), timeout=(5, 10)):
+        self.budget = budget or RetryBudget()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.methods = set(methods)
+        self.timeout = timeout
+
+    def reason(self, response):
+        """Why `response` is worth retrying, or None; reads the body of a 403."""
+        if response.status_code in RETRY_STATUSES:
+            return str(response.status_code)
+        if response.status_code == 403 and (response.headers.get('Retry-After')
+                                            or SECONDARY_LIMIT_MARKER in response.text.lower()):
+            return 'secondary_limit'
+        return None
+
+    def delay(self, method, attempt, host, reason, response=None):
+        """Seconds to wait before retrying, or None to give up."""
+        if attempt >= self.retries or method not in self.methods:
+            return None
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None and response.headers.get('X-RateLimit-Remaining') == '0':
+                delay = parse_reset(response.headers.get('X-RateLimit-Reset'))
+            if delay is None and response.status_code in (403, 429):
+                delay = DEFAULT_BACKOFF
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        elif delay > self.max_retry_after:
+            return None
+        if not self.budget.withdraw():
+            HTTP_RETRIES.labels(host=host, reason=reason, outcome='denied').inc()
+            return None
+        HTTP_RETRIES.labels(host=host, reason=reason, outcome='retried').inc()
+        return delay
+
+
+class RetryingAdapter(HTTPAdapter):
+    """HTTPAdapter that retries transient failures under a RetryPolicy.
+
+    Requests without a timeout get the policy's; a timeout given as one
+    number bounds the read, and the connect gets at most the policy's.
+    """
+
+    def __init__(self, policy=None, **kwargs):
+        super().__init__(**kwargs)
+        self.policy = policy or RetryPolicy()
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        policy = self.policy
+        if timeout is None:
+            timeout = policy.timeout
+        elif not isinstance(timeout, tuple):
+            timeout = (min(policy.timeout[0], timeout), timeout)
+
+        policy.budget.deposit()
+        host = urlsplit(request.url).hostname
+        attempt = 0
+        while True:
+            try:
+                response = super().send(request, stream=stream, timeout=timeout, **kwargs)
+            except requests.ConnectionError:
+                delay = policy.delay(request.method, attempt, host, 'connection')
+                if delay is None:
+                    raise
+            else:
+                reason = policy.reason(response)
+                delay = policy.delay(request.method, attempt, host, reason, response) if reason else None
+                if delay is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+
+class AsyncRetryingTransport(httpx.AsyncBaseTransport):
+    """RetryingAdapter for httpx.AsyncClient, waiting without blocking the event loop."""
+
+    # The httpx counterparts of requests.ConnectionError
+    CONNECTION_ERRORS = (httpx.NetworkError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+    def __init__(self, policy=None, **kwargs):
+        self.policy = policy or RetryPolicy()
+        self.transport = httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request):
+        policy = self.policy
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = await self.transport.handle_async_request(request)
+            except self.CONNECTION_ERRORS:
+                delay = policy.delay(request.method, attempt, request.url.host, 'connection')
+                if delay is None:
+                    raise
+            else:
+                if response.status_code == 403:
+                    await response.aread()
+                reason = policy.reason(response)
+                delay = policy.delay(request.method, attempt, request.url.host, reason, response) if reason else None
+                if delay is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def pooled_session(pool_size=10, auth=None, **retry):
+    """Session keeping up to `pool_size` connections alive per host; `retry` configures its RetryPolicy."""
+    session = requests.Session()
+    session.auth = auth
+    adapter = RetryingAdapter(RetryPolicy(**retry), pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def limited_session(limit, pool_size=10, auth=None, **retry):
+    """pooled_session that reports every response to the RateLimit (or TokenPool) `limit`."""
+    session = pooled_session(pool_size, auth=auth, **retry)
+    session.hooks['response'].append(limit.observe)
+    return session
+
+
+def async_client(pool_size=10, max_connections=100, auth=None, hooks=(), **retry):
+    """httpx.AsyncClient counterpart of limited_session, for the async serving mode.
+
+    Keeps up to `pool_size` idle connections alive and opens at most
+    `max_connections` at once; requests beyond that wait for a free one
+    rather than failing. Redirects are followed, and each of `hooks` is
+    called with every response, as a session's response hooks are.
+    """
+    policy = RetryPolicy(**retry)
+
+    async def observe(response):
+        for hook in hooks:
+            hook(response)
+
+    return httpx.AsyncClient(
+        auth=auth,
+        transport=AsyncRetryingTransport(policy, limits=httpx.Limits(max_connections=max_connections,
+                                                                    max_keepalive_connections=pool_size)),
+        timeout=httpx.Timeout(policy.timeout[1], connect=policy.timeout[0], pool=None),
+        # As requests does; GitHub answers 301 for renamed and transferred repositories
+        follow_redirects=True,
+        event_hooks={'response': [observe]}
+    )
@@ -0,0 +1,296 @@
+"""Throughput and latency of /api/analyze against local GitHub and OpenRouter stand-ins.
+
+    python -m benchmarks.bench_analyze [--requests 40] [--concurrency 8] [--batch 20]
+                                       [--latency github-api=0.05,openrouter=1] [--error-rate github-api=0.02]
+                                       [--server wsgi|asgi] [--output report.json] [--compare baseline.json]
+
+Starts benchmarks.fake_services replaying a recording, serves the app on a
+local port with a scratch database and caches, and drives it over HTTP. The
+app is the threaded Flask server by default, or asgi.py under uvicorn with
+--server asgi. Workloads:
+
+    single    distinct repositories, every request a full analysis
+    repeated  one repository requested over and over, served from the cache
+    refresh   one repository force-refreshed over and over, rebuilt from its snapshot
+    batch     one /api/analyze/batch request over distinct repositories
+
+Each workload reports p50/p95/p99 latency, requests per second, errors,
+peak RSS of the process (harness and app together) and the upstream calls
+it made. The JSON report carries the configuration and git revision, and
+--compare prints the change against an earlier report.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmarks.fake_services import DEFAULT_RECORDING, FakeServices, parse_service_values
+
+WORKLOADS = ('single', 'repeated', 'refresh', 'batch')
+COMPARED = (('p50_ms', -1), ('p95_ms', -1), ('p99_ms', -1), ('requests_per_second', 1), ('peak_rss_mb', -1))
+
+
+class RssSampler:
+    """Peak resident set size of this process while the sampler runs."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def current_rss():
+    """Resident bytes from /proc, or the lifetime peak where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def summarize(latencies, errors, elapsed, rss, upstream):
+    latencies = np.asarray(latencies, dtype=float) * 1000
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) if len(latencies) else (0.0, 0.0, 0.0)
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'p50_ms': round(float(p50), 1),
+        'p95_ms': round(float(p95), 1),
+        'p99_ms': round(float(p99), 1),
+        'mean_ms': round(float(latencies.mean()), 1) if len(latencies) else 0.0,
+        'requests_per_second': round((len(latencies) + errors) / elapsed, 2) if elapsed else 0.0,
+        'elapsed_s': round(elapsed, 3),
+        'peak_rss_mb': round(rss / 2 ** 20, 1),
+        'upstream_requests': upstream
+    }
+
+
+def upstream_delta(before, after):
+    return {key: count - before.get(key, 0) for key, count in after.items() if count != before.get(key, 0)}
+
+
+class Bench:
+    def __init__(self, app_url, services, concurrency):
+        self.app_url = app_url
+        self.services = services
+        self.concurrency = concurrency
+        self.local = threading.local()
+
+    def session(self):
+        # One keep-alive connection per driver thread
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def analyze(self, repo_url, force_refresh=False):
+        started = time.perf_counter()
+        response = self.session().post(f'{self.app_url}/api/analyze',
+                                       json={'repo_url': repo_url, 'force_refresh': force_refresh}, timeout=600)
+        return time.perf_counter() - started, response.status_code == 200
+
+    def run_requests(self, repo_urls, force_refresh=False):
+        before = self.services.stats()['requests']
+        latencies, errors = [], 0
+        with RssSampler() as rss, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            started = time.perf_counter()
+            for latency, ok in executor.map(lambda repo_url: self.analyze(repo_url, force_refresh), repo_urls):
+                if ok:
+                    latencies.append(latency)
+                else:
+                    errors += 1
+            elapsed = time.perf_counter() - started
+        return summarize(latencies, errors, elapsed, rss.peak, upstream_delta(before, self.services.stats()['requests']))
+
+    def run_batch(self, repo_urls):
+        before = self.services.stats()['requests']
+        latencies, errors = [], 0
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            with requests.post(f'{self.app_url}/api/analyze/batch', json={'repo_urls': repo_urls},
+                               stream=True, timeout=3600) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    record = json.loads(line)
+                    if record['status'] == 'ok':
+                        latencies.append(record['elapsed'])
+                    else:
+                        errors += 1
+            elapsed = time.perf_counter() - started
+        return summarize(latencies, errors, elapsed, rss.peak, upstream_delta(before, self.services.stats()['requests']))
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_app(services, scratch, server='wsgi'):
+    """Import the app against the stand-ins and serve it on a local port; returns its URL and a stop function."""
+    os.environ.update({
+        **services.env(),
+        'GITHUB_PATS': 'bench-token',
+        'GITHUB_PAT': '',
+        'OPENROUTER_API_KEY': 'bench-key',
+        'GITHUB_IDENTITY_REFRESH': '0',
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+        'HTTP_CACHE_DIR': os.path.join(scratch, 'http_cache'),
+        'LOCK_DIR': os.path.join(scratch, 'locks'),
+        'LOG_LEVEL': 'WARNING'
+    })
+    if server == 'asgi':
+        import uvicorn
+
+        import asgi
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(asgi.application, log_level='warning', backlog=4096))
+        threading.Thread(target=server.run, kwargs={'sockets': [sock]}, name='bench-app', daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop():
+            server.should_exit = True
+        return f'http://127.0.0.1:{sock.getsockname()[1]}', stop
+
+    from werkzeug.serving import make_server
+
+    import app as flask_app
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def compare(report, baseline):
+    print(f"\nchange against {baseline['meta'].get('revision')} ({baseline['meta'].get('started_at')}):")
+    for name, result in report['workloads'].items():
+        previous = baseline['workloads'].get(name)
+        if not previous:
+            continue
+        changes = []
+        for metric, better in COMPARED:
+            if previous.get(metric):
+                change = (result[metric] - previous[metric]) / previous[metric] * 100
+                marker = '' if abs(change) < 5 else (' better' if change * better > 0 else ' worse')
+                changes.append(f'{metric} {change:+.1f}%{marker}')
+        print(f"  {name:<10}" + ', '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', default=DEFAULT_RECORDING, help='fake_services recording to replay')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help='comma-separated subset of ' + ', '.join(WORKLOADS))
+    parser.add_argument('--requests', type=int, default=40, help='requests per single/repeated workload')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    parser.add_argument('--batch', type=int, default=20, help='repositories in the batch workload')
+    parser.add_argument('--latency', default='github-api=0.03,github=0.08,openrouter=0.5',
+                        help='injected seconds per upstream request, e.g. github-api=0.05,openrouter=1')
+    parser.add_argument('--error-rate', default='', help='share of upstream requests failed with 502, e.g. github-api=0.02')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='threaded Flask server, or asgi.py under uvicorn')
+    parser.add_argument('--output', '-o', help='write the JSON report here')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    workloads = [name for name in args.workloads.split(',') if name]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    latency = parse_service_values(args.latency)
+    error_rate = parse_service_values(args.error_rate)
+    services = FakeServices(args.recording, latency=latency, error_rate=error_rate)
+    services.start()
+    scratch = tempfile.mkdtemp(prefix='gitanalyze-bench-')
+    app_url, stop_app = start_app(services, scratch, args.server)
+    bench = Bench(app_url, services, args.concurrency)
+
+    # Repository names are unique per run so nothing is served from an earlier run's cache
+    run_id = f'{int(time.time()):x}'
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'config': {
+            'recording': os.path.relpath(args.recording),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'server': args.server,
+            'batch': args.batch,
+            'latency': latency,
+            'error_rate': error_rate
+        },
+        'workloads': {}
+    }
+
+    for name in workloads:
+        if name == 'single':
+            result = bench.run_requests([f'https://github.com/bench/single-{run_id}-{i}' for i in range(args.requests)])
+        elif name == 'repeated':
+            repo_url = f'https://github.com/bench/repeated-{run_id}'
+            bench.analyze(repo_url)
+            result = bench.run_requests([repo_url] * args.requests)
+        elif name == 'refresh':
+            # The recording's head never moves, so each refresh finds nothing new since the snapshot
+            repo_url = f'https://github.com/bench/refresh-{run_id}'
+            bench.analyze(repo_url)
+            result = bench.run_requests([repo_url] * args.requests, force_refresh=True)
+        else:
+            result = bench.run_batch([f'https://github.com/bench/batch-{run_id}-{i}' for i in range(args.batch)])
+        report['workloads'][name] = result
+        print(f"{name:<10}{result['requests']:>5} req  p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+              f"p99 {result['p99_ms']:>8.1f} ms  {result['requests_per_second']:>7.2f} req/s  "
+              f"{result['errors']} errors  peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    misses = services.stats()['misses']
+    if misses:
+        report['recording_misses'] = misses
+        print(f"recording had no answer for: {', '.join(misses)}")
+
+    stop_app()
+    services.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Parse time per page for each repository page extractor.
+
+    python -m benchmarks.bench_scrape [page.html ...] [--rounds N]
+
+Runs every extractor in backend/scrape.py over saved GitHub repository pages
+(benchmarks/fixtures/*.html by default), prints the median time per page and
+fails if an extractor disagrees with the full parse. Save more fixtures with
+`curl -sL https://github.com/<owner>/<repo> -o benchmarks/fixtures/<name>.html`.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+from backend.scrape import EXTRACTORS, HTML_PARSER
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '*.html')
+
+
+def time_extractor(extract, html, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = extract(html)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pages', nargs='*', help='HTML files to parse (default: benchmarks/fixtures/*.html)')
+    parser.add_argument('--rounds', type=int, default=10, help='parses per page and extractor')
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob(FIXTURES))
+    if not pages:
+        sys.exit('No HTML fixtures found')
+
+    print(f"parser: {HTML_PARSER}, {args.rounds} rounds, median ms per page")
+    print(f"{'page':<32}{'KB':>8}" + ''.join(f'{name:>12}' for name in EXTRACTORS) + f"{'speedup':>10}")
+    mismatched = False
+    for path in pages:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        timings = {}
+        results = {}
+        for name, extract in EXTRACTORS.items():
+            timings[name], results[name] = time_extractor(extract, html, args.rounds)
+        for name, result in results.items():
+            if result != results['full']:
+                mismatched = True
+                print(f"  {name} disagrees with full parse on {path}: {result} != {results['full']}")
+        print(f"{os.path.basename(path)[:31]:<32}{len(html) / 1024:>8.0f}"
+              + ''.join(f'{timings[name] * 1000:>12.1f}' for name in EXTRACTORS)
+              + f"{timings['full'] / timings['strained']:>9.1f}x")
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == '__main__':
+    main()
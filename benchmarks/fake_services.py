@@ -0,0 +1,289 @@
+"""Local stand-in for api.github.com, github.com and OpenRouter.
+
+    python -m benchmarks.fake_services [--recording FILE] [--port 8900]
+                                       [--latency github-api=0.05,openrouter=2] [--error-rate github-api=0.02]
+    python -m benchmarks.fake_services --record --recording FILE
+
+Each service lives under its own path prefix, so the app is pointed at it with
+
+    GITHUB_API_URL=http://127.0.0.1:8900/github-api
+    GITHUB_WEB_URL=http://127.0.0.1:8900/github
+    OPENROUTER_URL=http://127.0.0.1:8900/openrouter/api/v1/chat/completions
+
+In replay mode every request is answered from the recording, after the
+configured latency and with the configured share of injected 502s.
+Repository paths are stored with the owner and name replaced by ":repo",
+so one recording answers for any repository. In record mode requests are
+forwarded upstream with their own credentials and the responses saved to
+the recording on exit.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+UPSTREAMS = {
+    'github-api': 'https://api.github.com',
+    'github': 'https://github.com',
+    'openrouter': 'https://openrouter.ai'
+}
+REPO_PATHS = {
+    'github-api': re.compile(r'^/repos/[^/]+/[^/]+'),
+    'github': re.compile(r'^/[^/]+/[^/]+')
+}
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+FORWARDED_HEADERS = ('Authorization', 'Accept', 'Content-Type', 'User-Agent')
+TEXT_TYPES = ('application/json', 'text/', 'application/vnd.github')
+DEFAULT_RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'recording', 'recording.json')
+
+
+def request_key(method, service, path, query=''):
+    """Recording key for a request; POST bodies are not part of it."""
+    pattern = REPO_PATHS.get(service)
+    if pattern:
+        path = pattern.sub('/repos/:repo' if service == 'github-api' else '/:repo', path, count=1)
+    query = urlencode(sorted(parse_qsl(query)))
+    return f"{method} {service} {path}{'?' + query if query else ''}"
+
+
+def parse_service_values(spec):
+    """`github-api=0.05,openrouter=2` as a dict of floats; a bare number applies to every service."""
+    values = {}
+    for part in filter(None, (spec or '').split(',')):
+        service, _, value = part.rpartition('=')
+        for name in ([service] if service else UPSTREAMS):
+            values[name] = float(value)
+    return values
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up mid-body routinely, e.g. once a tarball has been read far enough
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class Recording:
+    """Recorded responses by request key, with upstream URLs swapped for placeholders."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._bodies = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)['entries']
+
+    def body(self, key):
+        """The entry's body as bytes; large or binary bodies may live in a sibling file."""
+        if key not in self._bodies:
+            entry = self.entries[key]
+            if 'file' in entry:
+                with open(os.path.join(os.path.dirname(self.path), entry['file']), 'rb') as f:
+                    self._bodies[key] = f.read()
+            elif entry.get('encoding') == 'base64':
+                self._bodies[key] = base64.b64decode(entry['body'])
+            else:
+                self._bodies[key] = entry['body'].encode('utf-8')
+        return self._bodies[key]
+
+    def add(self, key, response):
+        content_type = response.headers.get('Content-Type', '')
+        entry = {
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        }
+        if content_type.startswith(TEXT_TYPES):
+            entry['body'] = to_placeholders(response.text)
+            if 'Link' in entry['headers']:
+                entry['headers']['Link'] = to_placeholders(entry['headers']['Link'])
+        else:
+            entry['encoding'] = 'base64'
+            entry['body'] = base64.b64encode(response.content).decode('ascii')
+        self.entries[key] = entry
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'entries': self.entries},
+                      f, indent=1, sort_keys=True)
+
+
+def to_placeholders(text):
+    for service, upstream in UPSTREAMS.items():
+        text = text.replace(upstream, f'@@{service}@@')
+    return text
+
+
+def from_placeholders(text, base_url):
+    for service in UPSTREAMS:
+        text = text.replace(f'@@{service}@@', f'{base_url}/{service}')
+    return text
+
+
+class FakeServices:
+    """The stand-in server; `start()` serves on a background thread and returns the base URL."""
+
+    def __init__(self, recording=DEFAULT_RECORDING, host='127.0.0.1', port=0, latency=None, error_rate=None,
+                 jitter=0.2, record=False):
+        self.recording = Recording(recording)
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+        self.jitter = jitter
+        self.record = record
+        self.server = QuietServer((host, port), self._handler())
+        self.base_url = f'http://{host}:{self.server.server_address[1]}'
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._misses = set()
+
+    def env(self):
+        """Environment variables that point the app at this server."""
+        return {
+            'GITHUB_API_URL': f'{self.base_url}/github-api',
+            'GITHUB_WEB_URL': f'{self.base_url}/github',
+            'OPENROUTER_URL': f'{self.base_url}/openrouter/api/v1/chat/completions'
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-services', daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.record:
+            self.recording.save()
+
+    def stats(self):
+        """Requests served per service and status, plus keys the recording had no answer for."""
+        with self._lock:
+            return {'requests': dict(self._counts), 'misses': sorted(self._misses)}
+
+    def respond(self, method, path, headers, body):
+        """(status, headers, body) for one request."""
+        parts = urlsplit(path)
+        service, _, rest = parts.path.lstrip('/').partition('/')
+        if service not in UPSTREAMS:
+            return 404, {'Content-Type': 'application/json'}, b'{"message": "Unknown service"}'
+        key = request_key(method, service, '/' + rest, parts.query)
+
+        delay = self.latency.get(service, 0.0)
+        if delay:
+            time.sleep(max(0.0, random.uniform(delay * (1 - self.jitter), delay * (1 + self.jitter))))
+
+        if self.record:
+            status, response_headers, payload = self._forward(method, service, '/' + rest, parts.query, headers, body,
+                                                              key)
+        elif random.random() < self.error_rate.get(service, 0.0):
+            status, response_headers, payload = 502, {'Content-Type': 'application/json'}, b'{"message": "Injected"}'
+        else:
+            status, response_headers, payload = self._replay(service, key, headers)
+
+        with self._lock:
+            count_key = f'{service} {status}'
+            self._counts[count_key] = self._counts.get(count_key, 0) + 1
+        return status, response_headers, payload
+
+    def _replay(self, service, key, headers):
+        entry = self.recording.entries.get(key)
+        if entry is None:
+            with self._lock:
+                self._misses.add(key)
+            return 404, {'Content-Type': 'application/json'}, b'{"message": "Not Found"}'
+
+        response_headers = {name: from_placeholders(value, self.base_url) for name, value in entry['headers'].items()}
+        if service == 'github-api':
+            # Recorded quota is long gone; report a fresh window so pacing never kicks in
+            response_headers.update({
+                'X-RateLimit-Limit': '5000',
+                'X-RateLimit-Remaining': '4999',
+                'X-RateLimit-Reset': str(int(time.time()) + 3600),
+                'X-RateLimit-Resource': 'graphql' if key.endswith('/graphql') else 'core'
+            })
+        etag = entry['headers'].get('ETag')
+        if etag and headers.get('If-None-Match') == etag:
+            return 304, response_headers, b''
+
+        payload = self.recording.body(key)
+        if entry.get('encoding') != 'base64' and 'file' not in entry:
+            payload = from_placeholders(payload.decode('utf-8'), self.base_url).encode('utf-8')
+        return entry['status'], response_headers, payload
+
+    def _forward(self, method, service, path, query, headers, body, key):
+        response = requests.request(
+            method,
+            f"{UPSTREAMS[service]}{path}{'?' + query if query else ''}",
+            headers={name: headers[name] for name in FORWARDED_HEADERS if name in headers},
+            data=body,
+            timeout=120
+        )
+        with self._lock:
+            self.recording.add(key, response)
+        content_type = response.headers.get('Content-Type', 'application/octet-stream')
+        return response.status_code, {'Content-Type': content_type}, response.content
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                status, headers, payload = services.respond(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+
+            do_GET = do_POST = do_HEAD = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recording', default=DEFAULT_RECORDING, help='recording to replay or write')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', help='seconds per request, e.g. github-api=0.05,openrouter=2')
+    parser.add_argument('--error-rate', help='share of requests answered with 502, e.g. github-api=0.02')
+    parser.add_argument('--record', action='store_true', help='forward upstream and save the responses')
+    args = parser.parse_args()
+
+    services = FakeServices(args.recording, args.host, args.port, latency=parse_service_values(args.latency),
+                            error_rate=parse_service_values(args.error_rate), record=args.record)
+    services.start()
+    for name, value in services.env().items():
+        print(f'{name}={value}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.stop()
+        print(json.dumps(services.stats(), indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""gunicorn settings, loaded from the working directory by `gunicorn app:app`.
+
+The event streams (/api/analyze/stream, /api/analyze/<job_id>/events) hold
+their request open for as long as the analysis runs, and the NDJSON batch
+route (/api/analyze/batch) for as long as the whole batch does. A sync
+worker would serve only that one request, and its 30 second timeout would
+kill the stream partway through. gthread workers serve each request on a
+thread of their own and only time out when the worker itself stops
+responding, so a stream ties up one thread rather than a worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8080)}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# Each open stream holds a thread, so this caps concurrent streams per worker
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# Lets streams that are still running finish on restart
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 120))
+keepalive = 5
@@ -0,0 +1,65 @@
+import numpy as np
+
+from backend.commits import DAY, WEEK, CommitHistory, WeeklyActivity, cadence_features
+
+START = 18_500 * DAY
+
+
+def history(offsets, authors):
+    return CommitHistory(np.array([START + offset for offset in offsets], dtype=np.int64),
+                         np.array(authors, dtype=np.int32), logins=[f'user{code}' for code in range(max(authors) + 1)])
+
+
+def test_complete_history_measures_whole_history_features_from_the_sample():
+    offsets = [0, DAY, 2 * DAY, 30 * DAY]
+    features = cadence_features(history(offsets, [0, 0, 1, 0]), total_commits=4)
+
+    assert features['complete']
+    assert features['span_days'] == 31
+    assert features['first_week_share'] == 0.75
+    assert features['top_author_share'] == 0.75
+    assert features['authors'] == 2
+
+
+def test_truncated_history_without_weekly_stats_leaves_whole_history_features_unknown():
+    # The newest 1000 of 5000 commits, all by one author within a day
+    sample = history([index * 60 for index in range(1000)], [0] * 1000)
+
+    features = cadence_features(sample, weekly=None, total_commits=5000)
+
+    assert not features['complete']
+    assert features['sampled_commits'] == 1000
+    assert features['span_days'] == 1
+    for name in ('first_week_share', 'top_author_share', 'author_hhi', 'authors'):
+        assert features[name] is None
+
+
+def test_truncated_history_takes_whole_history_features_from_weekly_stats():
+    sample = history([index * 60 for index in range(100)], [0] * 100)
+    weekly = WeeklyActivity(np.array([START + week * WEEK for week in range(4)], dtype=np.int64),
+                            np.array([[0, 10, 10, 20], [0, 0, 30, 30]], dtype=np.int64))
+
+    features = cadence_features(sample, weekly=weekly, total_commits=100 + 100)
+
+    assert features['first_week_share'] == 0.1
+    assert features['top_author_share'] == 0.6
+    assert features['authors'] == 2
+
+
+def test_weekly_stats_without_commits_are_ignored():
+    assert WeeklyActivity.from_contributor_stats([]) is None
+    assert WeeklyActivity.from_contributor_stats([{'weeks': [{'w': START, 'c': 0}]}]) is None
+
+
+def test_empty_history():
+    features = cadence_features(CommitHistory(np.array([], dtype=np.int64), np.array([], dtype=np.int32)))
+
+    assert features['sampled_commits'] == 0
+    assert features['first_week_share'] == 0.0
+
+
+def test_burstiness_of_regular_commits_is_negative():
+    features = cadence_features(history([index * DAY for index in range(10)], [0] * 10), total_commits=10)
+
+    assert features['burstiness'] == -1.0
+    assert features['active_day_ratio'] == 1.0
@@ -0,0 +1,53 @@
+import pytest
+
+from backend.github_graphql import repository_metadata
+
+REPOSITORY = {
+    'name': 'r',
+    'description': None,
+    'isPrivate': False,
+    'stargazerCount': 3,
+    'forkCount': 1,
+    'createdAt': '2024-01-01T00:00:00Z',
+    'updatedAt': '2024-02-01T00:00:00Z',
+    'openIssues': {'totalCount': 2},
+    'openPullRequests': {'totalCount': 1},
+    'watchers': {'totalCount': 4},
+    'tags': {'totalCount': 0},
+    'collaborators': None,
+    'languages': {'edges': [{'size': 100, 'node': {'name': 'Python'}}]},
+    'defaultBranchRef': {'target': {'oid': 'a' * 40, 'history': {'totalCount': 2, 'nodes': [
+        {'oid': 'a' * 40, 'message': 'Second', 'committedDate': '2024-01-03T00:00:00Z',
+         'author': {'name': 'octocat', 'date': '2024-01-02T00:00:00Z'}},
+        {'oid': 'b' * 40, 'message': 'First', 'committedDate': '2024-01-01T00:00:00Z', 'author': None},
+    ]}}}
+}
+
+
+def test_normalizes_to_rest_fields():
+    metadata = repository_metadata({'data': {'repository': REPOSITORY}})
+
+    assert metadata['repo_info']['open_issues_count'] == 3
+    assert metadata['languages'] == {'Python': 100}
+    assert (metadata['watchers_count'], metadata['tags_count'], metadata['collaborators_count']) == (4, 0, 0)
+    assert metadata['total_commits'] == 2
+    assert metadata['commits'][0]['commit']['author'] == {'name': 'octocat', 'date': '2024-01-02T00:00:00Z'}
+
+
+def test_commit_by_a_deleted_account_falls_back_to_the_commit_date():
+    metadata = repository_metadata({'data': {'repository': REPOSITORY}})
+
+    assert metadata['commits'][1]['commit']['author'] == {'name': None, 'date': '2024-01-01T00:00:00Z'}
+
+
+def test_empty_repository_has_no_history():
+    metadata = repository_metadata({'data': {'repository': {**REPOSITORY, 'defaultBranchRef': None}}})
+
+    assert (metadata['commits'], metadata['total_commits']) == ([], 0)
+
+
+def test_missing_and_private_repositories_are_none_and_other_errors_raise():
+    assert repository_metadata({'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]}) is None
+    assert repository_metadata({'data': {'repository': {**REPOSITORY, 'isPrivate': True}}}) is None
+    with pytest.raises(Exception):
+        repository_metadata({'data': None, 'errors': [{'type': 'RATE_LIMITED'}]})
@@ -0,0 +1,102 @@
+import base64
+import json
+
+import pytest
+import requests
+
+from backend.github_rest import (cadence_result, commit_history, commit_page_tasks, count_from_response,
+                                 file_from_contents, graphql_metadata, needs_weekly_stats, rest_metadata)
+
+
+def response(status, body=None, link=None):
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(body).encode() if body is not None else b''
+    if link:
+        result.headers['Link'] = link
+    return result
+
+
+def commit(sha, author, date):
+    return {'sha': sha, 'commit': {'author': {'name': author, 'date': date}}, 'author': {'login': author}}
+
+
+def test_count_from_last_page_link():
+    link = ('<https://api.github.com/repositories/1/commits?per_page=1&page=2>; rel="next", '
+            '<https://api.github.com/repositories/1/commits?per_page=1&page=4821>; rel="last"')
+
+    assert count_from_response(response(200, [{}], link)) == 4821
+
+
+def test_count_without_link_is_the_listing_length():
+    assert count_from_response(response(200, [{}])) == 1
+    assert count_from_response(response(200, [])) == 0
+
+
+def test_count_of_an_empty_repository_and_of_a_failed_call():
+    assert count_from_response(response(204)) == 0
+    with pytest.raises(requests.HTTPError):
+        count_from_response(response(403, {'message': 'Must have push access'}))
+
+
+def test_file_from_contents_decodes_inlined_files_only():
+    body = {'encoding': 'base64', 'size': 12, 'content': base64.b64encode(b'print("hi")\n').decode()}
+
+    assert file_from_contents('a.py', body) == {'path': 'a.py', 'size': 12, 'content': 'print("hi")\n'}
+    assert file_from_contents('big.bin', {'encoding': 'none', 'size': 10 ** 8, 'content': ''}) is None
+    assert file_from_contents('dir', [{'name': 'a.py'}]) is None
+
+
+def test_commit_pages_stop_at_the_limit():
+    def pages(total_commits, limit=1000):
+        return sorted(commit_page_tasks('B', {}, None, total_commits, limit))
+
+    assert pages(0) == [1]
+    assert pages(250) == [1, 2, 3]
+    assert pages(50_000) == list(range(1, 11))
+
+
+def test_commit_page_tasks_fetch_through_the_given_client():
+    calls = []
+
+    def fetch_json(url, headers, params=None, default=None):
+        calls.append((url, params['page']))
+        return [commit(f"{params['page']}", 'a', '2024-01-01T00:00:00Z')]
+
+    tasks = commit_page_tasks('https://api.github.com/repos/o/r', {}, fetch_json, 150, 1000)
+    history = commit_history({page: func() for page, (func, default) in reversed(tasks.items())})
+
+    assert sorted(calls) == [('https://api.github.com/repos/o/r/commits', 1),
+                             ('https://api.github.com/repos/o/r/commits', 2)]
+    assert len(history) == 2
+    assert needs_weekly_stats(history, 150)
+    assert not needs_weekly_stats(history, 2)
+
+
+def test_stats_still_being_computed_leave_weekly_unknown():
+    history = commit_history({1: [commit('a', 'a', '2024-01-01T00:00:00Z'), commit('b', 'b', '2024-01-02T00:00:00Z')]})
+
+    features, _, weekly = cadence_result(history, {}, 5000)
+
+    assert weekly is None
+    assert features['authors'] is None
+
+
+def test_graphql_metadata():
+    assert graphql_metadata({'graphql': None, 'contributors_count': 0}) is None
+    assert graphql_metadata({'graphql': False, 'contributors_count': 0}) is False
+    assert graphql_metadata({}) is False
+    assert graphql_metadata({'graphql': {'commits': []}, 'contributors_count': 7}) == {'commits': [],
+                                                                                       'contributors_count': 7}
+
+
+def test_rest_metadata_falls_back_to_the_listing_length():
+    fetched = {'repo_info': {'name': 'r'}, 'scraped_info': None, 'languages': {}, 'commits': [{}, {}],
+               'total_commits': None, 'watchers_count': 1, 'tags_count': 2, 'collaborators_count': 3}
+
+    metadata = rest_metadata(fetched, 'B')
+
+    assert metadata['total_commits'] == 2
+    assert metadata['contributors_count'] == 0
+    with pytest.raises(Exception):
+        rest_metadata({**fetched, 'repo_info': None}, 'B')
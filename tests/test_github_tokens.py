@@ -0,0 +1,71 @@
+import json
+
+import requests
+
+from backend.github_tokens import TokenPool
+
+
+def response(status, body):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+    result.headers['Content-Type'] = 'application/json' if not isinstance(body, str) else 'text/html'
+    return result
+
+
+class Session:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def get(self, url, headers=None, timeout=None):
+        return self.responses.pop(0)
+
+
+def pool(*responses):
+    return TokenPool(['token-one'], refresh_interval=0, session=Session(*responses))
+
+
+def test_valid_token_caches_its_login():
+    tokens = pool(response(200, {'login': 'octocat'}))
+
+    assert tokens.username() == 'octocat'
+    assert tokens.tokens[0].valid
+
+
+def test_401_marks_the_token_invalid():
+    tokens = pool(response(401, {'message': 'Bad credentials'}))
+
+    assert tokens.username() is None
+    assert tokens.tokens[0].valid is False
+
+
+def test_error_page_leaves_the_token_unknown_and_checks_it_again():
+    tokens = pool(response(502, '<html><body>Bad gateway</body></html>'),
+                  response(200, '<html>proxy login</html>'),
+                  response(200, {'login': 'octocat'}))
+
+    assert tokens.username() is None
+    assert tokens.tokens[0].valid is None
+    assert tokens.username() is None
+    assert tokens.username() == 'octocat'
+
+
+def test_error_page_keeps_a_known_token_valid():
+    tokens = pool(response(200, {'login': 'octocat'}), response(502, 'Bad gateway'))
+    tokens.username()
+
+    assert tokens.validate(tokens.tokens[0]) is True
+    assert tokens.tokens[0].login == 'octocat'
+
+
+def test_requests_are_signed_until_every_token_is_invalid(capsys):
+    tokens = pool(response(401, {'message': 'Bad credentials'}))
+    signed = tokens(requests.Request('GET', 'https://api.github.com/repos/o/r').prepare())
+    tokens.username()
+    unsigned = tokens(requests.Request('GET', 'https://api.github.com/repos/o/r').prepare())
+
+    assert signed.headers['Authorization'] == 'token token-one'
+    assert 'Authorization' not in unsigned.headers
+    assert 'unauthenticated' in capsys.readouterr().out
+    assert tokens.snapshot()['usable'] == 0
+    assert 'token-one' not in json.dumps(tokens.snapshot())
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.metrics import generate_metrics, metric_inputs, round_half, score_rows
+
+
+def timestamp(days_ago):
+    # Half a day off the boundary, so the age in whole days can't tip while the test runs
+    moment = datetime.now(timezone.utc) - timedelta(days=days_ago, hours=12)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def repository(stars, forks, open_issues, age_days, idle_days, **counts):
+    return {'stars': stars, 'forks': forks, 'open_issues_count': open_issues, 'created_at': timestamp(age_days),
+            'last_updated': timestamp(idle_days), **counts}
+
+
+REPOSITORIES = [
+    (repository(0, 0, 0, 3, 0), []),
+    (repository(40, 10, 7, 20, 10, watchers_count=5, total_commits=30),
+     [{'path': 'README.md', 'content': 'short'}, {'path': '.gitignore', 'content': ''}]),
+    (repository(250, 80, 120, 900, 45, watchers_count=60, collaborators_count=8, tags_count=12, total_commits=2000),
+     [{'path': 'README.md', 'content': 'x' * 800}, {'path': 'requirements.txt', 'content': 'numpy'},
+      {'path': 'tests/test_app.py', 'content': ''}]),
+    # Engagement of 0.3 + 0.2 + 0.15 + 0.15 + 0.1 + 0.075, a halfway point np.round and round settle differently
+    (repository(30, 10, 49, 400, 200, watchers_count=50, collaborators_count=5, tags_count=1, total_commits=20),
+     [{'path': 'README.md', 'content': 'x' * 501}]),
+]
+
+
+def test_batch_scores_match_single_repository_scores():
+    rows = [metric_inputs(repo_info, files) for repo_info, files in REPOSITORIES]
+
+    batch = score_rows(rows)
+
+    assert batch == [generate_metrics(repo_info, files, 'https://github.com/o/r') for repo_info, files in REPOSITORIES]
+    assert [result['numeric_score'] for result in batch] == [1.4, 3.2, 4.1, 3.1]
+    assert [result['score'] for result in batch] == ['Bad', 'Average', 'Good', 'Average']
+    assert batch[3]['score_breakdown']['engagement'] == round(0.975, 2)
+
+
+def test_score_rows_of_nothing():
+    assert score_rows([]) == []
+
+
+def test_round_half_settles_ties_like_round():
+    values = [0.975, 0.125, 2.675, 1.005, 0.3333]
+
+    assert list(round_half(values, 2)) == [round(value, 2) for value in values]
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from flask import Flask
+
+from backend.models import db, IndexedFile
+from backend.similarity import MIN_SHINGLES, SignatureCollector, SimilarityIndex, minhash, shingle_hashes
+
+SOURCE = '\n'.join(f'def handler_{index}(request, value):\n    return request.get(value) + {index}'
+                   for index in range(40))
+UNRELATED = '\n'.join(f'class Model{index}:\n    fields = [{index}, "name", "owner"]' for index in range(40))
+
+
+@pytest.fixture
+def database():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+
+
+def signature(content):
+    return minhash(shingle_hashes(content))
+
+
+def test_identical_files_have_identical_signatures_and_unrelated_ones_do_not():
+
+    assert (signature(SOURCE) == signature(SOURCE)).all()
+    assert (signature(SOURCE) == signature(UNRELATED)).mean() < 0.5
+
+
+def test_collector_skips_non_source_and_short_files_and_stops_at_max_files():
+    collector = SignatureCollector(max_files=2)
+    for path, content in [('README.md', SOURCE), ('tiny.py', 'x = 1'), ('a.py', SOURCE), ('b.py', SOURCE),
+                          ('c.py', SOURCE)]:
+        collector.add({'path': path, 'content': content})
+
+    assert shingle_hashes('x = 1').size < MIN_SHINGLES
+    assert [path for path, _ in collector.result()] == ['a.py', 'b.py']
+
+
+def test_query_finds_near_duplicates_in_other_repositories(database):
+    index = SimilarityIndex(threshold=0.8)
+    index.add('other', 'https://github.com/o/other', [('src/handlers.py', signature(SOURCE))])
+
+    changed = SOURCE.replace('handler_39', 'renamed_39')
+    matches = index.query([('app/handlers.py', signature(changed))], exclude_repo_hash='mine')
+
+    assert len(matches) == 1
+    assert matches[0]['match_repo'] == 'https://github.com/o/other'
+    assert matches[0]['match_path'] == 'src/handlers.py'
+    assert matches[0]['similarity'] >= 0.8
+    assert index.query([('app/handlers.py', signature(SOURCE))], exclude_repo_hash='other') == []
+
+
+def test_query_against_a_new_empty_index(database):
+    assert SimilarityIndex().query([('app/handlers.py', signature(SOURCE))]) == []
+    assert SimilarityIndex().query([]) == []
+
+
+def test_query_skips_candidates_whose_files_are_gone(database, monkeypatch):
+    index = SimilarityIndex(threshold=0.8)
+    index.add('gone', 'https://github.com/o/gone', [('a.py', signature(SOURCE))])
+    index.add('kept', 'https://github.com/o/kept', [('b.py', signature(UNRELATED))])
+
+    class Replaced:
+        """IndexedFile.query as seen when another analysis replaces 'gone' between reading buckets and files."""
+
+        def __get__(self, instance, owner):
+            return db.session.query(owner).filter(owner.repo_hash != 'gone')
+
+    monkeypatch.setattr(IndexedFile, 'query', Replaced())
+    matches = index.query([('x.py', signature(SOURCE)), ('y.py', signature(UNRELATED))], exclude_repo_hash='mine')
+
+    assert [match['path'] for match in matches] == ['y.py']
+
+
+def test_replace_paths_keeps_other_files(database):
+    index = SimilarityIndex()
+    index.add('repo', 'https://github.com/o/repo', [('a.py', signature(SOURCE)), ('b.py', signature(SOURCE))])
+
+    index.replace_paths('repo', 'https://github.com/o/repo', [], ['a.py'])
+
+    assert [row.path for row in IndexedFile.query.filter_by(repo_hash='repo')] == ['b.py']
+    assert np.frombuffer(IndexedFile.query.one().signature, dtype=np.uint32).size == 128
@@ -0,0 +1,102 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend import transport
+from backend.transport import RetryBudget, RetryingAdapter, RetryPolicy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def response(status, text='', **headers):
+    result = requests.Response()
+    result.status_code = status
+    result._content = text.encode()
+    result._content_consumed = True
+    result.headers.update(headers)
+    return result
+
+
+def test_budget_allows_retries_as_a_share_of_requests(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(transport.time, 'monotonic', clock)
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_balance=2)
+
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_budget_refills_over_time_up_to_its_cap(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(transport.time, 'monotonic', clock)
+    budget = RetryBudget(ratio=0, min_per_second=1, max_balance=2)
+    while budget.withdraw():
+        pass
+
+    clock.now += 1
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    clock.now += 60
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+
+
+def test_backoff_is_full_jitter_under_an_exponential_cap(monkeypatch):
+    monkeypatch.setattr(transport.random, 'uniform', lambda low, high: high)
+    policy = RetryPolicy(budget=RetryBudget(max_balance=100), retries=10, backoff=0.5, max_backoff=8)
+
+    assert [policy.delay('GET', attempt, 'h', 'connection') for attempt in range(6)] == [0.5, 1, 2, 4, 8, 8]
+
+
+def test_no_retry_after_the_last_attempt_or_for_other_methods():
+    policy = RetryPolicy(retries=2)
+
+    assert policy.delay('GET', 2, 'h', 'connection') is None
+    assert policy.delay('POST', 0, 'h', 'connection') is None
+
+
+def test_server_wait_is_honoured_unless_it_is_too_long():
+    policy = RetryPolicy(max_retry_after=10)
+
+    assert policy.delay('GET', 0, 'h', '503', response(503, **{'Retry-After': '3'})) == 3
+    assert policy.delay('GET', 0, 'h', '503', response(503, **{'Retry-After': '30'})) is None
+    # A rate limit without Retry-After gets the default pause, which is longer than we wait
+    assert policy.delay('GET', 0, 'h', '429', response(429)) is None
+
+
+def test_denied_by_an_empty_budget(monkeypatch):
+    monkeypatch.setattr(transport.time, 'monotonic', Clock())
+    policy = RetryPolicy(budget=RetryBudget(min_per_second=0, max_balance=1))
+
+    assert policy.delay('GET', 0, 'h', 'connection') is not None
+    assert policy.delay('GET', 0, 'h', 'connection') is None
+
+
+def test_retry_reasons():
+    policy = RetryPolicy()
+
+    assert policy.reason(response(502)) == '502'
+    assert policy.reason(response(403, 'You have exceeded a secondary rate limit')) == 'secondary_limit'
+    assert policy.reason(response(403, 'Resource not accessible by integration')) is None
+    assert policy.reason(response(404)) is None
+
+
+def test_adapter_retries_until_a_response_is_final(monkeypatch):
+    responses = [response(503), response(502), response(200, '{}')]
+    monkeypatch.setattr(HTTPAdapter, 'send', lambda self, request, **kwargs: responses.pop(0))
+    sleeps = []
+    monkeypatch.setattr(transport.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(transport.random, 'uniform', lambda low, high: high)
+    adapter = RetryingAdapter(RetryPolicy(backoff=0.5))
+
+    result = adapter.send(requests.Request('GET', 'https://api.github.com/x').prepare())
+
+    assert result.status_code == 200
+    assert sleeps == [0.5, 1]